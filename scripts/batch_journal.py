@@ -0,0 +1,144 @@
+# batch_journal.py
+"""
+Bitacora (journal) JSONL de un lote: una linea por constancia procesada.
+
+Cada resultado se escribe (y se sincroniza a disco) apenas termina la constancia,
+asi un corte a mitad de lote (cierre del navegador, bloqueo, caida del proceso) no
+pierde lo ya extraido. El Excel final se arma desde la bitacora y un lote reanudado
+salta las constancias que ya tienen registro.
+
+Formato (una linea JSON por evento, solo se agrega al final):
+    {"constancia": "25-1-241304", "status": "ok", "record": {...}, "ts": ...}
+    {"constancia": "25-1-99999", "status": "error", "message": "...", "ts": ...}
+
+Las filas del Excel salen de las lineas ok en orden de llegada. Una constancia con
+error que luego se reintenta con exito deja de contar como error. Una ultima linea
+truncada por un corte se ignora.
+
+Uso:
+    journal = BatchJournal(path)
+    journal.append_record("25-1-241304", record)
+    journal.completed()       # constancias con registro ok
+    journal.records()         # [(constancia, record)] en orden de llegada
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+ERROR = "error"
+
+
+class BatchJournal:
+    """
+    En memoria solo se guarda el resumen por constancia (ok / ultimo error); los
+    registros se leen del archivo cuando se piden, asi el tamano del lote no pesa.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._lines = 0
+        self._done: Set[str] = set()
+        self._errors: Dict[str, str] = {}
+        self._tail_checked = False
+
+    # -----------------------------
+    # Lectura
+    # -----------------------------
+    def _iter_file(self) -> Iterator[Dict[str, Any]]:
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                for n, line in enumerate(f, start=1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Bitacora {self.path.name}: linea {n} ilegible (se ignora)")
+                        continue
+                    if entry.get("constancia"):
+                        yield entry
+        except FileNotFoundError:
+            return
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        for entry in self._iter_file():
+            self._track(entry)
+        self._loaded = True
+
+    def _track(self, entry: Dict[str, Any]) -> None:
+        self._lines += 1
+        constancia = entry["constancia"]
+        if entry.get("status") == OK:
+            self._done.add(constancia)
+            self._errors.pop(constancia, None)
+        elif entry.get("status") == ERROR and constancia not in self._done:
+            self._errors.pop(constancia, None)
+            self._errors[constancia] = entry.get("message", "")
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return self._lines
+
+    def completed(self) -> Set[str]:
+        """Constancias que ya tienen registro ok (se saltan al reanudar)."""
+        with self._lock:
+            self._load()
+            return set(self._done)
+
+    def records(self) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """(constancia, registro) de cada linea ok, en orden de llegada (leidos del archivo)."""
+        for entry in self._iter_file():
+            if entry.get("status") == OK:
+                yield entry["constancia"], entry.get("record") or {}
+
+    def errors(self) -> List[Tuple[str, str]]:
+        """Constancias sin registro ok, con el ultimo error de cada una."""
+        with self._lock:
+            self._load()
+            return list(self._errors.items())
+
+    # -----------------------------
+    # Escritura
+    # -----------------------------
+    def append_record(self, constancia: str, record: Dict[str, str]) -> None:
+        self._append({"constancia": constancia, "status": OK, "record": record})
+
+    def append_error(self, constancia: str, message: str) -> None:
+        self._append({"constancia": constancia, "status": ERROR, "message": message})
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        entry["ts"] = time.time()
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._load()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                if not self._tail_checked and f.tell() > 0 and not self._ends_with_newline():
+                    # Ultima linea truncada por un corte: la nueva va en su propia linea
+                    f.write("\n")
+                self._tail_checked = True
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._track(entry)
+
+    def _ends_with_newline(self) -> bool:
+        with self.path.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
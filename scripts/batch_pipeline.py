@@ -0,0 +1,224 @@
+# batch_pipeline.py
+"""
+Lote en tres etapas conectadas por colas acotadas:
+
+    fetch (hilos de fetch_scheduler) -> parse (pool de hilos) -> write (un solo hilo)
+
+- fetch: entrega (item, html | excepcion) en el orden del lote; mientras una sesion
+  espera la pausa del limitador las otras etapas siguen trabajando.
+- parse: cada detalle se parsea en un hilo del pool; los futuros se encolan en
+  orden, asi el escritor recibe los registros en el orden del lote. El parseo es
+  Python puro: por el GIL la etapa solo solapa el parseo con la descarga y la
+  escritura, no lo paraleliza. Por eso el pool es de un hilo por defecto; mas hilos
+  no parsean mas rapido y le quitan tiempo de CPU al hilo de fetch (y ensucian la
+  latencia que mide el limitador).
+- write: el hilo que llama a run() escribe (Excel, bitacora, cache). Es el unico que
+  toca el libro, por eso no hace falta sincronizar el writer de openpyxl.
+
+Las colas son acotadas (queue_size): si el escritor se atrasa, parse y fetch se
+frenan en vez de acumular HTML en memoria. Cada etapa lleva items, segundos
+ocupada, segundos esperando a la etapa anterior y profundidad de su cola de
+entrada (actual y maxima); snapshot() los entrega en cualquier momento.
+
+Uso:
+    pipeline = Pipeline(parse_workers=1, queue_size=4)
+    pipeline.run(scheduler.map(items, load), parse, write)   # write -> False detiene el lote
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("fetch", "parse", "write")
+DEFAULT_PARSE_WORKERS = 1
+DEFAULT_QUEUE_SIZE = 4
+
+# Marca de fin de una cola
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name: str, inbox: Optional[queue.Queue] = None):
+        self.name = name
+        self.inbox = inbox
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_depth = 0
+
+    def observe_depth(self) -> None:
+        if self.inbox is not None:
+            self.max_depth = max(self.max_depth, self.inbox.qsize())
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wait_seconds": round(self.wait_seconds, 3),
+            "queue_depth": self.inbox.qsize() if self.inbox is not None else 0,
+            "max_queue_depth": self.max_depth,
+        }
+
+
+class Pipeline:
+    def __init__(
+        self,
+        parse_workers: int = DEFAULT_PARSE_WORKERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        on_stop: Optional[Callable[[], None]] = None,
+    ):
+        self.parse_workers = max(1, int(parse_workers))
+        self.queue_size = max(1, int(queue_size))
+        self.on_stop = on_stop
+        self._fetched: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self._parsed: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.stages = {
+            "fetch": StageStats("fetch"),
+            "parse": StageStats("parse", self._fetched),
+            "write": StageStats("write", self._parsed),
+        }
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: self.stages[name].as_dict() for name in STAGES}
+
+    # -----------------------------
+    # Ejecucion
+    # -----------------------------
+    def run(
+        self,
+        source: Iterator[Tuple[Any, Any]],
+        parse: Callable[[Any, Any], Any],
+        write: Callable[[Any, Any], bool],
+    ) -> None:
+        """
+        source entrega (item, cargado | excepcion); parse(item, cargado) corre en el pool y
+        write(item, parseado | excepcion) en este hilo. Si write retorna False el lote se
+        detiene: se avisa a on_stop (p.ej. cortar pausas) y se espera a que las etapas cierren.
+        """
+        with ThreadPoolExecutor(max_workers=self.parse_workers, thread_name_prefix="secop-parse") as pool:
+            threads = [
+                threading.Thread(target=self._feed, args=(source,), name="secop-pipeline-fetch", daemon=True),
+                threading.Thread(target=self._dispatch, args=(pool, parse), name="secop-pipeline-parse", daemon=True),
+            ]
+            for t in threads:
+                t.start()
+            try:
+                self._drain(write)
+            finally:
+                self._stop.set()
+                if self.on_stop is not None:
+                    self.on_stop()
+                for t in threads:
+                    t.join()
+        logger.info(f"Pipeline del lote: {self.snapshot()}")
+
+    def _put(self, q: queue.Queue, value: Any) -> bool:
+        """put que se rinde si el lote se detuvo (False)."""
+        while not self._stop.is_set():
+            try:
+                q.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue) -> Any:
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _DONE
+
+    def _feed(self, source: Iterator[Tuple[Any, Any]]) -> None:
+        stats = self.stages["fetch"]
+        try:
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                try:
+                    entry = next(source)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    # Falla de la etapa misma (no de un item): el escritor la relanza
+                    entry = (None, e)
+                with self._lock:
+                    stats.items += 1
+                    stats.wait_seconds += time.perf_counter() - t0
+                if not self._put(self._fetched, entry):
+                    break
+                with self._lock:
+                    self.stages["parse"].observe_depth()
+                if entry[0] is None:
+                    break
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+            self._put(self._fetched, _DONE)
+
+    def _timed_parse(self, parse: Callable[[Any, Any], Any], item: Any, loaded: Any) -> Any:
+        t0 = time.perf_counter()
+        try:
+            return parse(item, loaded)
+        finally:
+            with self._lock:
+                stage = self.stages["parse"]
+                stage.items += 1
+                stage.busy_seconds += time.perf_counter() - t0
+
+    def _dispatch(self, pool: ThreadPoolExecutor, parse: Callable[[Any, Any], Any]) -> None:
+        stats = self.stages["parse"]
+        while True:
+            t0 = time.perf_counter()
+            entry = self._get(self._fetched)
+            with self._lock:
+                stats.wait_seconds += time.perf_counter() - t0
+            if entry is _DONE:
+                break
+            item, loaded = entry
+            if isinstance(loaded, BaseException):
+                fut: Future = Future()
+                fut.set_exception(loaded)
+            else:
+                fut = pool.submit(self._timed_parse, parse, item, loaded)
+            if not self._put(self._parsed, (item, fut)):
+                fut.cancel()
+                break
+            with self._lock:
+                self.stages["write"].observe_depth()
+        self._put(self._parsed, _DONE)
+
+    def _drain(self, write: Callable[[Any, Any], bool]) -> None:
+        stats = self.stages["write"]
+        while True:
+            t0 = time.perf_counter()
+            entry = self._get(self._parsed)
+            if entry is _DONE:
+                break
+            item, fut = entry
+            try:
+                outcome = fut.result()
+            except BaseException as e:
+                outcome = e
+            t1 = time.perf_counter()
+            with self._lock:
+                stats.wait_seconds += t1 - t0
+            if item is None:
+                raise outcome
+            keep_going = write(item, outcome)
+            with self._lock:
+                stats.items += 1
+                stats.busy_seconds += time.perf_counter() - t1
+            if keep_going is False:
+                break
@@ -0,0 +1,403 @@
+# browser_pool.py
+"""
+Pool persistente de navegador Playwright para el proceso de la UI.
+
+El API sync de Playwright queda atado al hilo que lo inicia, por eso el pool
+trabaja en "carriles": cada carril es un hilo dedicado con su propio Chromium y
+es el unico que toca ese navegador. Los lotes piden un "lease" (contexto +
+pagina) y envian trabajos al hilo de su carril; el primer navegador se lanza al
+arrancar y los carriles quedan calientes entre lotes.
+
+Concurrencia:
+- Cada lease toma un carril libre; si todos estan ocupados se abre otro (hasta
+  `max_browsers`), asi las sesiones paralelas del lote (fetch_workers > 1) corren
+  en hilos distintos en vez de hacer fila en uno solo.
+- Con todos los carriles abiertos y ocupados, el lease comparte el carril menos
+  cargado (sus trabajos se turnan en ese hilo).
+
+Reciclaje:
+- Un contexto se cierra y se recrea despues de `max_pages_per_context` paginas.
+- Si un trabajo falla con un error inesperado se recrea el contexto; si el
+  navegador se desconecto (ventana cerrada, crash) se relanza.
+
+Uso:
+    pool = BrowserPool(headless=False).start()
+    with pool.lease() as lease:
+        html = lease.fetch("25-15-14581710")
+    pool.close()
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from playwright.sync_api import sync_playwright, Error as PWError, TimeoutError as PWTimeoutError
+
+import fetch_scheduler
+import secop_extract
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PAGES_PER_CONTEXT = 25
+DEFAULT_START_TIMEOUT_SECONDS = 60.0
+# Un carril por sesion paralela del lote como maximo
+DEFAULT_MAX_BROWSERS = fetch_scheduler.MAX_WORKERS
+
+# Errores "normales" de una pagina: no justifican reciclar el contexto.
+_EXPECTED_ERRORS = (secop_extract.SecopExtractionError, PWTimeoutError)
+
+
+class _Slot:
+    """Contexto + pagina asignados a un lease (solo se usa desde el hilo del carril)."""
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.pages_served = 0
+
+
+class BrowserLease:
+    """Acceso de un lote a un contexto del pool. Los metodos bloquean hasta que el hilo del carril responde."""
+
+    def __init__(self, lane: "_Lane", lease_id: int):
+        self._lane = lane
+        self.lease_id = lease_id
+
+    def run(self, fn: Callable[[Any], Any]) -> Any:
+        """Ejecuta fn(page) en el hilo del carril con la pagina del lease."""
+        return self._lane._call(lambda: self._lane._run_on_slot(self.lease_id, fn))
+
+    def fetch(self, constancia_ok: str, timeout_ms: int = 120_000) -> str:
+        return self.run(lambda page: secop_extract._fetch_detail_html_with_page(page, constancia_ok, timeout_ms))
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        headless: bool = False,
+        max_pages_per_context: int = DEFAULT_MAX_PAGES_PER_CONTEXT,
+        max_idle_contexts: int = 1,
+        max_browsers: int = DEFAULT_MAX_BROWSERS,
+    ):
+        self.headless = headless
+        self.max_pages_per_context = max(1, int(max_pages_per_context))
+        self.max_idle_contexts = max(0, int(max_idle_contexts))
+        self.max_browsers = max(1, int(max_browsers))
+
+        self._lanes: List[_Lane] = []
+        self._lanes_lock = threading.Lock()
+        self._lane_numbers = itertools.count(1)
+        self._lease_ids = itertools.count(1)
+        self._start_timeout = DEFAULT_START_TIMEOUT_SECONDS
+        self._closed = False
+
+        self.stats = {"launches": 0, "contexts_created": 0, "contexts_recycled": 0, "pages_served": 0, "lanes": 0}
+        self._stats_lock = threading.Lock()
+
+    # -----------------------------
+    # Ciclo de vida
+    # -----------------------------
+    def start(self, timeout_seconds: float = DEFAULT_START_TIMEOUT_SECONDS) -> "BrowserPool":
+        if self._lanes:
+            return self
+        self._start_timeout = timeout_seconds
+        lane = _Lane(self, next(self._lane_numbers))
+        lane.start(timeout_seconds)
+        with self._lanes_lock:
+            self._lanes.append(lane)
+        return self
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        with self._lanes_lock:
+            lanes = list(self._lanes)
+        for lane in lanes:
+            lane.close()
+
+    @property
+    def is_running(self) -> bool:
+        with self._lanes_lock:
+            lanes = list(self._lanes)
+        return not self._closed and any(lane.is_running for lane in lanes)
+
+    @contextmanager
+    def lease(self) -> Iterator[BrowserLease]:
+        lane = self._take_lane()
+        try:
+            lease_id = next(self._lease_ids)
+            lane._call(lambda: lane._acquire_slot(lease_id))
+            try:
+                yield BrowserLease(lane, lease_id)
+            finally:
+                if lane.is_running:
+                    lane._call(lambda: lane._release_slot(lease_id))
+        finally:
+            with self._lanes_lock:
+                lane.active -= 1
+
+    def fetch(self, constancia_ok: str, timeout_ms: int = 120_000) -> str:
+        """Atajo para una sola constancia (toma y devuelve un lease)."""
+        with self.lease() as lease:
+            return lease.fetch(constancia_ok, timeout_ms)
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += n
+
+    # -----------------------------
+    # Asignacion de carriles
+    # -----------------------------
+    def _take_lane(self) -> "_Lane":
+        """Carril para un lease nuevo: uno libre, uno nuevo (si cabe) o el menos cargado."""
+        with self._lanes_lock:
+            if self._closed:
+                raise secop_extract.SecopExtractionError("El pool de navegador no esta activo.")
+            self._lanes = [lane for lane in self._lanes if lane.is_running or lane.starting]
+            running = [lane for lane in self._lanes if lane.is_running]
+            free = [lane for lane in running if lane.active == 0]
+            if free:
+                lane = free[0]
+            elif len(self._lanes) < self.max_browsers:
+                lane = _Lane(self, next(self._lane_numbers))
+                lane.starting = True
+                self._lanes.append(lane)
+            elif running:
+                lane = min(running, key=lambda l: l.active)
+            else:
+                raise secop_extract.SecopExtractionError("El pool de navegador no esta activo.")
+            lane.active += 1
+        if not lane.starting:
+            return lane
+        # Lanzar el navegador fuera del candado: los demas leases no esperan este arranque
+        try:
+            lane.start(self._start_timeout)
+        except secop_extract.SecopExtractionError as e:
+            logger.warning(f"Pool de navegador: no se pudo abrir otro carril: {e}")
+            with self._lanes_lock:
+                self._lanes.remove(lane)
+                running = [other for other in self._lanes if other.is_running]
+                if not running:
+                    raise
+                shared = min(running, key=lambda other: other.active)
+                shared.active += 1
+            return shared
+        finally:
+            lane.starting = False
+        if self._closed:
+            lane.close()
+        return lane
+
+
+class _Lane:
+    """Hilo dedicado con su propio Chromium; atiende en orden los trabajos de sus leases."""
+
+    def __init__(self, pool: BrowserPool, number: int):
+        self.pool = pool
+        self.number = number
+        self.active = 0  # leases vigentes (lo lleva el pool bajo su candado)
+        self.starting = False
+
+        self._jobs: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._startup_error: Optional[BaseException] = None
+        self._closed = False
+
+        # Estado propiedad del hilo del carril
+        self._playwright = None
+        self._browser = None
+        self._idle: List[_Slot] = []
+        self._leased: Dict[int, _Slot] = {}
+
+    def start(self, timeout_seconds: float) -> None:
+        self._thread = threading.Thread(target=self._worker, name=f"secop-browser-pool-{self.number}", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout_seconds):
+            raise secop_extract.SecopExtractionError("El navegador del pool no arranco a tiempo.")
+        if self._startup_error is not None:
+            raise secop_extract.SecopExtractionError(f"No se pudo iniciar el navegador del pool: {self._startup_error}")
+        self.pool._count("lanes")
+
+    def close(self) -> None:
+        # Sin atajo por _closed: el pool puede cerrar un carril que aun esta arrancando
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._jobs.put(None)
+            self._thread.join(timeout=30)
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive() and not self._closed and self._ready.is_set())
+
+    # -----------------------------
+    # Comunicacion con el hilo del carril
+    # -----------------------------
+    def _call(self, fn: Callable[[], Any]) -> Any:
+        if not self.is_running:
+            raise secop_extract.SecopExtractionError("El pool de navegador no esta activo.")
+        fut: Future = Future()
+        self._jobs.put((fn, fut))
+        return fut.result()
+
+    def _worker(self) -> None:
+        try:
+            with sync_playwright() as p:
+                self._playwright = p
+                try:
+                    self._launch()
+                    # Contexto caliente para el primer lote
+                    if self.pool.max_idle_contexts:
+                        self._idle.append(self._new_slot())
+                except Exception as e:
+                    self._startup_error = e
+                    self._ready.set()
+                    return
+                self._ready.set()
+                while True:
+                    job = self._jobs.get()
+                    if job is None:
+                        break
+                    fn, fut = job
+                    if not fut.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        fut.set_result(fn())
+                    except BaseException as e:
+                        fut.set_exception(e)
+                self._shutdown()
+        except Exception as e:
+            logger.error(f"Pool de navegador detenido por error: {e}")
+            self._startup_error = self._startup_error or e
+            self._ready.set()
+        finally:
+            self._closed = True
+            self._drain_pending()
+
+    def _drain_pending(self) -> None:
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            if job is None:
+                continue
+            _, fut = job
+            if fut.set_running_or_notify_cancel():
+                fut.set_exception(secop_extract.SecopExtractionError("El pool de navegador se cerro."))
+
+    # -----------------------------
+    # Operaciones (solo hilo del carril)
+    # -----------------------------
+    def _launch(self) -> None:
+        self._browser = self._playwright.chromium.launch(headless=self.pool.headless)
+        self.pool._count("launches")
+        logger.info(f"Pool de navegador: Chromium lanzado (carril {self.number})")
+
+    def _browser_alive(self) -> bool:
+        try:
+            return self._browser is not None and self._browser.is_connected()
+        except PWError:
+            return False
+
+    def _ensure_browser(self) -> None:
+        if self._browser_alive():
+            return
+        logger.warning(f"Pool de navegador: navegador desconectado, relanzando (carril {self.number})")
+        self._idle.clear()
+        for slot in self._leased.values():
+            slot.context = None
+            slot.page = None
+        try:
+            if self._browser is not None:
+                self._browser.close()
+        except PWError:
+            pass
+        self._launch()
+
+    def _new_slot(self) -> _Slot:
+        context = secop_extract._new_context(self._browser)
+        self.pool._count("contexts_created")
+        return _Slot(context, context.new_page())
+
+    def _close_slot(self, slot: _Slot) -> None:
+        try:
+            if slot.context is not None:
+                slot.context.close()
+        except PWError:
+            pass
+        slot.context = None
+        slot.page = None
+
+    def _renew_slot(self, slot: _Slot) -> None:
+        self._close_slot(slot)
+        self._ensure_browser()
+        fresh = self._new_slot()
+        slot.context, slot.page, slot.pages_served = fresh.context, fresh.page, 0
+        self.pool._count("contexts_recycled")
+
+    def _acquire_slot(self, lease_id: int) -> None:
+        self._ensure_browser()
+        slot = self._idle.pop() if self._idle else self._new_slot()
+        self._leased[lease_id] = slot
+
+    def _release_slot(self, lease_id: int) -> None:
+        slot = self._leased.pop(lease_id, None)
+        if slot is None:
+            return
+        if (
+            slot.context is None
+            or slot.pages_served >= self.pool.max_pages_per_context
+            or len(self._idle) >= self.pool.max_idle_contexts
+            or not self._browser_alive()
+        ):
+            self._close_slot(slot)
+            return
+        self._idle.append(slot)
+
+    def _run_on_slot(self, lease_id: int, fn: Callable[[Any], Any]) -> Any:
+        slot = self._leased[lease_id]
+        if slot.context is None or slot.page is None or slot.page.is_closed():
+            self._renew_slot(slot)
+        try:
+            result = fn(slot.page)
+        except _EXPECTED_ERRORS:
+            slot.pages_served += 1
+            raise
+        except Exception:
+            # Crash de pagina/contexto/navegador: reciclar antes del siguiente trabajo.
+            # Si el reciclaje falla, el que llama debe ver el error de la pagina, no ese.
+            logger.warning("Pool de navegador: error inesperado, reciclando contexto")
+            self._try_renew_slot(slot)
+            raise
+        slot.pages_served += 1
+        self.pool._count("pages_served")
+        if slot.pages_served >= self.pool.max_pages_per_context:
+            self._try_renew_slot(slot)
+        return result
+
+    def _try_renew_slot(self, slot: _Slot) -> None:
+        """Recicla el slot sin propagar errores: si falla, el slot queda sin contexto y se renueva en el siguiente uso."""
+        try:
+            self._renew_slot(slot)
+        except Exception as e:
+            logger.error(f"Pool de navegador: no se pudo reciclar el contexto: {e}")
+
+    def _shutdown(self) -> None:
+        for slot in list(self._idle) + list(self._leased.values()):
+            self._close_slot(slot)
+        self._idle.clear()
+        self._leased.clear()
+        try:
+            if self._browser is not None:
+                self._browser.close()
+        except PWError:
+            pass
+        self._browser = None
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
+import os
 import re
 from pathlib import Path
 from typing import List, Optional
 
-import openpyxl
-from bs4 import BeautifulSoup
 from playwright.sync_api import sync_playwright, TimeoutError as PWTimeoutError
 
+import page_index
+from xlsx_export import XlsxStreamWriter
+
+# Parser HTML: html.parser (defecto), lxml o selectolax (misma variable que secop_extract)
+HTML_PARSER = os.environ.get("SECOP_HTML_PARSER", page_index.DEFAULT_PARSER).strip() or page_index.DEFAULT_PARSER
+
+SECOP_BASE_URL = "https://www.contratos.gov.co/consultas/detalleProceso.do?numConstancia="
+
 
 def _norm_text(s: str) -> str:
     s = (s or "").lower()
@@ -28,23 +35,24 @@ def _pick_numeric_token(s: str) -> str:
     return max(tokens, key=len)
 
 
-def extract_cdp_from_html(html: str) -> str:
-    soup = BeautifulSoup(html, "html.parser")
+def extract_cdp_from_html(html: str, parser: Optional[str] = None) -> str:
+    """
+    CDP del detalle. Un parser desconocido lanza ValueError y uno sin su dependencia
+    ImportError (los maneja quien llama; el CLI los convierte en SystemExit).
+    """
+    idx = page_index.parse_html(html, parser or HTML_PARSER)
 
     # Buscar la seccion "Respaldos Presupuestales Asociados al Proceso"
-    for td in soup.find_all("td"):
-        if "tttablas" not in (td.get("class") or []):
+    for td in idx.section_headers:
+        if "respaldos presupuestales asociados al proceso" not in _norm_text(idx.text(td)):
             continue
-        if "respaldos presupuestales asociados al proceso" not in _norm_text(td.get_text()):
+        tables = idx.tables_after(td.row.pos, 1) if td.row else []
+        if not tables:
             continue
-        table = td.find_parent("tr").find_next("table")
-        if not table:
-            continue
-        rows = table.find_all("tr")
+        rows = tables[0].rows
         if len(rows) < 2:
             continue
-        header_cells = rows[0].find_all(["th", "td"])
-        header = [_norm_text(c.get_text()) for c in header_cells]
+        header = [_norm_text(t) for t in idx.texts(rows[0].cells)]
         try:
             idx_num = next(i for i, h in enumerate(header) if "numero" in h and "respaldo" in h)
         except StopIteration:
@@ -53,10 +61,10 @@ def extract_cdp_from_html(html: str) -> str:
             continue
         candidates: List[str] = []
         for r in rows[1:]:
-            cells = r.find_all(["th", "td"])
+            cells = r.cells
             if idx_num >= len(cells):
                 continue
-            token = _pick_numeric_token(cells[idx_num].get_text(" ", strip=True))
+            token = _pick_numeric_token(idx.text(cells[idx_num]))
             if token:
                 candidates.append(token)
         if candidates:
@@ -66,12 +74,11 @@ def extract_cdp_from_html(html: str) -> str:
             return max(candidates, key=len)
 
     # Fallback: buscar cualquier numero en el texto completo
-    text = soup.get_text(" ", strip=True)
-    return _pick_numeric_token(text)
+    return _pick_numeric_token(idx.text_space)
 
 
 def _fetch_detail_html(constancia: str, headless: bool = False, timeout_ms: int = 120_000) -> str:
-    url = f"https://www.contratos.gov.co/consultas/detalleProceso.do?numConstancia={constancia}"
+    url = f"{SECOP_BASE_URL}{constancia}"
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=headless)
         context = browser.new_context(viewport={"width": 1280, "height": 720})
@@ -90,46 +97,19 @@ def _fetch_detail_html(constancia: str, headless: bool = False, timeout_ms: int
             browser.close()
 
 
-def _find_next_row(ws) -> int:
-    headers = [c.value for c in ws[1]]
-    header_map = {_norm_text(str(h or "")): i + 1 for i, h in enumerate(headers)}
-    col_a = header_map.get(_norm_text("Numero de proceso (informativo)"), 1)
-    col_b = header_map.get(_norm_text("Numero de constancia"), 2)
-    for r in range(2, ws.max_row + 2):
-        a = ws.cell(row=r, column=col_a).value
-        b = ws.cell(row=r, column=col_b).value
-        if (a is None or str(a).strip() == "") and (b is None or str(b).strip() == ""):
-            return r
-    return ws.max_row + 1
-
-
-def _find_header_col(ws, header_name: str) -> Optional[int]:
-    target = _norm_text(header_name)
-    for idx, cell in enumerate(ws[1], start=1):
-        if _norm_text(str(cell.value or "")) == target:
-            return idx
-    return None
-
-
 def _write_cdp_to_template(template_path: Path, out_path: Path, cdp: str, constancia: str = "") -> Path:
-    wb = openpyxl.load_workbook(template_path)
-    if "Resultados_Extraccion" not in wb.sheetnames:
-        raise SystemExit("La plantilla no contiene la hoja 'Resultados_Extraccion'.")
-    ws = wb["Resultados_Extraccion"]
-    row_idx = _find_next_row(ws)
-
-    col_cdp = _find_header_col(ws, "Certificado de disponibilidad presupuestal")
-    if col_cdp is None:
+    try:
+        writer = XlsxStreamWriter(template_path, out_path, SECOP_BASE_URL)
+    except (FileNotFoundError, ValueError) as e:
+        raise SystemExit(str(e))
+    if writer.schema.column_of("Certificado de disponibilidad presupuestal") is None:
         raise SystemExit("No se encontro la columna 'Certificado de disponibilidad presupuestal' en la plantilla.")
-    ws.cell(row=row_idx, column=col_cdp, value=cdp)
 
+    record = {"Certificado de disponibilidad presupuestal": cdp}
     if constancia:
-        col_const = _find_header_col(ws, "Numero de constancia")
-        if col_const is not None:
-            ws.cell(row=row_idx, column=col_const, value=constancia)
-
-    wb.save(out_path)
-    return out_path
+        record["Numero de constancia"] = constancia
+    writer.write_record(constancia, record)
+    return writer.close()
 
 
 def main(
@@ -146,7 +126,10 @@ def main(
         html_source = html_path or default_html
         html = Path(html_source).read_text(encoding="utf-8", errors="ignore")
 
-    cdp = extract_cdp_from_html(html)
+    try:
+        cdp = extract_cdp_from_html(html)
+    except (ValueError, ImportError) as e:
+        raise SystemExit(str(e))
     if not cdp:
         raise SystemExit("No se pudo extraer el CDP.")
 
@@ -0,0 +1,198 @@
+# circuit_breaker.py
+"""
+Circuit breaker del lote ante bloqueos anti-DDoS / WAF de SECOP.
+
+Sin breaker, un bloqueo detiene el lote y el resto de constancias queda para un
+reintento manual. Con breaker el lote se "estaciona":
+1. El circuito se abre y se registra el incidente (hora, constancia, Incident ID de la
+   pagina de bloqueo).
+2. Se sondea el sitio con UNA peticion (la constancia bloqueada) con esperas que se
+   duplican: first_probe_seconds, 2x, 4x ... hasta max_probe_seconds.
+3. Si el sondeo responde bien el circuito se cierra, se registra el tiempo de
+   recuperacion y el lote sigue con lo que faltaba. Si tras max_wait_seconds el sitio
+   sigue bloqueando, el lote se detiene como antes (la bitacora permite reanudarlo).
+
+Los incidentes se guardan en un JSONL (una linea por evento: open, probe, recovered,
+gave_up) y read_incidents() los agrupa por incidente.
+
+Uso:
+    breaker = CircuitBreaker(log_path=Path("reports/blocks/incidents.jsonl"))
+    breaker.trip(constancia, message, html)
+    while (delay := breaker.next_probe_delay()) is not None:
+        time.sleep(delay)
+        ... if ok: breaker.recovered(); break
+        breaker.probe_failed(message, html)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+
+DEFAULT_FIRST_PROBE_SECONDS = 300.0
+DEFAULT_MAX_PROBE_SECONDS = 3600.0
+DEFAULT_MAX_WAIT_SECONDS = 8 * 3600.0
+
+# "Incident ID: 123456789", "Support ID is: 1234-5678", "Request ID: abc..."
+INCIDENT_ID_RE = re.compile(
+    r"(?:incident|support|request|reference)\s*id\s*(?:is)?\s*[:#]?\s*([A-Za-z0-9][A-Za-z0-9\-]{3,})",
+    re.IGNORECASE,
+)
+
+
+def parse_incident_id(html: str) -> str:
+    """Identificador del incidente que muestra la pagina de bloqueo ("" si no aparece)."""
+    m = INCIDENT_ID_RE.search(re.sub(r"<[^>]+>", " ", html or ""))
+    return m.group(1) if m else ""
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        first_probe_seconds: float = DEFAULT_FIRST_PROBE_SECONDS,
+        max_probe_seconds: float = DEFAULT_MAX_PROBE_SECONDS,
+        max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS,
+        log_path: Optional[Path] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.first_probe_seconds = float(first_probe_seconds)
+        self.max_probe_seconds = float(max_probe_seconds)
+        self.max_wait_seconds = float(max_wait_seconds)
+        self.log_path = Path(log_path) if log_path else None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.incident: Optional[Dict[str, Any]] = None
+        self.incidents = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    # -----------------------------
+    # Transiciones
+    # -----------------------------
+    def trip(self, constancia: str, message: str, html: str = "", parked: int = 0) -> Dict[str, Any]:
+        """Abre el circuito (bloqueo detectado). Retorna el incidente."""
+        with self._lock:
+            now = self._clock()
+            self.state = OPEN
+            self.incidents += 1
+            self.incident = {
+                "id": secrets.token_hex(6),
+                "constancia": constancia,
+                "incident_id": parse_incident_id(html),
+                "message": message,
+                "opened_at": now,
+                "probes": 0,
+                "parked": parked,
+            }
+            self._log("open", **{k: v for k, v in self.incident.items() if k != "probes"})
+            logger.warning(
+                f"Circuito abierto por bloqueo en {constancia} "
+                f"(incident id: {self.incident['incident_id'] or '-'}); {parked} constancia(s) en espera"
+            )
+            return dict(self.incident)
+
+    def next_probe_delay(self) -> Optional[float]:
+        """Espera antes del proximo sondeo, o None si ya se supero max_wait_seconds."""
+        with self._lock:
+            if self.incident is None:
+                return None
+            delay = min(self.first_probe_seconds * 2 ** self.incident["probes"], self.max_probe_seconds)
+            elapsed = self._clock() - self.incident["opened_at"]
+            if elapsed + delay > self.max_wait_seconds:
+                return None
+            return delay
+
+    def probe_failed(self, message: str, html: str = "") -> None:
+        with self._lock:
+            if self.incident is None:
+                return
+            self.incident["probes"] += 1
+            incident_id = parse_incident_id(html)
+            if incident_id:
+                self.incident["incident_id"] = incident_id
+            self._log("probe", id=self.incident["id"], probe=self.incident["probes"], ok=False,
+                      message=message, incident_id=incident_id)
+
+    def recovered(self) -> float:
+        """Cierra el circuito tras un sondeo exitoso. Retorna los segundos que duro el bloqueo."""
+        return self._close("recovered")
+
+    def give_up(self) -> float:
+        """Se agoto max_wait_seconds: el lote se detiene. Retorna los segundos de espera."""
+        return self._close("gave_up")
+
+    def _close(self, outcome: str) -> float:
+        with self._lock:
+            if self.incident is None:
+                return 0.0
+            now = self._clock()
+            duration = now - self.incident["opened_at"]
+            probes = self.incident["probes"] + (1 if outcome == "recovered" else 0)
+            self._log(outcome, id=self.incident["id"], closed_at=now, duration_seconds=round(duration, 1), probes=probes)
+            if outcome == "recovered":
+                logger.info(f"Circuito cerrado: SECOP respondio tras {duration:.0f} s y {probes} sondeo(s)")
+            else:
+                logger.warning(f"Bloqueo sin recuperacion tras {duration:.0f} s; el lote se detiene")
+            self.state = CLOSED
+            self.incident = None
+            return duration
+
+    # -----------------------------
+    # Persistencia
+    # -----------------------------
+    def _log(self, event: str, **fields: Any) -> None:
+        if self.log_path is None:
+            return
+        entry = {"event": event, "ts": self._clock(), **fields}
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.log_path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"No se pudo registrar el incidente de bloqueo: {e}")
+
+
+def read_incidents(path: Path) -> List[Dict[str, Any]]:
+    """Incidentes del JSONL agrupados (en orden de apertura), con su resultado y duracion."""
+    incidents: Dict[str, Dict[str, Any]] = {}
+    try:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return []
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        event = entry.pop("event", "")
+        incident = incidents.get(entry.get("id", ""))
+        if event == "open":
+            incidents[entry["id"]] = {**entry, "outcome": OPEN, "probes": 0}
+        elif incident is None:
+            continue
+        elif event == "probe":
+            incident["probes"] = entry.get("probe", incident["probes"])
+            if entry.get("incident_id"):
+                incident["incident_id"] = entry["incident_id"]
+        elif event in ("recovered", "gave_up"):
+            incident.update(
+                outcome=event,
+                closed_at=entry.get("closed_at"),
+                duration_seconds=entry.get("duration_seconds"),
+                probes=entry.get("probes", incident["probes"]),
+            )
+    return list(incidents.values())
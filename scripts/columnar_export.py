@@ -0,0 +1,199 @@
+# columnar_export.py
+"""
+Exportacion del lote en formatos columnares para bodegas de datos.
+
+Los registros se convierten con record_model.to_typed (valor en COP entero, fechas
+como fecha, estado como enum) y se escriben en streaming por bloques:
+- "csv": libreria estandar (fechas ISO, estado como su valor: "liquidado")
+- "parquet": pyarrow.parquet (requiere `pip install pyarrow`)
+- "arrow": archivo Arrow IPC / Feather v2 (requiere `pip install pyarrow`)
+
+Los archivos comparten el nombre del Excel del lote: Resultados_Extraccion_X.csv, etc.
+
+Uso:
+    paths = export_records(journal.records, out_path, ["csv", "parquet"])
+"""
+
+from __future__ import annotations
+
+import csv
+from datetime import date
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from record_model import COLUMNS, FIELDS, to_typed
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # formatos opcionales
+    pa = None
+    pq = None
+
+# formato -> extension
+EXPORT_FORMATS: Dict[str, str] = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+ARROW_FORMATS = ("parquet", "arrow")
+BATCH_ROWS = 5000
+
+Records = Iterable[Tuple[str, Dict[str, str]]]
+
+
+def available_formats() -> List[str]:
+    """Formatos que se pueden escribir con las librerias instaladas."""
+    return [f for f in EXPORT_FORMATS if pa is not None or f not in ARROW_FORMATS]
+
+
+def parse_formats(value: Any) -> List[str]:
+    """
+    Lista de formatos desde "csv,parquet" o ["csv", "parquet"] (sin repetir, en minusculas).
+    Lanza ValueError con un formato desconocido.
+    """
+    items = value.split(",") if isinstance(value, str) else list(value or [])
+    formats: List[str] = []
+    for item in items:
+        fmt = str(item).strip().lower()
+        if not fmt or fmt in formats:
+            continue
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Formato de exportacion desconocido: {fmt} (opciones: {', '.join(EXPORT_FORMATS)})")
+        formats.append(fmt)
+    return formats
+
+
+def check_formats(value: Any) -> List[str]:
+    """parse_formats + verifica que pyarrow este instalado si se pide parquet o arrow (ImportError)."""
+    formats = parse_formats(value)
+    for fmt in formats:
+        if fmt in ARROW_FORMATS:
+            _require_pyarrow(fmt)
+    return formats
+
+
+def export_path(out_path: Path, fmt: str) -> Path:
+    """Ruta del archivo `fmt` junto al Excel del lote (mismo nombre, otra extension)."""
+    return Path(out_path).with_suffix(EXPORT_FORMATS[fmt])
+
+
+def _typed_rows(records: Records) -> Iterator[Dict[str, Any]]:
+    for constancia, record in records:
+        yield to_typed(record, constancia)
+
+
+def _batches(rows: Iterator[Dict[str, Any]], size: int = BATCH_ROWS) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# -----------------------------
+# CSV
+# -----------------------------
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def write_csv(records: Records, path: Path) -> Path:
+    """CSV UTF-8 con BOM (Excel lo abre con tildes) y encabezados de COLUMNS."""
+    path = Path(path)
+    with path.open("w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for row in _typed_rows(records):
+            writer.writerow([_csv_value(row[name]) for name in COLUMNS])
+    return path
+
+
+# -----------------------------
+# Parquet / Arrow IPC
+# -----------------------------
+def _require_pyarrow(fmt: str) -> None:
+    if pa is None:
+        raise ImportError(f"El formato {fmt} requiere pyarrow (pip install pyarrow).")
+
+
+def arrow_schema():
+    """Esquema Arrow desde record_model.FIELDS (estado como diccionario)."""
+    _require_pyarrow("arrow")
+    types = {
+        "string": pa.string(),
+        "int64": pa.int64(),
+        "date": pa.date32(),
+        "estado": pa.dictionary(pa.int8(), pa.string()),
+    }
+    return pa.schema([pa.field(name, types[kind]) for name, _, kind in FIELDS])
+
+
+def _record_batch(schema, rows: List[Dict[str, Any]]):
+    columns = {
+        name: [row[name].value if isinstance(row[name], Enum) else row[name] for row in rows]
+        for name in COLUMNS
+    }
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def _write_batches(records: Records, schema, write: Callable[[Any], None]) -> None:
+    for rows in _batches(_typed_rows(records)):
+        write(_record_batch(schema, rows))
+
+
+def write_parquet(records: Records, path: Path) -> Path:
+    _require_pyarrow("parquet")
+    path = Path(path)
+    schema = arrow_schema()
+    with pq.ParquetWriter(str(path), schema) as writer:
+        _write_batches(records, schema, writer.write_batch)
+    return path
+
+
+def write_arrow(records: Records, path: Path) -> Path:
+    _require_pyarrow("arrow")
+    path = Path(path)
+    schema = arrow_schema()
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        _write_batches(records, schema, writer.write_batch)
+    return path
+
+
+_WRITERS: Dict[str, Callable[[Records, Path], Path]] = {
+    "csv": write_csv,
+    "parquet": write_parquet,
+    "arrow": write_arrow,
+}
+
+
+def export_records(
+    records: Callable[[], Records] | Records,
+    out_path: Path,
+    formats: Sequence[str],
+) -> Dict[str, Path]:
+    """
+    Escribe los registros en cada formato junto a out_path y devuelve {formato: ruta}.
+
+    `records` puede ser una funcion que devuelve el iterable (se llama una vez por
+    formato, p. ej. journal.records) o un iterable que se recorre una sola vez.
+    Lanza ValueError con un formato desconocido e ImportError si falta pyarrow.
+    """
+    formats = check_formats(formats)
+    if not callable(records):
+        rows = list(records) if len(formats) > 1 else records
+        records = lambda: rows  # noqa: E731
+    paths: Dict[str, Path] = {}
+    for fmt in formats:
+        paths[fmt] = _WRITERS[fmt](records(), export_path(out_path, fmt))
+    return paths
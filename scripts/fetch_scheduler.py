@@ -0,0 +1,129 @@
+# fetch_scheduler.py
+"""
+Descarga concurrente de detalles con varias sesiones (contextos) a la vez.
+
+Cada hilo del scheduler abre su propia sesion de detalle la primera vez que la
+necesita (un contexto de navegador con sus cookies, o un lease del pool) y la
+cierra al terminar; el API sync de Playwright queda asi en el hilo que la abrio.
+Los resultados se entregan en el orden de entrada y con a lo mas `lookahead`
+items en vuelo, para que quien consume (parseo + escritura del Excel) trabaje
+mientras los hilos esperan la red.
+
+El ritmo NO lo controla el scheduler: las sesiones comparten el limitador del
+host (rate_limit.limiter_for), asi N sesiones no superan el ritmo de una.
+
+Uso:
+    scheduler = FetchScheduler(lambda: _open_detail_session(...), workers=3)
+    with closing(scheduler.map(items, lambda fetch, item: fetch(item))) as results:
+        for item, outcome in results:
+            ...  # outcome es el resultado o la excepcion de ese item
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import ExitStack
+from typing import Any, Callable, ContextManager, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MAX_WORKERS = 8
+
+
+class SessionError(Exception):
+    """No se pudo abrir la sesion de un hilo (el error original queda en __cause__)."""
+
+
+class FetchScheduler:
+    def __init__(
+        self,
+        open_session: Callable[[], ContextManager[Callable[[str], str]]],
+        workers: int = 2,
+        lookahead: Optional[int] = None,
+    ):
+        self.open_session = open_session
+        self.workers = min(MAX_WORKERS, max(1, int(workers)))
+        self.lookahead = max(self.workers, int(lookahead or 2 * self.workers))
+        self.stats = {"sessions": 0, "items": 0}
+        self._stats_lock = threading.Lock()
+
+    def map(self, items: Iterable[T], fn: Callable[[Callable[[str], str], T], Any]) -> Iterator[Tuple[T, Any]]:
+        """
+        Ejecuta fn(fetch, item) en los hilos y entrega (item, resultado | excepcion) en orden.
+        `fetch` abre la sesion del hilo en su primer uso (SessionError si no se puede).
+        Cerrar el generador cancela lo pendiente y espera a que los hilos cierren sus sesiones.
+        """
+        jobs: "queue.Queue[Optional[Tuple[T, Future]]]" = queue.Queue()
+        threads = [
+            threading.Thread(target=self._worker, args=(jobs, fn), name=f"secop-fetch-{n}", daemon=True)
+            for n in range(1, self.workers + 1)
+        ]
+        for t in threads:
+            t.start()
+        in_flight: List[Tuple[T, Future]] = []
+        source = iter(items)
+        try:
+            while True:
+                while len(in_flight) < self.lookahead:
+                    try:
+                        item = next(source)
+                    except StopIteration:
+                        break
+                    fut: Future = Future()
+                    jobs.put((item, fut))
+                    in_flight.append((item, fut))
+                if not in_flight:
+                    return
+                item, fut = in_flight.pop(0)
+                try:
+                    outcome = fut.result()
+                except BaseException as e:
+                    outcome = e
+                yield item, outcome
+        finally:
+            for _, fut in in_flight:
+                fut.cancel()
+            for _ in threads:
+                jobs.put(None)
+            for t in threads:
+                t.join()
+
+    def _worker(self, jobs: "queue.Queue", fn: Callable[[Callable[[str], str], Any], Any]) -> None:
+        try:
+            self._serve(jobs, fn)
+        except Exception as e:
+            # Error al cerrar la sesion del hilo: los items ya se entregaron
+            logger.warning(f"Hilo de descarga termino con error: {e}")
+
+    def _serve(self, jobs: "queue.Queue", fn: Callable[[Callable[[str], str], Any], Any]) -> None:
+        with ExitStack() as stack:
+            session: List[Callable[[str], str]] = []
+
+            def fetch(constancia_ok: str) -> str:
+                if not session:
+                    try:
+                        session.append(stack.enter_context(self.open_session()))
+                    except Exception as e:
+                        raise SessionError(f"No se pudo abrir la sesion de detalle: {e}") from e
+                    with self._stats_lock:
+                        self.stats["sessions"] += 1
+                return session[0](constancia_ok)
+
+            while True:
+                job = jobs.get()
+                if job is None:
+                    break
+                item, fut = job
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                try:
+                    fut.set_result(fn(fetch, item))
+                except BaseException as e:
+                    fut.set_exception(e)
+                with self._stats_lock:
+                    self.stats["items"] += 1
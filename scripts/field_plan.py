@@ -0,0 +1,219 @@
+# field_plan.py
+"""
+Campos del registro como especificacion declarativa, compilada una vez en un plan.
+
+Cada Field declara de donde sale su valor (fuentes en orden de prioridad), el limpiador
+que se aplica al final, la columna del registro (None = campo auxiliar o extra) y su
+criticidad para la validacion. Fuentes:
+- labels(seccion, *sinonimos): rotulo de un mapa KV de la pagina (secciones del plan)
+- extractor(fn): funcion sobre el indice de la pagina (fn(idx) -> texto)
+- field(nombre): valor final de otro campo (p.ej. tipo de identificacion desde la identificacion)
+- param(nombre) / const(valor): dato de la llamada (constancia) o texto fijo
+
+Semantica de las fuentes: la primera que da un valor no vacio gana y las siguientes no se
+evaluan; si ninguna da valor queda el de la ultima (igual que `x = a; if not x: x = b`).
+
+FieldPlan compila los sinonimos de todas las fuentes labels en un solo indice
+(label_index.SynonymIndex). plan.bind(idx) entrega una evaluacion perezosa: las secciones
+se parsean y los campos se calculan solo cuando se piden, una vez por pagina. Con
+observe(nombre, segundos) se mide el tiempo propio de cada campo y seccion (sin contar
+las secciones o campos que dispara), asi el costo por campo suma el total del registro.
+
+Uso:
+    plan = FieldPlan(
+        [Field("objeto", "Objeto del contrato", [labels("contrato", "Objeto del Contrato", "Objeto")])],
+        sections={"contrato": lambda run: {...}},
+        normalize=_norm_key,
+    )
+    run = plan.bind(idx, constancia="25-1-1001")
+    run.get("objeto"); run.record()
+    run.values(plan.field_names({"objeto"}))   # registro parcial: {"Objeto del contrato": ...}
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import label_index
+
+CRITICAL = "critico"
+IMPORTANT = "importante"
+
+
+class Source:
+    def __init__(self, kind: str, arg: Any, synonyms: Tuple[str, ...] = ()):
+        self.kind = kind
+        self.arg = arg
+        self.synonyms = synonyms
+        self.key = ""  # clave en el indice de sinonimos (solo labels)
+
+
+def labels(section: str, *synonyms: str) -> Source:
+    return Source("labels", section, tuple(synonyms))
+
+
+def extractor(fn: Callable[[Any], Any]) -> Source:
+    return Source("extractor", fn)
+
+
+def field(name: str) -> Source:
+    return Source("field", name)
+
+
+def param(name: str) -> Source:
+    return Source("param", name)
+
+
+def const(value: Any) -> Source:
+    return Source("const", value)
+
+
+class Field:
+    def __init__(
+        self,
+        name: str,
+        column: Optional[str],
+        sources: Sequence[Source],
+        cleaner: Optional[Callable[[Any], Any]] = None,
+        criticality: Optional[str] = None,
+    ):
+        self.name = name
+        self.column = column
+        self.sources = tuple(sources)
+        self.cleaner = cleaner
+        self.criticality = criticality
+
+
+class FieldPlan:
+    def __init__(
+        self,
+        fields: Iterable[Field],
+        sections: Mapping[str, Callable[["PlanRun"], Dict[str, str]]],
+        normalize: Callable[[str], str],
+        observe: Optional[Callable[[str, float], None]] = None,
+    ):
+        self.fields: Dict[str, Field] = {}
+        self.sections = dict(sections)
+        self.observe = observe
+        # Sinonimos de cada fuente labels (campo:seccion -> lista), para el indice compartido
+        self.synonyms: Dict[str, List[str]] = {}
+        for f in fields:
+            if f.name in self.fields:
+                raise ValueError(f"Campo duplicado en el plan: {f.name}")
+            self.fields[f.name] = f
+            for source in f.sources:
+                if source.kind == "labels":
+                    if source.arg not in self.sections:
+                        raise ValueError(f"{f.name}: seccion desconocida {source.arg}")
+                    source.key = f"{f.name}:{source.arg}"
+                    self.synonyms[source.key] = list(source.synonyms)
+        for f in self.fields.values():
+            for source in f.sources:
+                if source.kind == "field" and source.arg not in self.fields:
+                    raise ValueError(f"{f.name}: depende de un campo desconocido {source.arg}")
+        self.index = label_index.SynonymIndex(self.synonyms, normalize)
+        self.columns: List[Tuple[str, str]] = [(f.column, f.name) for f in self.fields.values() if f.column]
+
+    def field_names(self, requested: Iterable[str]) -> List[str]:
+        """Nombres de campo (acepta nombre o columna) en el orden del plan; ValueError si alguno no existe."""
+        by_column = {f.column: f.name for f in self.fields.values() if f.column}
+        wanted = set()
+        unknown = []
+        for item in requested:
+            name = item if item in self.fields else by_column.get(item)
+            if name is None:
+                unknown.append(item)
+            else:
+                wanted.add(name)
+        if unknown:
+            raise ValueError(f"Campos desconocidos: {', '.join(map(str, unknown))} (opciones: {', '.join(self.fields)})")
+        return [name for name in self.fields if name in wanted]
+
+    def columns_with(self, criticality: str) -> List[str]:
+        """Columnas del registro con esa criticidad, en orden del registro."""
+        return [f.column for f in self.fields.values() if f.column and f.criticality == criticality]
+
+    def bind(self, idx: Any, **params: Any) -> "PlanRun":
+        return PlanRun(self, idx, params)
+
+
+class PlanRun:
+    """Evaluacion perezosa del plan sobre una pagina (cada campo y seccion se calcula una vez)."""
+
+    def __init__(self, plan: FieldPlan, idx: Any, params: Dict[str, Any]):
+        self.plan = plan
+        self.idx = idx
+        self.params = params
+        self._values: Dict[str, Any] = {}
+        self._sections: Dict[str, Dict[str, str]] = {}
+        self._resolved: Dict[str, label_index.ResolvedLabels] = {}
+        self._evaluating: List[str] = []
+        self._nested: List[float] = []
+
+    def _timed(self, name: str, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.plan.observe is None:
+            return fn(*args)
+        t0 = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - t0
+            inner = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            self.plan.observe(name, elapsed - inner)
+
+    def section(self, name: str) -> Dict[str, str]:
+        """Mapa rotulo normalizado -> valor de la seccion (se construye en el primer uso)."""
+        if name not in self._sections:
+            self._sections[name] = self._timed(f"seccion_{name}", self.plan.sections[name], self)
+        return self._sections[name]
+
+    def _labels(self, name: str) -> label_index.ResolvedLabels:
+        resolved = self._resolved.get(name)
+        if resolved is None:
+            resolved = self._resolved[name] = self.plan.index.resolve(self.section(name))
+        return resolved
+
+    def _source(self, source: Source) -> Any:
+        if source.kind == "labels":
+            return self._labels(source.arg).get(source.key)
+        if source.kind == "extractor":
+            return source.arg(self.idx)
+        if source.kind == "field":
+            return self.get(source.arg)
+        if source.kind == "param":
+            return self.params.get(source.arg, "")
+        return source.arg
+
+    def _evaluate(self, f: Field) -> Any:
+        value: Any = ""
+        for source in f.sources:
+            value = self._source(source)
+            if value:
+                break
+        return f.cleaner(value) if f.cleaner is not None else value
+
+    def get(self, name: str) -> Any:
+        if name in self._values:
+            return self._values[name]
+        if name in self._evaluating:
+            raise ValueError(f"Dependencia circular entre campos: {' -> '.join(self._evaluating + [name])}")
+        f = self.plan.fields[name]
+        self._evaluating.append(name)
+        try:
+            value = self._timed(name, self._evaluate, f)
+        finally:
+            self._evaluating.pop()
+        self._values[name] = value
+        return value
+
+    def values(self, names: Iterable[str]) -> Dict[str, Any]:
+        """Solo los campos pedidos, con la columna como clave (o el nombre si no tiene columna)."""
+        return {(self.plan.fields[name].column or name): self.get(name) for name in names}
+
+    def record(self) -> Dict[str, Any]:
+        """Columnas del registro en el orden del plan."""
+        return {column: self.get(name) for column, name in self.plan.columns}
@@ -0,0 +1,438 @@
+# html_cache.py
+"""
+Cache en disco del HTML de detalle SECOP, direccionado por contenido.
+
+Estructura:
+    <root>/index.jsonl                     diario: una linea por put ({constancia, sha256, fetched_at,
+                                           size, ttl_seconds, estado}) o borrado ({constancia, removed})
+    <root>/index.lock                      lock de archivo para escribir el diario
+    <root>/objects/<ab>/<sha256>.html.gz   HTML comprimido (un archivo por contenido distinto)
+
+- El indice es un diario de solo-agregar: cada put/borrado agrega lineas en vez de reescribir
+  todo. Las escrituras toman un lock de archivo y antes leen lo que otras instancias o
+  procesos agregaron, asi varias HtmlCache sobre la misma carpeta no se pisan. Cuando el
+  diario tiene mas del doble de lineas que entradas vivas se compacta.
+- Un index.json de versiones anteriores se importa al diario la primera vez.
+
+- Una entrada vence cuando su edad supera su TTL. El TTL de cada entrada lo decide la
+  FreshnessPolicy segun el registro extraido (estado del proceso y RP); sin registro se
+  usa el TTL general de la cache (ttl_seconds; 0 = no vence).
+- Si el total de objetos supera max_bytes se eliminan las entradas mas antiguas.
+- Los objetos que ya no referencia ninguna constancia se borran.
+- Solo se guarda HTML que produjo un registro (nunca paginas de bloqueo).
+
+Uso:
+    cache = HtmlCache(ROOT_DIR / "reports" / "html_cache")
+    html = cache.get("25-1-241304")
+    if html is None:
+        html = fetch(...)
+        cache.put("25-1-241304", html, record=record)
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 72 * 3600
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+INDEX_NAME = "index.jsonl"
+LEGACY_INDEX_NAME = "index.json"
+LOCK_NAME = "index.lock"
+# El diario se compacta con mas de este numero de lineas y mas del doble de lineas que entradas
+COMPACT_MIN_LINES = 1000
+
+DAY_SECONDS = 24 * 3600
+# Estados en los que el proceso ya no cambia en SECOP (prefijos normalizados)
+TERMINAL_STATES = ("liquidado", "terminado", "cerrado", "descartado", "declarado desierto", "revocado")
+# "Celebrado" con RP asignado: el contrato ya esta firmado y respaldado; cambia poco
+SETTLED_STATES = ("celebrado",)
+ESTADO_FIELD = "Estado del proceso"
+RP_FIELD = "Registro Presupuestal (RP)"
+
+
+def _norm_estado(s: str) -> str:
+    s = unicodedata.normalize("NFD", (s or "").strip().lower())
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    return " ".join(s.split())
+
+
+class FreshnessPolicy:
+    """
+    TTL por registro segun el estado del proceso:
+    - terminal (liquidado, terminado, ...): terminal_ttl
+    - celebrado con RP: settled_ttl
+    - cualquier otro estado conocido (convocado, adjudicado, celebrado sin RP, ...): active_ttl
+    - sin estado: None (la cache usa su TTL general)
+    """
+
+    def __init__(
+        self,
+        terminal_ttl: float = 365 * DAY_SECONDS,
+        settled_ttl: float = 30 * DAY_SECONDS,
+        active_ttl: float = 12 * 3600,
+    ):
+        self.terminal_ttl = float(terminal_ttl)
+        self.settled_ttl = float(settled_ttl)
+        self.active_ttl = float(active_ttl)
+
+    def ttl_for(self, record: Optional[Mapping[str, Any]]) -> Optional[float]:
+        estado = _norm_estado(str((record or {}).get(ESTADO_FIELD) or ""))
+        if not estado:
+            return None
+        if estado.startswith(TERMINAL_STATES):
+            return self.terminal_ttl
+        has_rp = bool(str((record or {}).get(RP_FIELD) or "").strip())
+        if estado.startswith(SETTLED_STATES) and has_rp:
+            return self.settled_ttl
+        return self.active_ttl
+
+
+def is_cache_dir(root: Path) -> bool:
+    """La carpeta tiene el indice de una HtmlCache (diario o index.json anterior)."""
+    root = Path(root)
+    return (root / INDEX_NAME).exists() or (root / LEGACY_INDEX_NAME).exists()
+
+
+@contextmanager
+def _locked_file(path: Path) -> Iterator[None]:
+    """Lock exclusivo entre procesos sobre `path` (flock en POSIX, msvcrt.locking en Windows)."""
+    with open(path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class HtmlCache:
+    def __init__(
+        self,
+        root: Path,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        freshness: Optional[FreshnessPolicy] = None,
+    ):
+        self.root = Path(root)
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_bytes = int(max_bytes)
+        self.freshness = freshness
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        # Constancias por objeto y tamano de cada objeto (desalojo y huerfanos sin recorrer el disco)
+        self._refs: Dict[str, int] = {}
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        # Posicion leida del diario, identidad del archivo (cambia al compactar) y lineas leidas
+        self._offset = 0
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._lines = 0
+        self._file_locked = False
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+
+    # -----------------------------
+    # Indice (con self._lock tomado)
+    # -----------------------------
+    @property
+    def _index_path(self) -> Path:
+        return self.root / INDEX_NAME
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if self._file_locked:
+            yield
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        with _locked_file(self.root / LOCK_NAME):
+            self._file_locked = True
+            try:
+                yield
+            finally:
+                self._file_locked = False
+
+    def _reset(self) -> None:
+        self._index = {}
+        self._refs = {}
+        self._sizes = {}
+        self._total_bytes = 0
+        self._offset = 0
+        self._file_id = None
+        self._lines = 0
+
+    def _apply(self, constancia: str, entry: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Aplica un put (entry) o borrado (None); retorna el sha256 que quedo sin constancias."""
+        old = self._index.pop(constancia, None)
+        if entry is not None:
+            self._index[constancia] = entry
+            sha = entry["sha256"]
+            if sha not in self._refs:
+                self._sizes[sha] = entry.get("size", 0)
+                self._total_bytes += self._sizes[sha]
+            self._refs[sha] = self._refs.get(sha, 0) + 1
+        if old is None:
+            return None
+        sha = old["sha256"]
+        self._refs[sha] -= 1
+        if self._refs[sha]:
+            return None
+        del self._refs[sha]
+        self._total_bytes -= self._sizes.pop(sha, 0)
+        return sha
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        """Indice al dia: lee solo las lineas completas que se agregaron al diario desde la ultima vez."""
+        try:
+            f = self._index_path.open("rb")
+        except FileNotFoundError:
+            if self._index is None or self._file_id is not None:
+                self._reset()
+                legacy = self.root / LEGACY_INDEX_NAME
+                if legacy.exists():
+                    self._import_legacy(legacy)
+            return self._index
+        with f:
+            # Identidad del archivo abierto (no de la ruta): si otro proceso compacto, se relee todo
+            st = os.fstat(f.fileno())
+            file_id = (st.st_dev, st.st_ino)
+            if self._index is None or file_id != self._file_id or st.st_size < self._offset:
+                self._reset()
+                self._file_id = file_id
+            if st.st_size <= self._offset:
+                return self._index
+            f.seek(self._offset)
+            data = f.read(st.st_size - self._offset)
+        end = data.rfind(b"\n") + 1  # una linea a medio escribir se lee la proxima vez
+        for line in data[:end].splitlines():
+            self._lines += 1
+            try:
+                item = json.loads(line)
+                constancia = item.pop("constancia")
+                self._apply(constancia, None if item.get("removed") else item)
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Linea ilegible en el indice de cache, se omite: {e}")
+        self._offset += end
+        return self._index
+
+    def _import_legacy(self, legacy: Path) -> None:
+        try:
+            entries = json.loads(legacy.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Indice de cache ilegible, se reinicia: {e}")
+            return
+        with self._file_lock():
+            if self._index_path.exists():  # otro proceso ya lo importo
+                self._load_index()
+                return
+            for constancia, entry in entries.items():
+                self._apply(constancia, entry)
+            self._rewrite_locked()
+        try:
+            legacy.unlink()
+        except OSError:
+            pass
+
+    def _append_locked(self, changes: Iterable[Tuple[str, Optional[Dict[str, Any]]]]) -> List[str]:
+        """Aplica y agrega al diario puts/borrados (con el lock de archivo); retorna los objetos huerfanos."""
+        orphans = []
+        lines = []
+        for constancia, entry in changes:
+            sha = self._apply(constancia, entry)
+            if sha is not None:
+                orphans.append(sha)
+            item = {"constancia": constancia, **entry} if entry is not None else {"constancia": constancia, "removed": True}
+            lines.append(json.dumps(item, ensure_ascii=False) + "\n")
+        if not lines:
+            return orphans
+        data = "".join(lines).encode("utf-8")
+        with self._index_path.open("ab") as f:
+            f.write(data)
+        st = self._index_path.stat()
+        self._file_id = (st.st_dev, st.st_ino)
+        self._offset += len(data)
+        self._lines += len(lines)
+        return orphans
+
+    def _rewrite_locked(self) -> None:
+        """Reescribe el diario con solo las entradas vivas (compactacion o importacion)."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self._index_path.with_suffix(".tmp")
+        data = "".join(
+            json.dumps({"constancia": c, **e}, ensure_ascii=False) + "\n" for c, e in self._index.items()
+        ).encode("utf-8")
+        tmp.write_bytes(data)
+        os.replace(tmp, self._index_path)
+        st = self._index_path.stat()
+        self._file_id = (st.st_dev, st.st_ino)
+        self._offset = len(data)
+        self._lines = len(self._index)
+
+    def _maybe_compact_locked(self) -> None:
+        if self._lines > COMPACT_MIN_LINES and self._lines > 2 * len(self._index):
+            try:
+                self._rewrite_locked()
+            except OSError as e:
+                logger.warning(f"No se pudo compactar el indice de cache: {e}")
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.root / "objects" / sha256[:2] / f"{sha256}.html.gz"
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        ttl = entry.get("ttl_seconds")
+        ttl = self.ttl_seconds if ttl is None else float(ttl)
+        return bool(ttl) and now - float(entry.get("fetched_at", 0)) > ttl
+
+    # -----------------------------
+    # API
+    # -----------------------------
+    def entry(self, constancia: str) -> Optional[Dict[str, Any]]:
+        """Metadatos vigentes de la constancia (None si no esta o vencio)."""
+        with self._lock:
+            entry = self._load_index().get(constancia)
+            if entry is None or self._expired(entry, time.time()):
+                return None
+            return dict(entry)
+
+    def contains(self, constancia: str) -> bool:
+        entry = self.entry(constancia)
+        return entry is not None and self._object_path(entry["sha256"]).exists()
+
+    def get(self, constancia: str) -> Optional[str]:
+        entry = self.entry(constancia)
+        html = None
+        if entry is not None:
+            try:
+                with gzip.open(self._object_path(entry["sha256"]), "rt", encoding="utf-8") as f:
+                    html = f.read()
+            except (OSError, EOFError) as e:
+                logger.warning(f"Objeto de cache ilegible para {constancia}: {e}")
+        with self._lock:
+            self.stats["misses" if html is None else "hits"] += 1
+        return html
+
+    def put(
+        self,
+        constancia: str,
+        html: str,
+        fetched_at: Optional[float] = None,
+        record: Optional[Mapping[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Guarda el HTML; con `record` y una FreshnessPolicy la entrada recibe su propio TTL."""
+        data = html.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self._object_path(sha256)
+        with self._lock, self._file_lock():
+            self._load_index()
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                with gzip.open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            entry = {
+                "sha256": sha256,
+                "fetched_at": time.time() if fetched_at is None else fetched_at,
+                "size": path.stat().st_size,
+            }
+            if record is not None:
+                entry["estado"] = str(record.get(ESTADO_FIELD) or "")
+                if self.freshness is not None:
+                    ttl = self.freshness.ttl_for(record)
+                    if ttl is not None:
+                        entry["ttl_seconds"] = ttl
+            self._drop_objects_locked(self._append_locked([(constancia, entry)]))
+            self.stats["writes"] += 1
+            self._evict_locked()
+            self._maybe_compact_locked()
+        return dict(entry)
+
+    def archived(self) -> List[Tuple[str, Path]]:
+        """(constancia, objeto .html.gz) de todas las entradas, vencidas o no (re-extraccion offline)."""
+        with self._lock:
+            items = [(c, self._object_path(e["sha256"])) for c, e in self._load_index().items()]
+        return [(c, path) for c, path in items if path.exists()]
+
+    def invalidate(self, constancia: str) -> None:
+        with self._lock, self._file_lock():
+            if constancia in self._load_index():
+                self._drop_objects_locked(self._append_locked([(constancia, None)]))
+                self._maybe_compact_locked()
+
+    def evict(self) -> int:
+        """Aplica TTL y limite de tamano; retorna cuantas entradas se eliminaron."""
+        with self._lock, self._file_lock():
+            self._load_index()
+            removed = self._evict_locked()
+            self._maybe_compact_locked()
+        return removed
+
+    # -----------------------------
+    # Desalojo (con self._lock y el lock de archivo tomados, indice al dia)
+    # -----------------------------
+    def _evict_locked(self) -> int:
+        index = self._index
+        now = time.time()
+        removed = [c for c, e in index.items() if self._expired(e, now)]
+        if self.max_bytes:
+            # Una sola pasada en orden de antiguedad: un objeto libera su tamano cuando sale
+            # la ultima constancia que lo referencia
+            doomed = set(removed)
+            refs = dict(self._refs)
+            total = self._total_bytes
+            for c in removed:
+                sha = index[c]["sha256"]
+                refs[sha] -= 1
+                if not refs[sha]:
+                    total -= self._sizes.get(sha, 0)
+            if total > self.max_bytes:
+                for c, e in sorted(index.items(), key=lambda kv: kv[1].get("fetched_at", 0)):
+                    if total <= self.max_bytes:
+                        break
+                    if c in doomed:
+                        continue
+                    removed.append(c)
+                    sha = e["sha256"]
+                    refs[sha] -= 1
+                    if not refs[sha]:
+                        total -= self._sizes.get(sha, 0)
+        if removed:
+            self.stats["evicted"] += len(removed)
+            self._drop_objects_locked(self._append_locked([(c, None) for c in removed]))
+        return len(removed)
+
+    def _drop_objects_locked(self, shas: Iterable[str]) -> None:
+        """Borra los objetos que quedaron sin constancias."""
+        for sha in shas:
+            try:
+                self._object_path(sha).unlink()
+            except OSError:
+                pass
@@ -0,0 +1,257 @@
+# job_queue.py
+"""
+Cola de trabajos en segundo plano para los lotes de la UI.
+
+Cada lote enviado a /extract se vuelve un trabajo con id propio que corre en un
+hilo de fondo; la peticion HTTP responde de inmediato y la UI consulta el estado.
+El estado se persiste como JSON (un archivo por trabajo) en cada cambio:
+
+    {
+      "id": "...", "status": "queued|running|done|failed",
+      "created_at": ..., "started_at": ..., "finished_at": ...,
+      "params": {...},              # datos del envio (constancias, modo, ...)
+      "total": N,
+      "items": {constancia: {"status": "ok|error", "message": "..."}},
+      "result": {...},              # lo que devuelve el runner al terminar
+      "error": "..."                # solo si status == failed
+    }
+
+Los trabajos corren uno a la vez (un solo navegador y un solo ritmo anti-bloqueo).
+Al reiniciar, los trabajos que quedaron en cola o corriendo se marcan como fallidos.
+
+Ademas del estado, cada trabajo tiene un flujo de eventos en memoria (los que emite el
+runner por constancia mas {"event": "job", "status": ...} en cada cambio de estado),
+numerados con "seq" para que la UI los siga por SSE con wait_events(job_id, after_seq).
+Los eventos con "status" (ok/error) actualizan tambien items[constancia].
+
+Uso:
+    queue = JobQueue(jobs_dir, runner).start()
+    job_id = queue.submit({"constancias": [...]}, total=len(constancias))
+    queue.get(job_id)["status"]
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED_STATES = (DONE, FAILED)
+
+DEFAULT_MAX_AGE_SECONDS = 24 * 3600
+
+# runner(job, emit) -> result; emit(event) publica un evento ({"event", "constancia", ...})
+Emitter = Callable[[Dict[str, Any]], None]
+Runner = Callable[[Dict[str, Any], Emitter], Dict[str, Any]]
+
+# Eventos que se conservan por trabajo (los mas viejos se descartan)
+MAX_EVENTS_PER_JOB = 5000
+
+
+class JobQueue:
+    def __init__(self, jobs_dir: Path, runner: Runner, max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS):
+        self.jobs_dir = Path(jobs_dir)
+        self.runner = runner
+        self.max_age_seconds = max_age_seconds
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        self._seq: Dict[str, int] = {}
+        self._pending: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    # -----------------------------
+    # Ciclo de vida
+    # -----------------------------
+    def start(self) -> "JobQueue":
+        if self._thread is not None:
+            return self
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self._recover()
+        self._thread = threading.Thread(target=self._worker, name="secop-jobs", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._pending.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    # -----------------------------
+    # API
+    # -----------------------------
+    def submit(self, params: Dict[str, Any], total: int = 0) -> str:
+        job_id = secrets.token_urlsafe(9)
+        job = {
+            "id": job_id,
+            "status": QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "params": params,
+            "total": total,
+            "items": {},
+            "result": None,
+            "error": "",
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._save(job)
+        self._pending.put(job_id)
+        logger.info(f"Trabajo {job_id} en cola ({total} item(s))")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Copia del estado del trabajo (memoria o disco); None si no existe."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._load(job_id)
+                if job is None:
+                    return None
+                self._jobs[job_id] = job
+            return json.loads(json.dumps(job))
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            self._save(job)
+            if "status" in fields:
+                self._publish_locked(job_id, {"event": "job", "status": job["status"], "error": job.get("error", "")})
+
+    def emit(self, job_id: str, event: Dict[str, Any]) -> None:
+        """Publica un evento del trabajo; si trae "status" registra el item de la constancia."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            status = event.get("status")
+            if status and event.get("constancia"):
+                job["items"][event["constancia"]] = {"status": status, "message": event.get("message", "")}
+                self._save(job)
+            self._publish_locked(job_id, dict(event))
+
+    def wait_events(self, job_id: str, after_seq: int = 0, timeout: float = 15.0) -> List[Dict[str, Any]]:
+        """
+        Eventos con seq > after_seq. Si no hay y el trabajo sigue activo, espera hasta
+        `timeout` segundos; retorna [] al vencer (o si el trabajo ya termino).
+        """
+        deadline = time.time() + timeout
+        with self._changed:
+            while True:
+                events = [e for e in self._events.get(job_id, []) if e["seq"] > after_seq]
+                if events:
+                    return [dict(e) for e in events]
+                job = self._jobs.get(job_id)
+                remaining = deadline - time.time()
+                if job is None or job["status"] in FINISHED_STATES or remaining <= 0:
+                    return []
+                self._changed.wait(remaining)
+
+    def _publish_locked(self, job_id: str, event: Dict[str, Any]) -> None:
+        seq = self._seq.get(job_id, 0) + 1
+        self._seq[job_id] = seq
+        event["seq"] = seq
+        event.setdefault("ts", time.time())
+        events = self._events.setdefault(job_id, [])
+        events.append(event)
+        if len(events) > MAX_EVENTS_PER_JOB:
+            del events[: len(events) - MAX_EVENTS_PER_JOB]
+        self._changed.notify_all()
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return sorted(
+                ({k: v for k, v in job.items() if k != "items"} for job in self._jobs.values()),
+                key=lambda j: j["created_at"],
+            )
+
+    def cleanup(self) -> int:
+        """Elimina trabajos terminados mas antiguos que max_age_seconds."""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                finished = job.get("finished_at")
+                if job["status"] in FINISHED_STATES and finished and now - finished > self.max_age_seconds:
+                    del self._jobs[job_id]
+                    self._events.pop(job_id, None)
+                    self._seq.pop(job_id, None)
+                    try:
+                        self._path(job_id).unlink()
+                    except OSError:
+                        pass
+                    removed += 1
+        return removed
+
+    # -----------------------------
+    # Persistencia
+    # -----------------------------
+    def _path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.json"
+
+    def _save(self, job: Dict[str, Any]) -> None:
+        path = self._path(job["id"])
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(job, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if not job_id or "/" in job_id or "\\" in job_id or job_id.startswith("."):
+            return None
+        try:
+            return json.loads(self._path(job_id).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _recover(self) -> None:
+        """Carga los trabajos persistidos; los que no terminaron quedan como fallidos."""
+        with self._lock:
+            for path in self.jobs_dir.glob("*.json"):
+                job = self._load(path.stem)
+                if job is None:
+                    continue
+                if job.get("status") not in FINISHED_STATES:
+                    job["status"] = FAILED
+                    job["error"] = "Trabajo interrumpido por reinicio de la aplicacion."
+                    job["finished_at"] = time.time()
+                    self._save(job)
+                self._jobs[job["id"]] = job
+
+    # -----------------------------
+    # Ejecucion (hilo de fondo)
+    # -----------------------------
+    def _worker(self) -> None:
+        while True:
+            job_id = self._pending.get()
+            if job_id is None:
+                return
+            self._run(job_id)
+
+    def _run(self, job_id: str) -> None:
+        self.update(job_id, status=RUNNING, started_at=time.time())
+        job = self.get(job_id)
+        try:
+            result = self.runner(job, lambda event: self.emit(job_id, event))
+        except Exception as e:
+            logger.error(f"Trabajo {job_id} fallido: {e}")
+            self.update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+            return
+        self.update(job_id, status=DONE, result=result or {}, finished_at=time.time())
+        logger.info(f"Trabajo {job_id} terminado")
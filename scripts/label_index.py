@@ -0,0 +1,128 @@
+# label_index.py
+"""
+Indice de sinonimos de rotulos (campo -> rotulos posibles en SECOP) compilado una vez.
+
+Las listas de sinonimos de cada campo ("Objeto del Contrato", "Objeto"...) se normalizan
+al importar y se compilan en un automata Aho-Corasick. Un mapa de rotulos de la pagina
+(rotulo normalizado -> valor) se resuelve con una sola pasada por rotulo: el automata
+encuentra todos los sinonimos contenidos en el rotulo, para todos los campos a la vez.
+
+Semantica por campo (igual que la busqueda anidada que reemplaza):
+1. Coincidencia exacta: el primer sinonimo (en orden de la lista) que sea un rotulo con valor.
+2. Si no hay: para cada sinonimo en orden, el primer rotulo (en orden del mapa) con valor
+   que lo contenga.
+
+Uso:
+    index = SynonymIndex({"objeto": ["Objeto del Contrato", "Objeto"]}, normalize=_norm_key)
+    labels = index.resolve(contrato_map)
+    labels.get("objeto")
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Mapping, Sequence, Set, Tuple
+
+
+class AhoCorasick:
+    """Automata de busqueda de varios patrones a la vez (todas las ocurrencias, con solape)."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        for pattern in patterns:
+            self._add(pattern)
+        self._link()
+
+    def _add(self, pattern: str) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += (len(self.patterns),)
+        self.patterns.append(pattern)
+
+    def _link(self) -> None:
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, nxt in self._goto[state].items():
+                pending.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> Set[int]:
+        """Indices de los patrones que aparecen en el texto."""
+        found: Set[int] = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class ResolvedLabels:
+    """Rotulos de un mapa ya cruzados con los sinonimos; get(campo) es una busqueda directa."""
+
+    def __init__(self, index: "SynonymIndex", exact: Dict[int, str], contains: Dict[int, str]):
+        self._index = index
+        self._exact = exact
+        self._contains = contains
+
+    def get(self, field: str) -> str:
+        ids = self._index.fields[field]
+        for i in ids:
+            if i in self._exact:
+                return self._exact[i]
+        for i in ids:
+            if i in self._contains:
+                return self._contains[i]
+        return ""
+
+
+class SynonymIndex:
+    def __init__(self, fields: Mapping[str, Sequence[str]], normalize: Callable[[str], str]):
+        self.normalize = normalize
+        patterns: Dict[str, int] = {}
+        self.fields: Dict[str, Tuple[int, ...]] = {}
+        for field, synonyms in fields.items():
+            ids: List[int] = []
+            for synonym in synonyms:
+                key = normalize(synonym)
+                if not key:
+                    continue
+                i = patterns.setdefault(key, len(patterns))
+                if i not in ids:
+                    ids.append(i)
+            self.fields[field] = tuple(ids)
+        self._matcher = AhoCorasick(patterns)
+
+    def resolve(self, labels: Mapping[str, str]) -> ResolvedLabels:
+        """Cruza un mapa rotulo normalizado -> valor con todos los sinonimos (una pasada por rotulo)."""
+        exact: Dict[int, str] = {}
+        contains: Dict[int, str] = {}
+        patterns = self._matcher.patterns
+        for label, value in labels.items():
+            if not value:
+                continue
+            for i in self._matcher.find(label):
+                contains.setdefault(i, value)
+                if patterns[i] == label:
+                    exact.setdefault(i, value)
+        return ResolvedLabels(self, exact, contains)
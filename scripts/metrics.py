@@ -0,0 +1,196 @@
+# metrics.py
+"""
+Tiempos del extractor como histogramas estilo Prometheus (sin dependencias).
+
+Los puntos calientes (navegacion, espera del selector, page.content(), parseo, cada
+extractor de campo, escritura de filas y wb.save) observan su duracion en un
+histograma del registro global. Dos salidas:
+- render(): texto de exposicion de Prometheus para GET /metrics en la UI
+  (acumulado desde que arranco el proceso)
+- TimingSummary: resumen de UN lote (n, total, promedio, p50, p95, max por metrica y
+  etiqueta) para la hoja de tiempos del libro. Mientras el lote corre, REGISTRY.summary()
+  recibe todas las observaciones del proceso; la UI corre un lote a la vez.
+
+Uso:
+    PARSE_SECONDS = metrics.histogram("secop_parse_seconds", "Parseo del HTML")
+    with PARSE_SECONDS.time():
+        ...
+    FIELD_SECONDS.observe(0.003, field="rp")
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Segundos: de extractores de campo (ms) a cargas de pagina lentas (minutos)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+SUMMARY_HEADERS = ["Metrica", "Etiquetas", "N", "Total (s)", "Promedio (ms)", "p50 (ms)", "p95 (ms)", "Max (ms)"]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    def __init__(self, registry: "Registry", name: str, help_text: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self._registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # etiquetas -> [conteo por bucket (no acumulado, + overflow), suma, conteo]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: etiquetas esperadas {self.labelnames}, recibidas {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+        self._registry._feed(self.name, _format_labels(zip(self.labelnames, key)), value)
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._series.items())
+        for key, (counts, total, count) in series:
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                labels = _format_labels(pairs + [("le", _format_number(bound))])
+                lines.append(f"{self.name}_bucket{{{labels}}} {cumulative}")
+            suffix = f"{{{_format_labels(pairs)}}}" if pairs else ""
+            lines.append(f"{self.name}_sum{suffix} {total!r}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class TimingSummary:
+    """Observaciones de un lote, para resumirlas en una tabla (hoja de tiempos)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[Tuple[str, str], List[float]] = {}
+
+    def add(self, name: str, labels: str, value: float) -> None:
+        with self._lock:
+            self._samples.setdefault((name, labels), []).append(value)
+
+    @staticmethod
+    def _quantile(ordered: List[float], q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def rows(self) -> List[List[Any]]:
+        """Una fila por metrica/etiqueta (SUMMARY_HEADERS), de mayor a menor tiempo total."""
+        with self._lock:
+            items = [(key, sorted(values)) for key, values in self._samples.items()]
+        rows = []
+        for (name, labels), ordered in items:
+            total = sum(ordered)
+            rows.append([
+                name,
+                labels,
+                len(ordered),
+                round(total, 3),
+                round(total / len(ordered) * 1000, 2),
+                round(self._quantile(ordered, 0.5) * 1000, 2),
+                round(self._quantile(ordered, 0.95) * 1000, 2),
+                round(ordered[-1] * 1000, 2),
+            ])
+        rows.sort(key=lambda r: -r[3])
+        return rows
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Histogram] = {}
+        self._summaries: List[TimingSummary] = []
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Histograma registrado con ese nombre (se crea en el primer uso)."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(self, name, help_text, labelnames, buckets)
+            return metric
+
+    @contextmanager
+    def summary(self) -> Iterator[TimingSummary]:
+        """Resumen que recibe las observaciones mientras dura el bloque."""
+        summary = TimingSummary()
+        with self._lock:
+            self._summaries.append(summary)
+        try:
+            yield summary
+        finally:
+            with self._lock:
+                self._summaries.remove(summary)
+
+    def _feed(self, name: str, labels: str, value: float) -> None:
+        summaries = self._summaries
+        if not summaries:
+            return
+        for summary in list(summaries):
+            summary.add(name, labels, value)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def histogram(name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.histogram(name, help_text, labelnames, buckets)
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,361 @@
+# offline_reextract.py
+"""
+Re-extraccion masiva OFFLINE sobre un archivo de paginas de detalle ya descargadas.
+
+Cuando cambia una heuristica de extraccion hay que volver a extraer miles de paginas
+guardadas sin tocar SECOP. Este CLI recorre el origen, reparte el parseo y la
+extraccion en un pool de procesos (por bloques de `--bloque` paginas) y escribe los
+registros en uno de los formatos de salida (xlsx, csv, parquet, arrow).
+
+Origenes soportados:
+- Carpeta con .html / .htm / .html.gz (recursiva)
+- Carpeta de la cache HTML (index.jsonl + objects/): la constancia sale del indice
+- Archivo .zip o .tar / .tar.gz / .tgz con esas paginas
+
+La constancia se toma del indice de la cache, del nombre del archivo (25-1-241304.html)
+o del primer numConstancia= que aparezca en el HTML.
+
+Con --campos solo se extraen esos campos del plan (p.ej. rp,cdp para conciliar): las
+demas columnas quedan vacias y no se evaluan sus secciones ni su validacion.
+
+Reporta el avance y el rendimiento (paginas/s) y lista las fallas por archivo; las
+fallas completas quedan en <salida>_fallas.csv (y en la hoja Errores si es xlsx).
+
+Uso:
+    python scripts/offline_reextract.py reports/html_cache --formato csv
+    python scripts/offline_reextract.py paginas.zip --procesos 8 --salida reextraccion.xlsx
+    python scripts/offline_reextract.py reports/html_cache --formato csv --campos rp,cdp
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import logging
+import os
+import re
+import sys
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import columnar_export
+import page_index
+import secop_extract
+from html_cache import HtmlCache, is_cache_dir
+
+logger = logging.getLogger(__name__)
+
+HTML_SUFFIXES = (".html", ".htm", ".html.gz", ".htm.gz")
+OUTPUT_FORMATS = ("xlsx",) + tuple(columnar_export.EXPORT_FORMATS)
+DEFAULT_CHUNK = 50
+PROGRESS_EVERY_SECONDS = 5.0
+
+NUM_CONSTANCIA_RE = re.compile(r"numConstancia=(\d{2}-\d{1,2}-\d{4,12})")
+CONSTANCIA_IN_NAME_RE = re.compile(r"(?<![\d-])(\d{2}-\d{1,2}-\d{4,12})(?![\d-])")
+
+# Unidad de trabajo: (nombre, constancia o "", origen)
+# origen: ("file", ruta) | ("zip", archivo, miembro) | ("bytes", contenido)
+WorkItem = Tuple[str, str, Tuple[Any, ...]]
+# Resultado: (nombre, constancia, registro o None, error)
+ItemResult = Tuple[str, str, Optional[Dict[str, str]], str]
+
+
+# -----------------------------
+# Origenes
+# -----------------------------
+def _is_html_name(name: str) -> bool:
+    return name.lower().endswith(HTML_SUFFIXES)
+
+
+def _constancia_from_name(name: str) -> str:
+    m = CONSTANCIA_IN_NAME_RE.search(Path(name).name)
+    return m.group(1) if m else ""
+
+
+def _is_tar(path: Path) -> bool:
+    return path.name.lower().endswith((".tar", ".tar.gz", ".tgz"))
+
+
+def collect_items(source: Path) -> Tuple[List[WorkItem], Callable[[], Iterator[WorkItem]]]:
+    """
+    Lista de trabajo del origen. Para .tar el contenido se lee en el proceso principal
+    (acceso secuencial) y se entrega con el iterador; el resto lo leen los procesos.
+    Retorna (items, iterador) con el mismo orden.
+    """
+    source = Path(source)
+    if source.is_dir() and is_cache_dir(source):
+        items = [(path.name, c, ("file", str(path))) for c, path in HtmlCache(source).archived()]
+    elif source.is_dir():
+        paths = sorted(p for p in source.rglob("*") if p.is_file() and _is_html_name(p.name))
+        items = [(str(p.relative_to(source)), _constancia_from_name(p.name), ("file", str(p))) for p in paths]
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zf:
+            names = [n for n in zf.namelist() if _is_html_name(n)]
+        items = [(n, _constancia_from_name(n), ("zip", str(source), n)) for n in names]
+    elif source.is_file() and _is_tar(source):
+        with tarfile.open(source) as tf:
+            names = [m.name for m in tf.getmembers() if m.isfile() and _is_html_name(m.name)]
+        items = [(n, _constancia_from_name(n), ("tar",)) for n in names]
+
+        def _iter_tar() -> Iterator[WorkItem]:
+            with tarfile.open(source) as tf:
+                for member in tf:
+                    if member.isfile() and _is_html_name(member.name):
+                        data = tf.extractfile(member).read()
+                        yield member.name, _constancia_from_name(member.name), ("bytes", data)
+
+        return items, _iter_tar
+    else:
+        raise secop_extract.SecopExtractionError(f"Origen no soportado: {source} (carpeta, .zip o .tar)")
+    return items, lambda: iter(items)
+
+
+# -----------------------------
+# Trabajo en cada proceso
+# -----------------------------
+_ZIPS: Dict[str, zipfile.ZipFile] = {}
+_PARSER: Optional[str] = None
+_FIELDS: Optional[List[str]] = None
+
+
+def _init_worker(parser: Optional[str], fields: Optional[List[str]] = None) -> None:
+    global _PARSER, _FIELDS
+    _PARSER = parser
+    _FIELDS = fields
+    logging.getLogger("secop_extract").setLevel(logging.WARNING)
+
+
+def _read_item(origin: Tuple[Any, ...]) -> bytes:
+    kind = origin[0]
+    if kind == "file":
+        return Path(origin[1]).read_bytes()
+    if kind == "zip":
+        zf = _ZIPS.get(origin[1])
+        if zf is None:
+            zf = _ZIPS[origin[1]] = zipfile.ZipFile(origin[1])
+        return zf.read(origin[2])
+    return origin[1]
+
+
+def extract_item(item: WorkItem) -> ItemResult:
+    """Lee, parsea y extrae una pagina; las fallas se devuelven como texto (no se lanzan)."""
+    name, constancia, origin = item
+    try:
+        data = _read_item(origin)
+        if name.lower().endswith(".gz"):
+            data = gzip.decompress(data)
+        html = secop_extract._decode_body(data, "")
+        if not constancia:
+            m = NUM_CONSTANCIA_RE.search(html)
+            constancia = m.group(1) if m else ""
+        if secop_extract._is_blocked_html(html):
+            return name, constancia, None, "Pagina de bloqueo anti-DDoS (no es un detalle)"
+        idx = secop_extract.parse_detail_html(html, parser=_PARSER)
+        if not idx.section_headers:
+            return name, constancia, None, "No es una pagina de detalle SECOP (sin secciones)"
+        return name, constancia, secop_extract.extract_fields(idx, _FIELDS, constancia), ""
+    except Exception as e:
+        return name, constancia, None, f"{type(e).__name__}: {e}"
+
+
+def _extract_chunk(items: List[WorkItem]) -> List[ItemResult]:
+    return [extract_item(item) for item in items]
+
+
+def _chunks(items: Iterator[WorkItem], size: int) -> Iterator[List[WorkItem]]:
+    chunk: List[WorkItem] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_results(
+    items: Iterator[WorkItem],
+    workers: int,
+    chunk_size: int = DEFAULT_CHUNK,
+    parser: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Iterator[ItemResult]:
+    """
+    Resultados en el orden del origen. Con workers > 1 los bloques se reparten en un
+    ProcessPoolExecutor con a lo sumo 2 bloques en vuelo por proceso (memoria acotada).
+    """
+    if workers <= 1:
+        _init_worker(parser, fields)
+        for chunk in _chunks(items, chunk_size):
+            yield from _extract_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(parser, fields)) as pool:
+        pending = deque()
+        for chunk in _chunks(items, chunk_size):
+            pending.append(pool.submit(_extract_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+# -----------------------------
+# Ejecucion
+# -----------------------------
+class ReextractRun:
+    """Consume los resultados, separa las fallas y lleva la cuenta de rendimiento."""
+
+    def __init__(self, total: int, report: Optional[Callable[[str], None]] = None):
+        self.total = total
+        self.report = report
+        self.processed = 0
+        self.ok = 0
+        self.failures: List[Tuple[str, str, str]] = []
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def records(self, results: Iterator[ItemResult]) -> Iterator[Tuple[str, Dict[str, str]]]:
+        for name, constancia, record, error in results:
+            self.processed += 1
+            if record is None:
+                self.failures.append((name, constancia, error))
+            else:
+                self.ok += 1
+                yield constancia, record
+            now = time.perf_counter()
+            if self.report and now - self._last_report >= PROGRESS_EVERY_SECONDS:
+                self._last_report = now
+                self.report(f"Procesadas {self.processed}/{self.total} ({self.pages_per_second:.1f} pag/s)")
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "processed": self.processed,
+            "ok": self.ok,
+            "failed": len(self.failures),
+            "seconds": round(self.elapsed, 2),
+            "pages_per_second": round(self.pages_per_second, 1),
+        }
+
+
+def _write_failures(failures: List[Tuple[str, str, str]], path: Path) -> None:
+    with path.open("w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["archivo", "constancia", "error"])
+        writer.writerows(failures)
+
+
+def reextract(
+    source: Path,
+    out_path: Path,
+    fmt: str = "xlsx",
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK,
+    parser: Optional[str] = None,
+    template_path: Optional[Path] = None,
+    report: Optional[Callable[[str], None]] = None,
+    fields: Optional[List[str]] = None,
+) -> Tuple[Path, ReextractRun]:
+    """
+    Re-extrae todas las paginas de `source` y escribe `out_path` en `fmt`.
+    fields limita la extraccion a esos campos del plan (la constancia siempre se incluye).
+    Retorna (ruta de salida, ReextractRun con resumen y fallas por archivo).
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise secop_extract.SecopExtractionError(f"Formato desconocido: {fmt} (opciones: {', '.join(OUTPUT_FORMATS)})")
+    if fmt != "xlsx":
+        secop_extract._check_export_formats([fmt])
+    if parser is not None and parser not in page_index.PARSER_BACKENDS:
+        raise secop_extract.SecopExtractionError(f"Parser desconocido: {parser}")
+    if fields is not None:
+        try:
+            fields = secop_extract.FIELD_PLAN.field_names(set(fields) | {"constancia"})
+        except ValueError as e:
+            raise secop_extract.SecopExtractionError(str(e)) from e
+    workers = workers or os.cpu_count() or 1
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    items, iterate = collect_items(source)
+    run = ReextractRun(len(items), report=report)
+    records = run.records(iter_results(iterate(), workers, chunk_size=chunk_size, parser=parser, fields=fields))
+
+    if fmt == "xlsx":
+        if template_path is None:
+            template_path = secop_extract.TEMPLATES_DIR / "Plantilla_Salida_EXTRACTOR_SECOP_v1.2.10.xlsx"
+        writer = secop_extract._open_results_writer(template_path, out_path)
+        try:
+            writer.write_records(records)
+            writer.write_errors([(constancia or name, error) for name, constancia, error in run.failures])
+        except BaseException:
+            writer.discard()
+            raise
+        writer.close()
+    else:
+        out_path = secop_extract._export_columnar(records, out_path, [fmt])[fmt]
+
+    if run.failures:
+        _write_failures(run.failures, out_path.with_name(f"{out_path.stem}_fallas.csv"))
+    return out_path, run
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-extraccion offline de paginas de detalle SECOP guardadas.")
+    parser.add_argument("origen", help="Carpeta con HTML, carpeta de la cache HTML o archivo .zip/.tar")
+    parser.add_argument("--formato", default="xlsx", choices=OUTPUT_FORMATS)
+    parser.add_argument("--salida", default="", help="Archivo de salida (por defecto reports/offline/Reextraccion_<fecha>)")
+    parser.add_argument("--procesos", type=int, default=0, help="Procesos del pool (por defecto: nucleos)")
+    parser.add_argument("--bloque", type=int, default=DEFAULT_CHUNK, help="Paginas por bloque de trabajo")
+    parser.add_argument("--parser", default=None, choices=page_index.PARSER_BACKENDS)
+    parser.add_argument("--campos", default="", help="Solo estos campos del plan, separados por coma (p.ej. rp,cdp)")
+    parser.add_argument("--max-fallas", type=int, default=20, help="Fallas a listar en consola")
+    args = parser.parse_args(argv)
+
+    out_path = Path(args.salida) if args.salida else (
+        secop_extract.ROOT_DIR / "reports" / "offline" / f"Reextraccion_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    )
+    ext = ".xlsx" if args.formato == "xlsx" else columnar_export.EXPORT_FORMATS[args.formato]
+    out_path = out_path.with_suffix(ext)
+
+    try:
+        out_path, run = reextract(
+            Path(args.origen),
+            out_path,
+            fmt=args.formato,
+            workers=args.procesos or None,
+            chunk_size=max(1, args.bloque),
+            parser=args.parser,
+            fields=[f.strip() for f in args.campos.split(",") if f.strip()] or None,
+            report=lambda msg: print(msg, file=sys.stderr, flush=True),
+        )
+    except secop_extract.SecopExtractionError as e:
+        parser.error(str(e))
+
+    s = run.summary()
+    print(f"Salida: {out_path}")
+    print(f"Paginas: {s['processed']} | OK: {s['ok']} | Fallas: {s['failed']} | {s['seconds']} s | {s['pages_per_second']} pag/s")
+    for name, constancia, error in run.failures[: args.max_fallas]:
+        print(f"  FALLA {name}{f' ({constancia})' if constancia else ''}: {error}")
+    if len(run.failures) > args.max_fallas:
+        print(f"  ... {len(run.failures) - args.max_fallas} mas en {out_path.stem}_fallas.csv")
+    return 1 if run.failures else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    sys.exit(main())
@@ -0,0 +1,343 @@
+# page_index.py
+"""
+Indice de una pagina de detalle SECOP construido en una sola pasada sobre el arbol HTML.
+
+Los extractores de secop_extract consultan este indice (tablas, filas, celdas, encabezados
+de seccion td.tttablas y vistas de texto completo) en lugar de recorrer el arbol en cada campo.
+Los textos de celda y las vistas de texto se calculan una sola vez y a demanda.
+
+Semantica (equivalente a los recorridos con BeautifulSoup que reemplaza):
+- Table.rows: todas las filas descendientes de la tabla (incluye tablas anidadas), en orden.
+- Row.cells: todas las celdas th/td descendientes de la fila (tr.find_all(["th", "td"])).
+- Row.direct / Row.direct_td: celdas hijas directas (th/td y solo td).
+- Cell.row: fila ancestro mas cercana (td.find_parent("tr")).
+- pos: orden de documento entre table/tr/td/th; "tablas despues de X" = pos mayor.
+
+Backends de parseo (parse_html):
+- "html.parser": BeautifulSoup con el parser de la libreria estandar (por defecto).
+- "lxml": BeautifulSoup sobre lxml (requiere `pip install lxml`).
+- "selectolax": arbol lexbor de selectolax (requiere `pip install selectolax`); los textos
+  se calculan con la misma regla que get_text(sep, strip=True) de BeautifulSoup.
+
+Recorte previo (parse_html(..., slice_content=True)):
+Las secciones de la pagina son filas de una misma tabla y las ultimas ("Documentos del
+Proceso", "Hitos del Proceso") son mas de la mitad del HTML; ningun campo se lee de esas
+secciones. slice_html() corta el HTML crudo en el <tr> del primer encabezado omitible, solo
+si despues de el no queda ninguna otra seccion; el arbol de lo anterior no cambia (los
+parsers cierran las etiquetas abiertas al final). Si el indice recortado no tiene
+exactamente los encabezados esperados se parsea la pagina completa.
+Ojo: las consultas de pagina completa (tablas, filas, vistas de texto) tampoco ven lo
+recortado, asi que los extractores que caen en ellas pueden dar otro valor cuando el dato
+solo aparece al final (paginas degradadas). Por eso el recorte es opcional.
+"""
+
+from __future__ import annotations
+
+import html as html_lib
+import re
+import unicodedata
+from bisect import bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # backend opcional
+    LexborHTMLParser = None
+
+_INDEXED_TAGS = ["table", "tr", "td", "th"]
+SECTION_HEADER_CLASS = "tttablas"
+
+PARSER_BACKENDS = ("html.parser", "lxml", "selectolax")
+DEFAULT_PARSER = "html.parser"
+
+# Texto que BeautifulSoup no incluye en get_text() (scripts, estilos, plantillas)
+_LEXBOR_SKIP_TEXT = {"script", "style", "template"}
+
+# Secciones finales que ningun campo usa (texto normalizado del encabezado td.tttablas)
+SKIPPABLE_SECTIONS = ("documentos del proceso", "hitos del proceso")
+_SECTION_HEADER_RE = re.compile(
+    r"<td\b[^>]*\bclass\s*=\s*[\"']?[^\"'>]*\b" + SECTION_HEADER_CLASS + r"\b[^>]*>(.*?)</td\s*>", re.I | re.S
+)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+class Cell:
+    __slots__ = ("node", "name", "pos", "classes", "row")
+
+    def __init__(self, node: Any, name: str, pos: int, classes: List[str]):
+        self.node = node
+        self.name = name
+        self.pos = pos
+        self.classes = classes
+        self.row: Optional["Row"] = None
+
+
+class Row:
+    __slots__ = ("pos", "in_table", "cells", "direct", "direct_td")
+
+    def __init__(self, pos: int):
+        self.pos = pos
+        self.in_table = False
+        self.cells: List[Cell] = []
+        self.direct: List[Cell] = []
+        self.direct_td: List[Cell] = []
+
+
+class Table:
+    __slots__ = ("pos", "rows")
+
+    def __init__(self, pos: int):
+        self.pos = pos
+        self.rows: List[Row] = []
+
+
+class PageIndex:
+    """Estructura indexada de la pagina + caches de texto y de consultas derivadas (memo)."""
+
+    def __init__(self, soup: Any):
+        self.soup = soup
+        self.tables: List[Table] = []
+        self.rows: List[Row] = []
+        self.section_headers: List[Cell] = []
+        # Cache libre para consultas derivadas de los extractores (clave -> resultado)
+        self.memo: Dict[Any, Any] = {}
+        self._table_pos: List[int] = []
+        self._texts: Dict[int, str] = {}
+        self._textareas: Dict[int, Optional[str]] = {}
+        self._strings: Optional[List[str]] = None
+        self._text_space: Optional[str] = None
+        self._text_newline: Optional[str] = None
+        self._text_lines: Optional[List[str]] = None
+        # True si se construyo sobre el HTML recortado (slice_html)
+        self.sliced = False
+
+    # -----------------------------
+    # Acceso al arbol (BeautifulSoup; LexborPageIndex los redefine)
+    # -----------------------------
+    def _node_strings(self, node: Any) -> List[str]:
+        return list(node.stripped_strings)
+
+    def _node_text(self, node: Any, sep: str) -> str:
+        return node.get_text(sep, strip=True)
+
+    def _find_textarea(self, node: Any) -> Any:
+        return node.find("textarea")
+
+    # -----------------------------
+    # Textos (cacheados)
+    # -----------------------------
+    def text(self, cell: Cell) -> str:
+        """Equivale a cell.get_text(" ", strip=True)."""
+        t = self._texts.get(cell.pos)
+        if t is None:
+            t = self._node_text(cell.node, " ")
+            self._texts[cell.pos] = t
+        return t
+
+    def textarea_text(self, cell: Cell) -> Optional[str]:
+        """Texto del primer textarea dentro de la celda (None si no hay)."""
+        if cell.pos not in self._textareas:
+            textarea = self._find_textarea(cell.node)
+            self._textareas[cell.pos] = self._node_text(textarea, "\n") if textarea is not None else None
+        return self._textareas[cell.pos]
+
+    def texts(self, cells: List[Cell]) -> List[str]:
+        return [self.text(c) for c in cells]
+
+    @property
+    def page_strings(self) -> List[str]:
+        """Textos de la pagina sin espacios de borde, en orden (un solo recorrido del arbol)."""
+        if self._strings is None:
+            self._strings = self._node_strings(self.soup)
+        return self._strings
+
+    @property
+    def text_space(self) -> str:
+        """Texto completo de la pagina unido con espacios (soup.get_text(" ", strip=True))."""
+        if self._text_space is None:
+            self._text_space = " ".join(self.page_strings)
+        return self._text_space
+
+    @property
+    def text_newline(self) -> str:
+        """Texto completo de la pagina unido con saltos de linea (soup.get_text("\\n", strip=True))."""
+        if self._text_newline is None:
+            self._text_newline = "\n".join(self.page_strings)
+        return self._text_newline
+
+    @property
+    def text_lines(self) -> List[str]:
+        """Lineas no vacias de la pagina (soup.get_text("\\n", strip=True).splitlines())."""
+        if self._text_lines is None:
+            self._text_lines = self.text_newline.splitlines()
+        return self._text_lines
+
+    # -----------------------------
+    # Consultas estructurales
+    # -----------------------------
+    def table_rows(self) -> List[Row]:
+        """Filas que pertenecen a alguna tabla, en orden de documento (sin duplicados)."""
+        return [r for r in self.rows if r.in_table]
+
+    def tables_after(self, pos: int, limit: int) -> List[Table]:
+        """Primeras `limit` tablas que empiezan despues de pos (equivale a find_all_next("table", limit))."""
+        i = bisect_right(self._table_pos, pos)
+        return self.tables[i:i + limit]
+
+    # -----------------------------
+    # Construccion
+    # -----------------------------
+    def _add_table(self, pos: int) -> Table:
+        t = Table(pos)
+        self.tables.append(t)
+        self._table_pos.append(pos)
+        return t
+
+
+class LexborPageIndex(PageIndex):
+    """PageIndex sobre un arbol de selectolax (lexbor); `soup` es el nodo raiz."""
+
+    def _node_text(self, node: Any, sep: str) -> str:
+        return sep.join(self._node_strings(node))
+
+    def _node_strings(self, node: Any) -> List[str]:
+        parts = []
+        for n in node.traverse(include_text=True):
+            if n.tag != "-text":
+                continue
+            parent = n.parent
+            if parent is not None and parent.tag in _LEXBOR_SKIP_TEXT:
+                continue
+            t = (n.text_content or "").strip()
+            if t:
+                parts.append(t)
+        return parts
+
+    def _find_textarea(self, node: Any) -> Any:
+        return node.css_first("textarea")
+
+
+def _populate(
+    idx: PageIndex,
+    elements: Iterable[Any],
+    name_of: Callable[[Any], str],
+    key: Callable[[Any], Any],
+    classes: Callable[[Any], List[str]],
+) -> PageIndex:
+    """Llena el indice a partir de los elementos table/tr/td/th en orden de documento."""
+    tables: Dict[Any, Table] = {}
+    rows: Dict[Any, Row] = {}
+    for pos, el in enumerate(elements):
+        name = name_of(el)
+        if name == "table":
+            tables[key(el)] = idx._add_table(pos)
+            continue
+        ancestors = []
+        anc = el.parent
+        while anc is not None:
+            ancestors.append(anc)
+            anc = anc.parent
+        if name == "tr":
+            row = Row(pos)
+            rows[key(el)] = row
+            idx.rows.append(row)
+            for anc in ancestors:
+                table = tables.get(key(anc))
+                if table is not None:
+                    table.rows.append(row)
+                    row.in_table = True
+            continue
+        cell = Cell(el, name, pos, classes(el))
+        for anc in ancestors:
+            row = rows.get(key(anc))
+            if row is None:
+                continue
+            row.cells.append(cell)
+            if cell.row is None:
+                cell.row = row
+        parent = ancestors[0] if ancestors else None
+        if parent is not None and cell.row is not None and rows.get(key(parent)) is cell.row:
+            cell.row.direct.append(cell)
+            if name == "td":
+                cell.row.direct_td.append(cell)
+        if name == "td" and SECTION_HEADER_CLASS in cell.classes:
+            idx.section_headers.append(cell)
+    return idx
+
+
+def build_index(soup: Any) -> PageIndex:
+    """Construye el indice recorriendo una sola vez las etiquetas table/tr/td/th del arbol."""
+    return _populate(
+        PageIndex(soup),
+        soup.find_all(_INDEXED_TAGS),
+        name_of=lambda el: el.name,
+        key=id,
+        classes=lambda el: el.get("class") or [],
+    )
+
+
+def build_index_lexbor(tree: Any) -> PageIndex:
+    """Igual que build_index, sobre un documento de selectolax (LexborHTMLParser)."""
+    root = tree.root
+    wanted = set(_INDEXED_TAGS)
+    return _populate(
+        LexborPageIndex(root),
+        (n for n in root.traverse() if n.tag in wanted),
+        name_of=lambda n: n.tag,
+        key=lambda n: n.mem_id,
+        classes=lambda n: (n.attributes.get("class") or "").split(),
+    )
+
+
+def _header_key(raw: str) -> str:
+    text = unicodedata.normalize("NFD", html_lib.unescape(_TAG_RE.sub(" ", raw)).lower())
+    return " ".join("".join(ch for ch in text if unicodedata.category(ch) != "Mn").split())
+
+
+def slice_html(html: str) -> Optional[Tuple[str, int]]:
+    """
+    Corta el HTML antes de las secciones omitibles (SKIPPABLE_SECTIONS) del final.
+    Retorna (html recortado, encabezados de seccion que deben quedar) o None si no aplica:
+    no hay secciones omitibles, hay otra seccion despues de ellas o no se ubica el <tr>.
+    """
+    headers = list(_SECTION_HEADER_RE.finditer(html))
+    cut = next((i for i, m in enumerate(headers) if _header_key(m.group(1)) in SKIPPABLE_SECTIONS), None)
+    if not cut:
+        return None
+    if any(_header_key(m.group(1)) not in SKIPPABLE_SECTIONS for m in headers[cut:]):
+        return None
+    row_start = html.lower().rfind("<tr", headers[cut - 1].end(), headers[cut].start())
+    if row_start < 0:
+        return None
+    return html[:row_start], cut
+
+
+def parse_html(html: str, backend: str = DEFAULT_PARSER, slice_content: bool = False) -> PageIndex:
+    """
+    Parsea el HTML con el backend indicado y devuelve su indice. Con slice_content se parsea
+    solo hasta las secciones omitibles; si el resultado no valida se parsea todo.
+    """
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Parser HTML no soportado: {backend!r} (opciones: {', '.join(PARSER_BACKENDS)})")
+    if slice_content:
+        sliced = slice_html(html)
+        if sliced is not None:
+            idx = _parse(sliced[0], backend)
+            if len(idx.section_headers) == sliced[1]:
+                idx.sliced = True
+                return idx
+    return _parse(html, backend)
+
+
+def _parse(html: str, backend: str) -> PageIndex:
+    if backend == "selectolax":
+        if LexborHTMLParser is None:
+            raise ImportError("El parser 'selectolax' requiere: pip install selectolax")
+        return build_index_lexbor(LexborHTMLParser(html))
+    from bs4 import BeautifulSoup, FeatureNotFound
+
+    try:
+        soup = BeautifulSoup(html, backend)
+    except FeatureNotFound:
+        raise ImportError(f"El parser '{backend}' requiere: pip install {backend}") from None
+    return build_index(soup)
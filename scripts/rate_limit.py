@@ -0,0 +1,331 @@
+# rate_limit.py
+"""
+Ritmo de peticiones a SECOP: token bucket por host con adaptacion AIMD.
+
+Cada host tiene un balde de fichas que se rellena a `rate` fichas/s (hasta `burst`).
+Pedir un detalle consume una ficha; si no hay, se espera lo necesario (con jitter).
+El ritmo se adapta a lo que responde el sitio:
+- Exito con latencia normal: aumento aditivo (el lote acelera mientras el sitio esta sano)
+- Exito lento (latencia > slow_factor x promedio y ademas > promedio + slow_min_seconds, o
+  > slow_latency_seconds): disminucion multiplicativa suave. El promedio es por ruta
+  (on_success(latency, source)): una pagina por navegador tarda mucho mas que una por HTTP
+  y no debe leerse como un sitio lento. Las primeras latency_warmup respuestas de cada ruta
+  solo alimentan el promedio, y el margen absoluto evita que un tropiezo de decimas de
+  segundo (GIL, GC) sobre un promedio muy bajo cuente como lentitud
+- Error del lado del servidor (timeout, red, 5xx): la tasa cae a la mitad y hay una
+  pausa que se duplica con cada error seguido (hasta backoff_max_seconds)
+- Bloqueo anti-DDoS: tasa minima y pausa maxima; al recuperarse (circuit breaker) se
+  vuelve al ritmo inicial del perfil
+Los errores que no son del servidor (parseo, proceso inexistente) no cambian el ritmo.
+
+Los perfiles (RateProfile) reemplazan los modos fijos de la UI ("normal", "seguro").
+El estado es por host y se comparte entre lotes del mismo proceso (limiter_for), asi
+un lote nuevo no arranca a toda velocidad justo despues de un bloqueo.
+
+Uso:
+    limiter = limiter_for("www.contratos.gov.co", PROFILES["normal"])
+    wait = limiter.reserve()          # segundos a esperar antes de pedir
+    ...
+    limiter.on_success(latency, "http")   # o on_server_error() / on_block()
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class RateProfile:
+    """
+    Limites del ritmo en segundos entre peticiones (mas natural que fichas/s):
+    - initial_interval: ritmo de arranque (arranque lento en vez de una pausa fija)
+    - min_interval: lo mas rapido que se permite pedir
+    - max_interval: lo mas lento al que baja el ritmo adaptativo
+    - backoff_max_seconds: pausa maxima tras errores del servidor o un bloqueo
+    - increase_steps: peticiones sanas para pasar del ritmo inicial al maximo
+    - slow_factor / slow_min_seconds: una respuesta es lenta si supera slow_factor x el
+      promedio de su ruta y ademas el promedio + slow_min_seconds
+    - latency_warmup: respuestas por ruta antes de compararlas con el promedio
+    """
+
+    def __init__(
+        self,
+        name: str,
+        label: str,
+        initial_interval: float,
+        min_interval: float,
+        max_interval: float,
+        backoff_max_seconds: float,
+        burst: float = 1.0,
+        increase_steps: int = 20,
+        slow_factor: float = 2.0,
+        slow_latency_seconds: float = 30.0,
+        jitter: float = 0.2,
+        slow_min_seconds: float = 1.0,
+        latency_warmup: int = 3,
+    ):
+        self.name = name
+        self.label = label
+        self.initial_interval = float(initial_interval)
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self.backoff_max_seconds = float(backoff_max_seconds)
+        self.burst = float(burst)
+        self.increase_steps = max(1, int(increase_steps))
+        self.slow_factor = float(slow_factor)
+        self.slow_latency_seconds = float(slow_latency_seconds)
+        self.jitter = float(jitter)
+        self.slow_min_seconds = float(slow_min_seconds)
+        self.latency_warmup = max(0, int(latency_warmup))
+
+    @property
+    def unlimited(self) -> bool:
+        return self.initial_interval <= 0
+
+    @classmethod
+    def from_delay(cls, delay_seconds: float, backoff_max_seconds: float) -> "RateProfile":
+        """Perfil equivalente a los parametros antiguos (pausa fija entre peticiones)."""
+        if delay_seconds <= 0:
+            return cls("sin_pausa", "Sin pausa", 0, 0, 0, 0)
+        return cls(
+            "personalizado",
+            f"Pausa de {delay_seconds:g} s",
+            initial_interval=delay_seconds,
+            min_interval=delay_seconds / 3,
+            max_interval=max(delay_seconds, backoff_max_seconds),
+            backoff_max_seconds=backoff_max_seconds,
+        )
+
+
+PROFILES: Dict[str, RateProfile] = {
+    "normal": RateProfile(
+        "normal",
+        "Normal (adaptativo, mas rapido)",
+        initial_interval=10.0,
+        min_interval=2.0,
+        max_interval=120.0,
+        backoff_max_seconds=120.0,
+        burst=2.0,
+    ),
+    "seguro": RateProfile(
+        "seguro",
+        "Seguro (anti-bloqueo)",
+        initial_interval=30.0,
+        min_interval=10.0,
+        max_interval=600.0,
+        backoff_max_seconds=600.0,
+    ),
+}
+DEFAULT_PROFILE = "normal"
+
+# Peso de la ultima latencia en el promedio movil
+LATENCY_EWMA_ALPHA = 0.3
+# Disminucion multiplicativa ante una respuesta lenta / un error del servidor
+SLOW_DECREASE = 0.75
+ERROR_DECREASE = 0.5
+
+
+def get_profile(name: Optional[str]) -> RateProfile:
+    """Perfil por nombre (el perfil por defecto si no existe)."""
+    return PROFILES.get((name or "").strip().lower(), PROFILES[DEFAULT_PROFILE])
+
+
+class HostRateLimiter:
+    """Token bucket de un host con AIMD. Seguro entre hilos."""
+
+    def __init__(
+        self,
+        profile: RateProfile,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None,
+    ):
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self.profile = profile
+        self.rate = self._rate_for(profile.initial_interval)
+        self.tokens = 1.0  # la primera peticion sale sin esperar
+        self._updated = clock()
+        self._cooldown_until = 0.0
+        self.consecutive_errors = 0
+        # Promedio movil de latencia por ruta ("http", "browser"; "" = sin distinguir)
+        self.latency_avg: Dict[str, float] = {}
+        self.latency_samples: Dict[str, int] = {}
+        self.stats = {"requests": 0, "waited_seconds": 0.0, "server_errors": 0, "blocks": 0, "slow": 0}
+
+    # -----------------------------
+    # Ritmo
+    # -----------------------------
+    @staticmethod
+    def _rate_for(interval: float) -> float:
+        return 1.0 / interval if interval > 0 else float("inf")
+
+    @property
+    def min_rate(self) -> float:
+        return self._rate_for(self.profile.max_interval)
+
+    @property
+    def max_rate(self) -> float:
+        return self._rate_for(self.profile.min_interval)
+
+    @property
+    def interval(self) -> float:
+        """Segundos entre peticiones al ritmo actual."""
+        return 1.0 / self.rate if self.rate > 0 and self.rate != float("inf") else 0.0
+
+    def _clamp(self, rate: float) -> float:
+        return min(self.max_rate, max(self.min_rate, rate))
+
+    def _refill_locked(self, now: float) -> None:
+        if self.rate != float("inf"):
+            self.tokens = min(self.profile.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_profile(self, profile: RateProfile) -> None:
+        """Cambia de perfil conservando el estado (la pausa vigente se acota al nuevo maximo)."""
+        with self._lock:
+            if profile is self.profile:
+                return
+            now = self._clock()
+            self._refill_locked(now)
+            was_unlimited = self.profile.unlimited
+            self.profile = profile
+            if profile.unlimited:
+                self.rate = float("inf")
+            else:
+                self.rate = self._rate_for(profile.initial_interval) if was_unlimited else self._clamp(self.rate)
+            self.tokens = min(self.tokens, profile.burst) if not profile.unlimited else 1.0
+            self._cooldown_until = min(self._cooldown_until, now + profile.backoff_max_seconds)
+
+    def reserve(self) -> float:
+        """
+        Reserva una ficha y retorna los segundos a esperar antes de pedir (0 si hay ficha).
+        Las reservas se encolan: dos llamadas seguidas esperan una detras de la otra.
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            if self.profile.unlimited:
+                return 0.0
+            now = self._clock()
+            self._refill_locked(now)
+            cooldown = max(0.0, self._cooldown_until - now)
+            # Fichas al terminar la pausa vigente; si falta, se espera a completar una
+            available = min(self.profile.burst, self.tokens + cooldown * self.rate)
+            extra = (1.0 - available) / self.rate if available < 1.0 else 0.0
+            wait = cooldown + extra
+            # Saldo expresado al momento actual (puede ser negativo: reservas en cola)
+            self.tokens = available + extra * self.rate - 1.0 - wait * self.rate
+            if wait > 0 and self.profile.jitter:
+                wait *= self._rng.uniform(1.0 - self.profile.jitter, 1.0 + self.profile.jitter)
+            self.stats["waited_seconds"] += wait
+            return wait
+
+    def cooldown_remaining(self) -> float:
+        with self._lock:
+            return max(0.0, self._cooldown_until - self._clock())
+
+    # -----------------------------
+    # Senales del sitio
+    # -----------------------------
+    def on_success(self, latency: float, source: str = "") -> None:
+        """
+        Respuesta valida: aumento aditivo, o disminucion suave si fue lenta. La latencia se
+        compara solo con el promedio de la misma ruta (source), despues de su calentamiento.
+        """
+        with self._lock:
+            self.consecutive_errors = 0
+            if self.profile.unlimited:
+                return
+            avg = self.latency_avg.get(source)
+            samples = self.latency_samples.get(source, 0)
+            threshold = (
+                max(self.profile.slow_factor * avg, avg + self.profile.slow_min_seconds)
+                if avg is not None and samples >= self.profile.latency_warmup
+                else None
+            )
+            slow = latency > self.profile.slow_latency_seconds or (threshold is not None and latency > threshold)
+            self.latency_samples[source] = samples + 1
+            self.latency_avg[source] = latency if avg is None else (
+                LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * avg
+            )
+            if slow:
+                self.stats["slow"] += 1
+                self.rate = self._clamp(self.rate * SLOW_DECREASE)
+            else:
+                step = (self.max_rate - self._rate_for(self.profile.initial_interval)) / self.profile.increase_steps
+                self.rate = self._clamp(self.rate + max(step, 0.0))
+
+    def on_server_error(self) -> float:
+        """Error del servidor (timeout, red, 5xx): tasa a la mitad y pausa creciente. Retorna la pausa."""
+        with self._lock:
+            self.stats["server_errors"] += 1
+            self.consecutive_errors += 1
+            if self.profile.unlimited:
+                return 0.0
+            self.rate = self._clamp(self.rate * ERROR_DECREASE)
+            pause = min(
+                self.profile.initial_interval * 2 ** (self.consecutive_errors - 1),
+                self.profile.backoff_max_seconds,
+            )
+            self._cooldown_until = max(self._cooldown_until, self._clock() + pause)
+            return pause
+
+    def on_block(self) -> float:
+        """Bloqueo anti-DDoS: tasa minima y pausa maxima. Retorna la pausa."""
+        with self._lock:
+            self.stats["blocks"] += 1
+            self.consecutive_errors += 1
+            if self.profile.unlimited:
+                return 0.0
+            self.rate = self.min_rate
+            pause = self.profile.backoff_max_seconds
+            self._cooldown_until = max(self._cooldown_until, self._clock() + pause)
+            return pause
+
+    def on_recovered(self) -> None:
+        """
+        El sitio volvio a responder tras un bloqueo: sin pausa pendiente y de vuelta al ritmo
+        inicial del perfil (no a la tasa minima: en "seguro" serian 600 s por peticion y un
+        solo bloqueo frenaria el resto de un lote grande por horas).
+        """
+        with self._lock:
+            self.consecutive_errors = 0
+            self._cooldown_until = 0.0
+            if not self.profile.unlimited:
+                self.rate = self._clamp(self._rate_for(self.profile.initial_interval))
+                self.tokens = min(self.tokens, 0.0)
+                self._updated = self._clock()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "profile": self.profile.name,
+                "interval": round(self.interval, 2),
+                "cooldown": round(max(0.0, self._cooldown_until - self._clock()), 1),
+                "latency_avg": {k: round(v, 2) for k, v in self.latency_avg.items()},
+                **{k: round(v, 1) if isinstance(v, float) else v for k, v in self.stats.items()},
+            }
+
+
+_LIMITERS: Dict[str, HostRateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def limiter_for(host: str, profile: RateProfile) -> HostRateLimiter:
+    """Limitador compartido del host (se crea en el primer uso; toma el perfil indicado)."""
+    key = (host or "").lower()
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(key)
+        if limiter is None:
+            limiter = _LIMITERS[key] = HostRateLimiter(profile)
+            return limiter
+    limiter.set_profile(profile)
+    return limiter
+
+
+def reset_limiters() -> None:
+    """Olvida el estado de todos los hosts (pruebas / reinicio manual)."""
+    with _LIMITERS_LOCK:
+        _LIMITERS.clear()
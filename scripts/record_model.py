@@ -0,0 +1,182 @@
+# record_model.py
+"""
+Modelo tipado del registro de extraccion (lo que devuelve _build_record_from_soup).
+
+El registro de la plantilla es todo texto; para cargarlo en bodegas de datos se
+convierte a columnas con tipo:
+- valor_contrato_cop: entero (COP)
+- fecha_inicio / fecha_terminacion: fecha (datetime.date) desde "17 de marzo de 2025",
+  "17/03/2025" o "2025-03-17"
+- estado: EstadoProceso (enum); el texto original queda en estado_texto
+
+FIELDS define el orden y el tipo de cada columna (string, int64, date, estado).
+Un valor que no se puede interpretar queda en None (nunca se inventa).
+
+Uso:
+    typed = to_typed(record)
+    typed["valor_contrato_cop"]   # 496510063
+    typed["fecha_inicio"]         # datetime.date(2025, 3, 17)
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from datetime import date
+from enum import Enum
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+
+class EstadoProceso(str, Enum):
+    BORRADOR = "borrador"
+    CONVOCADO = "convocado"
+    ADJUDICADO = "adjudicado"
+    CELEBRADO = "celebrado"
+    LIQUIDADO = "liquidado"
+    TERMINADO_ANORMALMENTE = "terminado_anormalmente"
+    TERMINADO = "terminado"
+    SUSPENDIDO = "suspendido"
+    DESCARTADO = "descartado"
+    DESIERTO = "desierto"
+    REVOCADO = "revocado"
+    OTRO = "otro"
+
+
+# Prefijo normalizado del texto de SECOP -> estado (el orden importa: lo mas especifico primero)
+_ESTADO_PREFIXES: List[Tuple[str, EstadoProceso]] = [
+    ("borrador", EstadoProceso.BORRADOR),
+    ("convocado", EstadoProceso.CONVOCADO),
+    ("adjudicado", EstadoProceso.ADJUDICADO),
+    ("celebrado", EstadoProceso.CELEBRADO),
+    ("liquidado", EstadoProceso.LIQUIDADO),
+    ("terminado anormalmente", EstadoProceso.TERMINADO_ANORMALMENTE),
+    ("terminado", EstadoProceso.TERMINADO),
+    ("suspendido", EstadoProceso.SUSPENDIDO),
+    ("descartado", EstadoProceso.DESCARTADO),
+    ("declarado desierto", EstadoProceso.DESIERTO),
+    ("desierto", EstadoProceso.DESIERTO),
+    ("revocado", EstadoProceso.REVOCADO),
+]
+
+MESES = {
+    "enero": 1,
+    "febrero": 2,
+    "marzo": 3,
+    "abril": 4,
+    "mayo": 5,
+    "junio": 6,
+    "julio": 7,
+    "agosto": 8,
+    "septiembre": 9,
+    "setiembre": 9,
+    "octubre": 10,
+    "noviembre": 11,
+    "diciembre": 12,
+}
+
+_FECHA_TEXTO_RE = re.compile(r"(\d{1,2})\s+de\s+([a-z]+)\s+(?:de(?:l)?\s+)?(\d{4})")
+_FECHA_DMY_RE = re.compile(r"(\d{1,2})[/-](\d{1,2})[/-](\d{4})")
+_FECHA_ISO_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+
+# (columna, clave en el registro, tipo)
+FIELDS: List[Tuple[str, str, str]] = [
+    ("numero_constancia", "Numero de constancia", "string"),
+    ("numero_proceso", "Numero de proceso (informativo)", "string"),
+    ("tipo_gasto", "Tipo de Gasto", "string"),
+    ("estado", "Estado del proceso", "estado"),
+    ("estado_texto", "Estado del proceso", "string"),
+    ("modalidad_contratacion", "Modalidad de contratacion", "string"),
+    ("fuente_financiacion", "Fuente de financiacion", "string"),
+    ("registro_presupuestal", "Registro Presupuestal (RP)", "string"),
+    ("cdp", "Certificado de disponibilidad presupuestal", "string"),
+    ("numero_contrato", "Numero de contrato", "string"),
+    ("objeto_contrato", "Objeto del contrato", "string"),
+    ("valor_contrato_cop", "Valor del contrato (COP)", "int64"),
+    ("plazo_ejecucion", "Plazo de ejecucion", "string"),
+    ("fecha_inicio", "Fecha de inicio", "date"),
+    ("fecha_terminacion", "Fecha de terminacion", "date"),
+    ("razon_social_contratista", "Razon social del proponente/contratista", "string"),
+    ("tipo_identificacion", "Tipo de identificacion", "string"),
+    ("identificacion_contratista", "Identificacion del proponente/contratista", "string"),
+    ("representante_legal", "Representante legal", "string"),
+    ("identificacion_representante_legal", "Identificacion del representante legal", "string"),
+    ("codigo_bpim", "Codigo BPIM", "string"),
+    ("fuente_documento", "Fuente del documento", "string"),
+    ("estado_validacion", "Estado de validacion", "string"),
+    ("observaciones", "Observaciones", "string"),
+]
+COLUMNS = [name for name, _, _ in FIELDS]
+
+
+def _norm(s: str) -> str:
+    s = unicodedata.normalize("NFD", (s or "").strip().lower())
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    return " ".join(s.replace(":", "").split())
+
+
+def parse_estado(text: str) -> Optional[EstadoProceso]:
+    estado = _norm(text)
+    if not estado:
+        return None
+    for prefix, value in _ESTADO_PREFIXES:
+        if estado.startswith(prefix):
+            return value
+    return EstadoProceso.OTRO
+
+
+def parse_cop(text: Any) -> Optional[int]:
+    """Entero COP desde el valor ya limpio del registro (solo digitos)."""
+    if isinstance(text, int):
+        return text
+    digits = re.sub(r"\D", "", str(text or ""))
+    return int(digits) if digits else None
+
+
+def _make_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def parse_fecha(text: Any) -> Optional[date]:
+    if isinstance(text, date):
+        return text
+    s = _norm(str(text or ""))
+    if not s:
+        return None
+    m = _FECHA_TEXTO_RE.search(s)
+    if m and m.group(2) in MESES:
+        return _make_date(int(m.group(3)), MESES[m.group(2)], int(m.group(1)))
+    m = _FECHA_ISO_RE.search(s)
+    if m:
+        return _make_date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+    m = _FECHA_DMY_RE.search(s)
+    if m:
+        return _make_date(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+    return None
+
+
+_PARSERS = {
+    "int64": parse_cop,
+    "date": parse_fecha,
+    "estado": parse_estado,
+}
+
+# Claves del registro que usa el modelo, normalizadas (el registro mezcla claves con y sin tildes)
+_SOURCE_KEYS = {_norm(source) for _, source, _ in FIELDS}
+
+
+def to_typed(record: Mapping[str, Any], constancia: str = "") -> Dict[str, Any]:
+    """Registro tipado en el orden de FIELDS (estado como EstadoProceso)."""
+    by_key = {_norm(k): v for k, v in record.items() if _norm(k) in _SOURCE_KEYS}
+    typed: Dict[str, Any] = {}
+    for name, source, kind in FIELDS:
+        raw = by_key.get(_norm(source))
+        if kind == "string":
+            typed[name] = "" if raw is None else str(raw)
+        else:
+            typed[name] = _PARSERS[kind](raw)
+    if constancia and not typed["numero_constancia"]:
+        typed["numero_constancia"] = constancia
+    return typed
@@ -2,30 +2,54 @@
 from __future__ import annotations
 
 import re
+import gzip
+import json
 import time
-import random
+import logging
+import os
+import http.client
+import threading
 import unicodedata
+from functools import lru_cache
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional, Any
-
-import openpyxl
-from bs4 import BeautifulSoup
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Set, Tuple, Optional, Any
+from urllib.parse import urlsplit
 
 from playwright.sync_api import sync_playwright, TimeoutError as PWTimeoutError
 
+import batch_pipeline
+import circuit_breaker
+import columnar_export
+import fetch_scheduler
+import field_plan
+import metrics
+import page_index
+import rate_limit
+from batch_journal import BatchJournal
+from html_cache import DAY_SECONDS, FreshnessPolicy, HtmlCache
+from page_index import PageIndex, Table, build_index
+from xlsx_export import XlsxStreamWriter, read_errors, read_results
+
+logger = logging.getLogger(__name__)
 
 # -----------------------------
 # Paths
 # -----------------------------
 ROOT_DIR = Path(__file__).resolve().parents[1]
 TEMPLATES_DIR = ROOT_DIR / "templates"
+READINESS_DIR = ROOT_DIR / "reports" / "readiness"
+HTML_CACHE_DIR = ROOT_DIR / "reports" / "html_cache"
+# Bitacoras de lote (dentro de la carpeta de salida) para reanudar tras un corte
+JOURNAL_DIRNAME = "_journal"
 
 
 # -----------------------------
 # Configuracion
 # -----------------------------
 SECOP_BASE_URL = "https://www.contratos.gov.co/consultas/detalleProceso.do?numConstancia="
+SECOP_HOST = urlsplit(SECOP_BASE_URL).hostname
 
 # Constancia tipo: 25-1-241304, 25-15-14542595, etc.
 # Nota: en la practica SECOP I usa yy-m-xxxxxx o yy-mm-xxxxxx; toleramos 1-2 digitos en el bloque "xx".
@@ -43,6 +67,121 @@ BLOCK_MARKERS = [
     "incident id",
 ]
 
+# Señales de detalle inexistente (solo se consideran si no hay tablas de detalle)
+NOT_FOUND_MARKERS = [
+    "no se encontro el proceso",
+    "no se encontraron resultados",
+    "el proceso no existe",
+    "no existe el proceso",
+]
+
+# Filtro de recursos del contexto: el extractor solo lee el HTML de las tablas.
+# SECOP_BLOCK_RESOURCES=0 desactiva el filtro; SECOP_BLOCK_RESOURCE_TYPES ajusta los tipos abortados.
+BLOCK_RESOURCES = os.environ.get("SECOP_BLOCK_RESOURCES", "1").strip() != "0"
+BLOCKED_RESOURCE_TYPES = {
+    t.strip().lower()
+    for t in os.environ.get("SECOP_BLOCK_RESOURCE_TYPES", "image,media,font,stylesheet").split(",")
+    if t.strip()
+}
+# Hosts propios del portal (documento principal y scripts de la pagina)
+SECOP_HOSTS = ("contratos.gov.co",)
+# Hosts que reCAPTCHA necesita (se permite todo lo que cuelgue de /recaptcha)
+RECAPTCHA_HOSTS = ("google.com", "gstatic.com", "recaptcha.net")
+
+# Ruta rapida HTTP: tras el primer detalle en el navegador, el resto del lote se pide por HTTP
+# reutilizando las cookies de la sesion. SECOP_HTTP_FAST_PATH=0 la desactiva.
+HTTP_FAST_PATH = os.environ.get("SECOP_HTTP_FAST_PATH", "1").strip() != "0"
+HTTP_TIMEOUT_SECONDS = 30.0
+# Fallos HTTP consecutivos tras los que el lote sigue solo con navegador
+HTTP_MAX_FALLBACKS = 2
+# Señales de desafio reCAPTCHA (solo cuentan si la respuesta no trae tablas de detalle)
+CAPTCHA_MARKERS = [
+    "g-recaptcha",
+    "recaptcha/api2",
+    "grecaptcha.render",
+    "captcha",
+]
+
+# Circuit breaker ante bloqueos: el lote espera y sondea en vez de detenerse.
+# SECOP_BREAKER=0 vuelve a detener el lote en el primer bloqueo.
+BREAKER_ENABLED = os.environ.get("SECOP_BREAKER", "1").strip() != "0"
+BREAKER_FIRST_PROBE_SECONDS = float(os.environ.get("SECOP_BREAKER_FIRST_PROBE_SECONDS", "300"))
+BREAKER_MAX_PROBE_SECONDS = float(os.environ.get("SECOP_BREAKER_MAX_PROBE_SECONDS", "3600"))
+BREAKER_MAX_WAIT_HOURS = float(os.environ.get("SECOP_BREAKER_MAX_WAIT_HOURS", "8"))
+BLOCK_INCIDENTS_PATH = Path(
+    os.environ.get("SECOP_BLOCK_INCIDENTS", str(ROOT_DIR / "reports" / "blocks" / "incidents.jsonl"))
+)
+
+# Sesiones de detalle en paralelo para lo que no esta en cache (1 = secuencial). Todas
+# comparten el limitador del host: mas sesiones solapan latencia, no suben el ritmo.
+FETCH_WORKERS = int(os.environ.get("SECOP_FETCH_WORKERS", "1"))
+# Etapas del lote (batch_pipeline): hilos de parseo y tamano de las colas entre etapas.
+# El parseo solo se solapa con la descarga (GIL): mas de 1 hilo no lo paraleliza
+PARSE_WORKERS = int(os.environ.get("SECOP_PARSE_WORKERS", str(batch_pipeline.DEFAULT_PARSE_WORKERS)))
+PIPELINE_QUEUE_SIZE = int(os.environ.get("SECOP_PIPELINE_QUEUE", str(batch_pipeline.DEFAULT_QUEUE_SIZE)))
+
+# Hoja "Tiempos" con el resumen de tiempos del lote en el libro de salida
+TIMING_SHEET = os.environ.get("SECOP_TIMING_SHEET", "1").strip() != "0"
+
+# Histogramas de tiempos (GET /metrics en la UI; hoja de tiempos por lote)
+PAGE_SECONDS = metrics.histogram(
+    "secop_page_seconds", "Carga del detalle en el navegador por fase (goto, ready, content)", ("phase",)
+)
+HTTP_FETCH_SECONDS = metrics.histogram("secop_http_fetch_seconds", "Detalle pedido por la ruta HTTP keep-alive")
+PARSE_SECONDS = metrics.histogram("secop_parse_seconds", "Parseo e indice del HTML de detalle", ("parser",))
+FIELD_SECONDS = metrics.histogram("secop_field_seconds", "Campos y secciones del plan de extraccion (tiempo propio)", ("field",))
+STAGE_SECONDS = metrics.histogram("secop_stage_seconds", "Tiempo por constancia en cada etapa del lote", ("stage",))
+
+# Cache en disco del HTML de detalle (re-ejecutar un lote no vuelve a pedir lo ya descargado).
+# SECOP_HTML_CACHE=0 la desactiva; TTL en horas y tamano maximo en MB.
+HTML_CACHE_ENABLED = os.environ.get("SECOP_HTML_CACHE", "1").strip() != "0"
+HTML_CACHE_TTL_HOURS = float(os.environ.get("SECOP_HTML_CACHE_TTL_HOURS", "72"))
+HTML_CACHE_MAX_MB = float(os.environ.get("SECOP_HTML_CACHE_MAX_MB", "500"))
+# TTL por estado del proceso: terminales (liquidado, terminado...) casi nunca cambian;
+# celebrado con RP cambia poco; en curso se refresca pronto.
+HTML_CACHE_TERMINAL_DAYS = float(os.environ.get("SECOP_HTML_CACHE_TERMINAL_DAYS", "365"))
+HTML_CACHE_SETTLED_DAYS = float(os.environ.get("SECOP_HTML_CACHE_SETTLED_DAYS", "30"))
+HTML_CACHE_ACTIVE_HOURS = float(os.environ.get("SECOP_HTML_CACHE_ACTIVE_HOURS", "12"))
+
+# Parser HTML para las paginas de detalle: html.parser (defecto), lxml o selectolax
+HTML_PARSER = os.environ.get("SECOP_HTML_PARSER", page_index.DEFAULT_PARSER).strip() or page_index.DEFAULT_PARSER
+# Parsear solo hasta "Documentos del Proceso"/"Hitos" (page_index.slice_html). Desactivado por
+# defecto: los respaldos que recorren toda la pagina (KV base, filas rotulo/valor, tabla del RP,
+# texto completo) tampoco ven esas secciones, y en paginas degradadas el registro puede cambiar.
+HTML_SLICE = os.environ.get("SECOP_HTML_SLICE", "0").strip() == "1"
+
+# Espera de pagina lista (detalle completo)
+READY_SELECTOR = "td.tttablas"
+READY_TIMEOUT_MS = 20_000
+READY_STABLE_MS = 400  # DOM sin cambios durante este tiempo => tablas completas
+READY_POLL_MS = 100
+
+# Se evalua en el navegador en cada sondeo; retorna false mientras la pagina no este lista.
+_READY_JS = """
+(cfg) => {
+  const body = document.body;
+  const text = (body ? body.innerText : "").toLowerCase().normalize("NFD").replace(/[\\u0300-\\u036f]/g, "");
+  if (cfg.block.some((m) => text.includes(m))) return "blocked";
+  const headers = document.querySelectorAll(cfg.selector).length;
+  if (!headers) {
+    window.__secopReady = null;
+    if (document.readyState !== "loading" && cfg.notFound.some((m) => text.includes(m))) return "not_found";
+    return false;
+  }
+  const size = document.getElementsByTagName("*").length;
+  const now = performance.now();
+  const st = window.__secopReady;
+  if (!st || st.size !== size || st.headers !== headers) {
+    window.__secopReady = { size: size, headers: headers, since: now };
+    return false;
+  }
+  const stableFor = now - st.since;
+  if (stableFor >= cfg.stableMs) return "ready";
+  if (document.readyState === "complete" && stableFor >= cfg.pollMs) return "ready";
+  return false;
+}
+"""
+
 
 # -----------------------------
 # Errores
@@ -51,6 +190,14 @@ class SecopExtractionError(Exception):
     pass
 
 
+class SecopBlockedError(SecopExtractionError):
+    """Pagina de bloqueo anti-DDoS/WAF; `html` es la pagina recibida (trae el Incident ID)."""
+
+    def __init__(self, message: str, html: str = ""):
+        super().__init__(message)
+        self.html = html
+
+
 def normalize_constancia(constancia: str) -> str:
     s = (constancia or "").strip()
     s = DASHES_RE.sub("-", s)
@@ -77,16 +224,42 @@ def _safe_text(node: Any) -> str:
     return node.get_text(" ", strip=True) if hasattr(node, "get_text") else str(node).strip()
 
 
+def _as_index(page) -> PageIndex:
+    """Acepta un PageIndex o un BeautifulSoup (se indexa en una pasada)."""
+    return page if isinstance(page, PageIndex) else build_index(page)
+
+
+def parse_detail_html(html: str, parser: Optional[str] = None) -> PageIndex:
+    """
+    Parsea el HTML de detalle con el backend configurado (SECOP_HTML_PARSER) y lo indexa.
+    Con SECOP_HTML_SLICE=1 se omiten las secciones finales (los respaldos de pagina completa
+    tampoco las ven; ver page_index.slice_html).
+    """
+    backend = parser or HTML_PARSER
+    try:
+        with PARSE_SECONDS.time(parser=backend):
+            return page_index.parse_html(html, backend, slice_content=HTML_SLICE)
+    except (ValueError, ImportError) as e:
+        raise SecopExtractionError(str(e)) from e
+
+
+# Los rotulos de SECOP se repiten entre paginas: la normalizacion se memoiza (LRU acotado)
+NORM_CACHE_SIZE = 8192
+_SPACES_RE = re.compile(r"\s+")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+@lru_cache(maxsize=NORM_CACHE_SIZE)
 def _norm_key(s: str) -> str:
     s = (s or "").strip().lower()
     s = unicodedata.normalize("NFD", s)
     s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
-    s = re.sub(r"\s+", " ", s)
+    s = _SPACES_RE.sub(" ", s)
     s = s.replace(":", "")
     return s
 
 
-def _extract_kv_from_table(table) -> List[Tuple[str, str]]:
+def _extract_kv_from_table(idx: PageIndex, table: Optional[Table]) -> List[Tuple[str, str]]:
     """
     Extrae pares (label, value) de una tabla tipica de 2 columnas.
     Respeta textareas (objetos largos).
@@ -94,48 +267,59 @@ def _extract_kv_from_table(table) -> List[Tuple[str, str]]:
     pairs: List[Tuple[str, str]] = []
     if not table:
         return pairs
-    for tr in table.find_all("tr"):
-        tds = tr.find_all("td", recursive=False)
+    key = ("kv_table", table.pos)
+    if key in idx.memo:
+        return idx.memo[key]
+    for row in table.rows:
+        tds = row.direct_td
         if len(tds) < 2:
             continue
-        label = _safe_text(tds[0]).strip()
+        label = idx.text(tds[0]).strip()
         value_td = tds[1]
         if not label:
             continue
-        textarea = value_td.find("textarea")
-        if textarea:
-            value = textarea.get_text("\n", strip=True)
-        else:
-            value = _safe_text(value_td)
+        value = idx.textarea_text(value_td)
         if value is None:
-            value = ""
+            value = idx.text(value_td)
         pairs.append((label, value))
+    idx.memo[key] = pairs
     return pairs
 
 
-def _find_section_header_td(soup: BeautifulSoup, header_text: str):
+def _section_header_keys(idx: PageIndex) -> List[Tuple[Any, str]]:
+    """Encabezados td.tttablas con su clave normalizada (se calculan una vez por pagina)."""
+    keys = idx.memo.get("section_header_keys")
+    if keys is None:
+        keys = [(td, _norm_key(idx.text(td))) for td in idx.section_headers]
+        idx.memo["section_header_keys"] = keys
+    return keys
+
+
+def _find_section_header_td(page, header_text: str):
+    idx = _as_index(page)
     target = _norm_key(header_text)
-    for td in soup.find_all("td"):
-        if "tttablas" in (td.get("class") or []):
-            key = _norm_key(_safe_text(td))
-            if key == target or (target and target in key) or (key and key in target):
-                return td
+    for td, key in _section_header_keys(idx):
+        if key == target or (target and target in key) or (key and key in target):
+            return td
     return None
 
 
-def _parse_section_kv(soup: BeautifulSoup, header_text: str) -> List[Tuple[str, str]]:
+def _section_tables(idx: PageIndex, header_text: str, limit: int) -> List[Table]:
+    """Tablas posteriores a la fila del encabezado de seccion (equivale a header_tr.find_all_next("table"))."""
+    header_td = _find_section_header_td(idx, header_text)
+    if not header_td or header_td.row is None:
+        return []
+    return idx.tables_after(header_td.row.pos, limit)
+
+
+def _parse_section_kv(page, header_text: str) -> List[Tuple[str, str]]:
     """
     Dado un encabezado de seccion (td.tttablas), encuentra la primera tabla util posterior y la parsea como KV.
     """
-    header_td = _find_section_header_td(soup, header_text)
-    if not header_td:
-        return []
-    header_tr = header_td.find_parent("tr")
-    if not header_tr:
-        return []
+    idx = _as_index(page)
     # Buscar tablas siguientes; tomar la primera que tenga al menos 2 filas KV plausibles
-    for table in header_tr.find_all_next("table", limit=12):
-        pairs = _extract_kv_from_table(table)
+    for table in _section_tables(idx, header_text, limit=12):
+        pairs = _extract_kv_from_table(idx, table)
         # Heuristica: al menos 3 pares y labels con algo de contenido
         if len(pairs) >= 3:
             return pairs
@@ -162,6 +346,7 @@ def _merge_maps_keep_first(*maps: dict) -> dict:
 
 
 
+@lru_cache(maxsize=NORM_CACHE_SIZE)
 def _norm_text(s: str) -> str:
     """Normaliza texto para comparaciones tolerantes (sin tildes, sin puntuacion, espacios colapsados)."""
     if s is None:
@@ -169,102 +354,177 @@ def _norm_text(s: str) -> str:
     s = str(s)
     s = "".join(ch for ch in unicodedata.normalize("NFKD", s) if not unicodedata.combining(ch))
     s = s.lower()
-    s = re.sub(r"[^a-z0-9]+", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
+    s = _NON_ALNUM_RE.sub(" ", s)
+    s = _SPACES_RE.sub(" ", s).strip()
     return s
 
 
-def _find_row_value_by_label(soup, label_substr: str) -> str:
-    """Busca valor (celda derecha) para una fila cuyo rotulo (celda izquierda) coincide de forma tolerante."""
-    target = _norm_text(label_substr)
-    if not target:
-        return ""
-    for table in soup.find_all("table"):
-        for tr in table.find_all("tr"):
-            cells = tr.find_all(["th", "td"])
+def _label_rows(idx: PageIndex) -> List[Tuple[str, Any]]:
+    """Filas rotulo/valor de la pagina: (rotulo normalizado, celda valor), en orden de documento."""
+    rows = idx.memo.get("label_rows")
+    if rows is None:
+        rows = []
+        for row in idx.table_rows():
+            cells = row.cells
             if len(cells) < 2:
                 continue
-            left = _safe_text(cells[0])
+            left = idx.text(cells[0])
             if not left:
                 continue
-            if target in _norm_text(left):
-                return _safe_text(cells[1]).strip()
+            rows.append((_norm_text(left), cells[1]))
+        idx.memo["label_rows"] = rows
+    return rows
+
+
+def _find_row_value_by_label(page, label_substr: str) -> str:
+    """Busca valor (celda derecha) para una fila cuyo rotulo (celda izquierda) coincide de forma tolerante."""
+    target = _norm_text(label_substr)
+    if not target:
+        return ""
+    idx = _as_index(page)
+    for left, value_cell in _label_rows(idx):
+        if target in left:
+            return idx.text(value_cell).strip()
     return ""
 
-def _find_rp_code(soup) -> str:
+# -----------------------------
+# Fallbacks sobre el texto completo (un solo barrido)
+# -----------------------------
+# Cuando la estructura no da el valor, RP, CDP y numero de proceso se buscan en el texto
+# de la pagina. La tabla se compila una vez; el barrido recorre text_newline una sola vez
+# por pagina y deja en idx.memo la primera coincidencia de cada patron (igual que un
+# re.search por patron). Cada patron es (disparador, resto): el disparador es un prefijo
+# literal que marca donde puede empezar y el patron completo se prueba anclado ahi, asi
+# patrones solapados ("CDP No. RP 2503100004") se encuentran igual que por separado.
+# \s y \b tratan igual el espacio y el salto de linea, por eso text_newline sirve tambien
+# para los patrones que antes corrian sobre text_space.
+_LINE_BREAKS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"  # los de str.splitlines()
+_LABEL_SEP = f"[^a-z0-9{_LINE_BREAKS}]+"
+FALLBACK_PATTERNS: Tuple[Tuple[str, str, str], ...] = (
+    ("rp", r"\bRP\b", r"\s*(?:No\.|Nro\.|#|:)?\s*(?P<valor>\d{6,})"),
+    ("crp", r"\bCRP\b", r"\s*(?:No\.|Nro\.|#|:)?\s*(?P<valor>\d{6,})"),
+    ("cdp", r"\bCDP\b", r"\s*(?:No\.|Nro\.|#|:)?\s*(?P<valor>[A-Za-z0-9\-/]+)"),
+    ("respaldo", r"respaldo presupuestal", r"\s*(?:No\.|Nro\.|#|:)?\s*(?P<valor>[A-Za-z0-9\-/]+)"),
+    # Rotulo suelto (mayusculas, tildes, separadores); la linea se confirma con _norm_text
+    ("numero_proceso", r"detalle", f"{_LABEL_SEP}del{_LABEL_SEP}proceso{_LABEL_SEP}n\\S*?mero"),
+)
+# La clase con las primeras letras de los disparadores deja al motor saltar rapido las
+# posiciones que no pueden empezar ningun patron (la alternancia sola no lo hace)
+_FALLBACK_FIRST = "".join(sorted({trigger.replace(r"\b", "")[0].lower() for _, trigger, _ in FALLBACK_PATTERNS}))
+_FALLBACK_TRIGGER_RE = re.compile(
+    f"(?=[{_FALLBACK_FIRST}])(?:" + "|".join(f"(?P<{name}>{trigger})" for name, trigger, _ in FALLBACK_PATTERNS) + ")",
+    re.IGNORECASE,
+)
+_FALLBACK_RES = {name: re.compile(trigger + rest, re.IGNORECASE) for name, trigger, rest in FALLBACK_PATTERNS}
+_LINE_BREAK_RE = re.compile(f"[{_LINE_BREAKS}]")
+
+
+def _line_value_numero_proceso(text: str, pos: int) -> Optional[str]:
+    """Valor tras ':' de la linea que contiene pos, si es la del numero de proceso."""
+    start = max(text.rfind(ch, 0, pos) for ch in _LINE_BREAKS) + 1
+    m = _LINE_BREAK_RE.search(text, pos)
+    line = text[start:m.start() if m else len(text)]
+    if "detalle del proceso numero" not in _norm_text(line):
+        return None
+    parts = line.split(":", 1)
+    return parts[1].strip() if len(parts) == 2 else None
+
+
+def _fallback_candidates(page) -> Dict[str, str]:
+    """Primera coincidencia de cada patron de FALLBACK_PATTERNS en el texto (nombre -> valor)."""
+    idx = _as_index(page)
+    found = idx.memo.get("fallbacks")
+    if found is not None:
+        return found
+    found = {}
+    text = idx.text_newline
+    for trigger in _FALLBACK_TRIGGER_RE.finditer(text):
+        name = trigger.lastgroup
+        if name in found:
+            continue
+        m = _FALLBACK_RES[name].match(text, trigger.start())
+        if not m:
+            continue
+        if name == "numero_proceso":
+            value = _line_value_numero_proceso(text, m.start())
+            if value is not None:
+                found[name] = value
+        else:
+            found[name] = m.group("valor")
+        if len(found) == len(FALLBACK_PATTERNS):
+            break
+    idx.memo["fallbacks"] = found
+    return found
+
+
+def _find_rp_code(page) -> str:
     """Extrae el codigo RP/CRP desde la tabla con encabezados 'Codigo|Fecha|Valor' de forma tolerante.
     No depende del titulo de seccion (SECOP varia el encabezado).
     """
+    idx = _as_index(page)
     # 1) Tabla por estructura (encabezados)
-    for table in soup.find_all("table"):
-        rows = table.find_all("tr")
+    for table in idx.tables:
+        rows = table.rows
         if len(rows) < 2:
             continue
-        header_cells = rows[0].find_all(["th", "td"])
-        headers = [_norm_text(_safe_text(c)) for c in header_cells]
+        headers = [_norm_text(t) for t in idx.texts(rows[0].cells)]
         if not headers:
             continue
         if "codigo" in headers and "valor" in headers:
             code_idx = headers.index("codigo")
             for r in rows[1:]:
-                data_cells = r.find_all(["th", "td"])
+                data_cells = r.cells
                 if len(data_cells) <= code_idx:
                     continue
-                raw = _safe_text(data_cells[code_idx])
+                raw = idx.text(data_cells[code_idx])
                 raw_digits = _extract_digits(raw)
                 if raw_digits and len(raw_digits) >= 6:
                     return raw_digits
     # 2) Fallback regex en texto completo
-    text = soup.get_text(" ", strip=True)
-    for pat in (
-        r"\bRP\b\s*(?:No\.|Nro\.|#|:)?\s*(\d{6,})",
-        r"\bCRP\b\s*(?:No\.|Nro\.|#|:)?\s*(\d{6,})",
-    ):
-        m = re.search(pat, text, flags=re.IGNORECASE)
-        if m:
-            return m.group(1)
-    return ""
+    found = _fallback_candidates(idx)
+    return found.get("rp") or found.get("crp") or ""
 
-def _parse_all_kv(soup):
+def _parse_all_kv(page):
     """Parsea pares etiqueta/valor de manera tolerante recorriendo toda la pagina.
 
     - Filas con 2 celdas (th/td o td/td)
     - Ignora tablas de documentos/hitos cuando no tienen estructura KV
+    - Cada fila se visita una vez (las filas de tablas anidadas no se repiten)
     """
+    idx = _as_index(page)
     pairs = []
-    for table in soup.find_all("table"):
-        for tr in table.find_all("tr"):
-            cells = tr.find_all(["th", "td"], recursive=False)
-            if len(cells) != 2:
-                # algunos layouts tienen td anidados; intentar modo recursivo si no hay celdas directas
-                cells = tr.find_all(["th", "td"])[:2]
-            if len(cells) != 2:
-                continue
-            k = _safe_text(cells[0])
-            v = _safe_text(cells[1])
-            if _is_nonempty(k) and _is_nonempty(v):
-                pairs.append((k, v))
+    for row in idx.table_rows():
+        cells = row.direct
+        if len(cells) != 2:
+            # algunos layouts tienen td anidados; intentar modo recursivo si no hay celdas directas
+            cells = row.cells[:2]
+        if len(cells) != 2:
+            continue
+        k = idx.text(cells[0])
+        v = idx.text(cells[1])
+        if _is_nonempty(k) and _is_nonempty(v):
+            pairs.append((k, v))
     return pairs
 
 
-def _parse_section_table(soup: BeautifulSoup, header_text: str) -> Optional[List[List[str]]]:
+def _table_matrix(idx: PageIndex, table: Table) -> List[List[str]]:
+    """Filas de la tabla como textos de sus celdas directas (omite filas sin celdas)."""
+    key = ("matrix", table.pos)
+    rows = idx.memo.get(key)
+    if rows is None:
+        rows = [idx.texts(row.direct) for row in table.rows if row.direct]
+        idx.memo[key] = rows
+    return rows
+
+
+def _parse_section_table(page, header_text: str) -> Optional[List[List[str]]]:
     """
     Parsea una tabla con encabezados (th/td) posterior a un header.
     Retorna matriz (filas) incluyendo encabezado como primera fila.
     """
-    header_td = _find_section_header_td(soup, header_text)
-    if not header_td:
-        return None
-    header_tr = header_td.find_parent("tr")
-    if not header_tr:
-        return None
-    for table in header_tr.find_all_next("table", limit=15):
-        rows = []
-        for tr in table.find_all("tr"):
-            cells = tr.find_all(["th", "td"], recursive=False)
-            if not cells:
-                continue
-            rows.append([_safe_text(c) for c in cells])
+    idx = _as_index(page)
+    for table in _section_tables(idx, header_text, limit=15):
+        rows = _table_matrix(idx, table)
         # Heuristica: tabla con encabezado y 1+ filas
         if len(rows) >= 2 and len(rows[0]) >= 2:
             return rows
@@ -280,33 +540,13 @@ def _kv_to_map(pairs: List[Tuple[str, str]]) -> Dict[str, str]:
     return m
 
 
-def _get_first(m: Dict[str, str], keys: List[str]) -> str:
-    for k in keys:
-        nk = _norm_key(k)
-        # match exact
-        if nk in m and m[nk]:
-            return m[nk]
-    # fallback: contains tokens
-    for k in keys:
-        nk = _norm_key(k)
-        for mk, mv in m.items():
-            if mv and nk in mk:
-                return mv
-    return ""
-
-
-def _parse_numero_proceso_informativo(soup: BeautifulSoup) -> str:
-    for line in soup.get_text("\n", strip=True).splitlines():
-        if "detalle del proceso numero" in _norm_text(line):
-            parts = line.split(":", 1)
-            if len(parts) == 2:
-                return parts[1].strip()
-    return ""
+def _parse_numero_proceso_informativo(page) -> str:
+    return _fallback_candidates(page).get("numero_proceso", "")
 
 
-def _parse_fuente_financiacion(soup: BeautifulSoup) -> str:
+def _parse_fuente_financiacion(page) -> str:
     # Preferir tabla "Fuentes de Financiacion"
-    rows = _parse_section_table(soup, "Fuentes de Financiacion")
+    rows = _parse_section_table(page, "Fuentes de Financiacion")
     if rows and len(rows) >= 2:
         header = [_norm_key(h) for h in rows[0]]
         # buscamos columna "fuente"
@@ -330,12 +570,13 @@ def _parse_fuente_financiacion(soup: BeautifulSoup) -> str:
     return ""
 
 
-def _parse_rp_table(soup: BeautifulSoup) -> Dict[str, str]:
+def _parse_rp_table(page) -> Dict[str, str]:
     """
     Extrae Codigo RP/CRP, Fecha y Valor desde "Registro Presupuestal del Compromiso (RP)".
     Retorna dict con claves: codigo_rp, fecha_rp, valor_rp
     """
     out = {"codigo_rp": "", "fecha_rp": "", "valor_rp": ""}
+    idx = _as_index(page)
     # intentar varios encabezados posibles (SECOP I varia)
     rows = None
     for h in [
@@ -346,7 +587,7 @@ def _parse_rp_table(soup: BeautifulSoup) -> Dict[str, str]:
         "Registro Presupuestal",
         "Registro Presupuestal del Compromiso - RP",
     ]:
-        rows = _parse_section_table(soup, h)
+        rows = _parse_section_table(idx, h)
         if rows:
             break
     if not rows:
@@ -377,15 +618,16 @@ def _parse_rp_table(soup: BeautifulSoup) -> Dict[str, str]:
     return out
 
 
-def _extract_cdp(soup: BeautifulSoup) -> str:
+def _extract_cdp(page) -> str:
     """Extrae el certificado de disponibilidad presupuestal (CDP) de forma tolerante."""
-    raw = _find_row_value_by_label(soup, "Numero del respaldo presupuestal")
+    idx = _as_index(page)
+    raw = _find_row_value_by_label(idx, "Numero del respaldo presupuestal")
     if raw:
         token = _pick_numeric_token(raw)
         if token:
             return token
 
-    rows = _parse_section_table(soup, "Respaldos Presupuestales Asociados al Proceso")
+    rows = _parse_section_table(idx, "Respaldos Presupuestales Asociados al Proceso")
     if rows:
         header = [_norm_text(h) for h in rows[0]]
         idx_num = None
@@ -407,58 +649,153 @@ def _extract_cdp(soup: BeautifulSoup) -> str:
             if candidates:
                 return max(candidates, key=len)
 
-    raw = _find_row_value_by_label(soup, "Certificado de disponibilidad presupuestal")
+    raw = _find_row_value_by_label(idx, "Certificado de disponibilidad presupuestal")
     if not raw:
-        raw = _find_row_value_by_label(soup, "CDP")
+        raw = _find_row_value_by_label(idx, "CDP")
     if raw:
         token = _pick_numeric_token(raw)
         if token:
             return token
 
-    text_all = soup.get_text(" ", strip=True)
-    m = re.search(r"\bCDP\b\s*(?:No\.|Nro\.|#|:)?\s*([A-Za-z0-9\-/]+)", text_all, flags=re.IGNORECASE)
-    if m:
-        token = m.group(1).strip()
-        picked = _pick_numeric_token(token)
-        if picked:
-            return picked
-    m = re.search(r"respaldo presupuestal\s*(?:No\.|Nro\.|#|:)?\s*([A-Za-z0-9\-/]+)", text_all, flags=re.IGNORECASE)
-    if m:
-        token = m.group(1).strip()
-        picked = _pick_numeric_token(token)
+    found = _fallback_candidates(idx)
+    for name in ("cdp", "respaldo"):
+        picked = _pick_numeric_token(found.get(name, ""))
         if picked:
             return picked
     return ""
 
 
-def fetch_detail_html(constancia: str, headless: bool = False, timeout_ms: int = 120_000) -> str:
+def _host_matches(host: str, domains) -> bool:
+    host = (host or "").lower()
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+def _should_block_request(resource_type: str, url: str, is_subframe: bool = False) -> bool:
+    """
+    Decide si una peticion del detalle se aborta.
+    - reCAPTCHA (google/gstatic/recaptcha.net bajo /recaptcha) siempre pasa.
+    - Imagenes, fuentes, CSS y media se abortan (BLOCKED_RESOURCE_TYPES).
+    - Iframes del portal (cabezote, pie de pagina) se abortan; el documento principal pasa.
+    - Cualquier otro host de terceros se aborta.
+    """
+    parts = urlsplit(url or "")
+    if parts.scheme not in ("http", "https"):
+        return False
+    host = parts.hostname or ""
+    if _host_matches(host, RECAPTCHA_HOSTS) and "recaptcha" in (parts.path or "").lower():
+        return False
+    if (resource_type or "").lower() in BLOCKED_RESOURCE_TYPES:
+        return True
+    if not _host_matches(host, SECOP_HOSTS):
+        return True
+    return is_subframe and resource_type == "document"
+
+
+def _route_detail_request(route) -> None:
+    request = route.request
+    try:
+        frame = request.frame
+        is_subframe = frame.parent_frame is not None
+    except Exception:
+        is_subframe = False
+    if _should_block_request(request.resource_type, request.url, is_subframe=is_subframe):
+        route.abort()
+    else:
+        route.continue_()
+
+
+def _new_context(browser):
+    """Crea un contexto de navegador con la configuracion comun del extractor (y el filtro de recursos)."""
+    context = browser.new_context(viewport={"width": 1280, "height": 720})
+    if BLOCK_RESOURCES:
+        context.route("**/*", _route_detail_request)
+    return context
+
+
+def fetch_detail_html(constancia: str, headless: bool = False, timeout_ms: int = 120_000, pool=None) -> str:
     """
     Abre el detalle SECOP I en Playwright (visible por defecto para resolver reCAPTCHA) y retorna el HTML renderizado.
+    Si se entrega un pool (browser_pool.BrowserPool) se reutiliza su navegador en lugar de lanzar uno nuevo.
     """
-    url = build_url(constancia)
+    if pool is not None:
+        return pool.fetch(constancia, timeout_ms)
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=headless)
-        context = browser.new_context(viewport={"width": 1280, "height": 720})
+        context = _new_context(browser)
         page = context.new_page()
         try:
-            page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
-            # Espera razonable a tablas principales. Si hay reCAPTCHA, el usuario debe resolverlo y luego continuar.
-            # Reintentamos esperar por un elemento comun en el detalle.
-            page.wait_for_timeout(1500)
-            try:
-                page.wait_for_selector("td.tttablas", timeout=20_000)
-            except PWTimeoutError:
-                # No forzamos fallo inmediato; puede haber variaciones o el usuario aun resolviendo captcha.
-                pass
-            # Espera adicional corta para render
-            page.wait_for_timeout(1200)
-            html = page.content()
+            html = _load_detail_page(page, constancia, timeout_ms)
         finally:
             context.close()
             browser.close()
     return html
 
 
+def _wait_for_detail_ready(page, timeout_ms: int = READY_TIMEOUT_MS) -> str:
+    """
+    Espera a que el detalle este completo: encabezados td.tttablas presentes y DOM estable.
+    Sale antes si la pagina es de bloqueo ("blocked") o de proceso inexistente ("not_found").
+    Retorna "ready", "blocked", "not_found" o "timeout" (p.ej. usuario aun resolviendo reCAPTCHA).
+    """
+    cfg = {
+        "selector": READY_SELECTOR,
+        "block": BLOCK_MARKERS,
+        "notFound": NOT_FOUND_MARKERS,
+        "stableMs": READY_STABLE_MS,
+        "pollMs": READY_POLL_MS,
+    }
+    try:
+        handle = page.wait_for_function(_READY_JS, arg=cfg, timeout=timeout_ms, polling=READY_POLL_MS)
+        return str(handle.json_value())
+    except PWTimeoutError:
+        return "timeout"
+
+
+def _record_page_timing(timing: Dict[str, Any]) -> None:
+    """Registra los tiempos de carga/espera por pagina (JSONL diario, best-effort) para ajustar esperas."""
+    logger.debug(f"Tiempos de pagina: {timing}")
+    try:
+        READINESS_DIR.mkdir(parents=True, exist_ok=True)
+        out_path = READINESS_DIR / f"readiness_{datetime.now().strftime('%Y%m%d')}.jsonl"
+        with out_path.open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps(timing, ensure_ascii=True) + "\n")
+    except Exception:
+        pass
+
+
+def _load_detail_page(page, constancia: str, timeout_ms: int = 120_000) -> str:
+    """Navega al detalle, espera a que este listo y retorna el HTML. Registra los tiempos de la pagina."""
+    url = build_url(constancia)
+    t0 = time.perf_counter()
+    page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+    t_nav = time.perf_counter()
+    outcome = _wait_for_detail_ready(page)
+    t_ready = time.perf_counter()
+    html = page.content()
+    t_done = time.perf_counter()
+    PAGE_SECONDS.observe(t_nav - t0, phase="goto")
+    PAGE_SECONDS.observe(t_ready - t_nav, phase="ready")
+    PAGE_SECONDS.observe(t_done - t_ready, phase="content")
+    _record_page_timing({
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "constancia": constancia,
+        "outcome": outcome,
+        "goto_ms": round((t_nav - t0) * 1000),
+        "ready_ms": round((t_ready - t_nav) * 1000),
+        "content_ms": round((t_done - t_ready) * 1000),
+        "html_bytes": len(html or ""),
+    })
+    if outcome == "not_found":
+        raise SecopExtractionError(f"El proceso no existe en SECOP I: {constancia}")
+    return html
+
+
+def _is_block_message(message: str) -> bool:
+    """El error corresponde a un bloqueo anti-DDoS (detiene el lote y frena el ritmo del host)."""
+    text = (message or "").lower()
+    return "bloqueado" in text or "blocked" in text
+
+
 def _is_blocked_html(html: str) -> bool:
     text = (html or "").lower()
     return any(marker in text for marker in BLOCK_MARKERS)
@@ -478,27 +815,673 @@ def _dump_blocked_html(html: str, constancia: str) -> Optional[Path]:
         return None
 
 
+def _blocked_error(html: str, constancia: str) -> SecopBlockedError:
+    """Error de bloqueo con la pagina recibida (se guarda para diagnostico)."""
+    _dump_blocked_html(html, constancia)
+    return SecopBlockedError(
+        "Acceso bloqueado por el sitio (posible DDoS/WAF). Deteniendo el lote; esperar y/o contactar soporte.",
+        html,
+    )
+
+
 def _fetch_detail_html_with_page(page, constancia: str, timeout_ms: int = 120_000) -> str:
     """
     Variante para reusar un page/contexto en lotes y evitar señales de automatizacion agresiva.
     """
-    url = build_url(constancia)
-    page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
-    page.wait_for_timeout(1500)
-    try:
-        page.wait_for_selector("td.tttablas", timeout=20_000)
-    except PWTimeoutError:
-        pass
-    page.wait_for_timeout(1200)
-    html = page.content()
+    html = _load_detail_page(page, constancia, timeout_ms)
     if _is_blocked_html(html):
-        _dump_blocked_html(html, constancia)
-        raise SecopExtractionError(
-            "Acceso bloqueado por el sitio (posible DDoS/WAF). Deteniendo el lote; esperar y/o contactar soporte."
-        )
+        raise _blocked_error(html, constancia)
     return html
 
 
+def _export_browser_session(page) -> Tuple[List[Dict[str, Any]], str]:
+    """Cookies del contexto y user-agent del navegador, para reutilizarlos en la ruta HTTP."""
+    return page.context.cookies(), page.evaluate("navigator.userAgent")
+
+
+def _needs_browser(status: int, html: str) -> str:
+    """Motivo por el que una respuesta HTTP no sirve y hay que volver al navegador ("" si sirve)."""
+    if status != 200:
+        return f"http_{status}"
+    if _is_blocked_html(html):
+        return "blocked"
+    if "tttablas" not in (html or ""):
+        text = (html or "").lower()
+        if any(marker in text for marker in CAPTCHA_MARKERS):
+            return "captcha"
+        return "incomplete"
+    return ""
+
+
+def _decode_body(body: bytes, content_type: str) -> str:
+    m = re.search(r"charset=([\w\-]+)", content_type or "", flags=re.IGNORECASE)
+    if not m:
+        m = re.search(rb"charset=[\"']?([\w\-]+)", body[:4096], flags=re.IGNORECASE)
+    charset = m.group(1) if m else "utf-8"
+    if isinstance(charset, bytes):
+        charset = charset.decode("ascii", "ignore")
+    try:
+        return body.decode(charset, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+class KeepAliveHttpClient:
+    """
+    Cliente HTTP/1.1 minimo (stdlib) con una conexion persistente por host y cookies
+    exportadas del navegador. No sigue redirecciones: una redireccion obliga a volver al navegador.
+    """
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT_SECONDS):
+        self.timeout = timeout
+        self.user_agent = ""
+        self._cookies: List[Dict[str, Any]] = []
+        self._conns: Dict[Tuple[str, str, int], http.client.HTTPConnection] = {}
+
+    def set_session(self, cookies: List[Dict[str, Any]], user_agent: str = "") -> None:
+        self._cookies = [dict(c) for c in (cookies or [])]
+        if user_agent:
+            self.user_agent = user_agent
+
+    def _cookie_header(self, host: str, path: str, secure: bool) -> str:
+        now = time.time()
+        pairs = []
+        for c in self._cookies:
+            domain = (c.get("domain") or "").lstrip(".").lower()
+            if domain and not _host_matches(host, (domain,)):
+                continue
+            if not path.startswith(c.get("path") or "/"):
+                continue
+            if c.get("secure") and not secure:
+                continue
+            expires = c.get("expires", -1)
+            if expires not in (None, -1) and expires < now:
+                continue
+            pairs.append(f"{c.get('name')}={c.get('value', '')}")
+        return "; ".join(pairs)
+
+    def _update_cookies(self, host: str, set_cookie_headers: List[str]) -> None:
+        for header in set_cookie_headers:
+            name_value = header.split(";", 1)[0]
+            if "=" not in name_value:
+                continue
+            name, value = (x.strip() for x in name_value.split("=", 1))
+            for c in self._cookies:
+                if c.get("name") == name and _host_matches(host, ((c.get("domain") or host).lstrip("."),)):
+                    c["value"] = value
+                    break
+            else:
+                self._cookies.append({"name": name, "value": value, "domain": host, "path": "/"})
+
+    def _connection(self, scheme: str, host: str, port: int) -> http.client.HTTPConnection:
+        key = (scheme, host, port)
+        conn = self._conns.get(key)
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = cls(host, port, timeout=self.timeout)
+            self._conns[key] = conn
+        return conn
+
+    def get(self, url: str) -> Tuple[int, str]:
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        host = parts.hostname or ""
+        port = parts.port or (443 if scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        headers = {
+            "Host": parts.netloc,
+            "Accept": "text/html,application/xhtml+xml",
+            "Accept-Encoding": "gzip",
+            "Accept-Language": "es-CO,es;q=0.9",
+            "Connection": "keep-alive",
+        }
+        if self.user_agent:
+            headers["User-Agent"] = self.user_agent
+        cookie = self._cookie_header(host, parts.path or "/", scheme == "https")
+        if cookie:
+            headers["Cookie"] = cookie
+
+        for attempt in range(2):
+            conn = self._connection(scheme, host, port)
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # Conexion keep-alive cerrada por el servidor: reabrir una vez
+                conn.close()
+                self._conns.pop((scheme, host, port), None)
+                if attempt:
+                    raise
+        self._update_cookies(host, resp.headers.get_all("Set-Cookie") or [])
+        if (resp.headers.get("Content-Encoding") or "").lower() == "gzip":
+            body = gzip.decompress(body)
+        return resp.status, _decode_body(body, resp.headers.get("Content-Type", ""))
+
+    def close(self) -> None:
+        for conn in self._conns.values():
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._conns.clear()
+
+
+# Ruta ("http" o "browser") que sirvio la ultima descarga del hilo. La fija HybridFetcher;
+# una sesion de solo navegador no la toca. El lote la lee para promediar latencias por ruta.
+_FETCH_ROUTE = threading.local()
+
+
+def _reset_fetch_source() -> None:
+    _FETCH_ROUTE.source = "browser"
+
+
+def _fetch_source() -> str:
+    return getattr(_FETCH_ROUTE, "source", "browser")
+
+
+class HybridFetcher:
+    """
+    Navegador para el arranque del lote y para desafios; HTTP keep-alive para el resto.
+
+    - El primer detalle (y cualquier reCAPTCHA) se resuelve en el navegador.
+    - Luego se exportan cookies + user-agent y los detalles siguientes se piden por HTTP.
+    - Si la respuesta HTTP no sirve (captcha, sin tablas, estado != 200) se vuelve al
+      navegador para esa constancia y se refresca la sesion.
+    - Un bloqueo por HTTP no se reintenta de inmediato en el navegador (serian dos peticiones
+      seguidas al sitio que bloquea): se lanza SecopBlockedError para que el limitador frene
+      y el circuit breaker sondee despues de la espera.
+    - Tras HTTP_MAX_FALLBACKS fallos consecutivos el lote sigue solo con navegador.
+    """
+
+    def __init__(
+        self,
+        browser_fetch: Callable[[str], str],
+        export_session: Callable[[], Tuple[List[Dict[str, Any]], str]],
+        base_url: str = SECOP_BASE_URL,
+        http_client: Optional[KeepAliveHttpClient] = None,
+        max_fallbacks: int = HTTP_MAX_FALLBACKS,
+    ):
+        self._browser_fetch = browser_fetch
+        self._export_session = export_session
+        self.base_url = base_url
+        self.http = http_client or KeepAliveHttpClient()
+        self.max_fallbacks = max_fallbacks
+        self._session_ready = False
+        self._consecutive_fallbacks = 0
+        self.stats = {"browser": 0, "http": 0, "fallbacks": 0, "blocked": 0}
+        self.last_source = ""
+
+    @property
+    def http_enabled(self) -> bool:
+        return self._session_ready and self._consecutive_fallbacks < self.max_fallbacks
+
+    def _fetch_http(self, constancia_ok: str) -> Tuple[Optional[str], str]:
+        try:
+            with HTTP_FETCH_SECONDS.time():
+                status, html = self.http.get(f"{self.base_url}{constancia_ok}")
+        except (http.client.HTTPException, OSError) as e:
+            return None, f"error: {e}"
+        reason = _needs_browser(status, html)
+        if reason == "blocked":
+            self.stats["blocked"] += 1
+            self.last_source = "http"
+            raise _blocked_error(html, constancia_ok)
+        return (None, reason) if reason else (html, "")
+
+    def _refresh_session(self) -> None:
+        try:
+            cookies, user_agent = self._export_session()
+        except Exception as e:
+            logger.debug(f"No se pudo exportar la sesion del navegador: {e}")
+            self._session_ready = False
+            return
+        self.http.set_session(cookies, user_agent)
+        self._session_ready = True
+
+    def fetch(self, constancia_ok: str) -> str:
+        if self.http_enabled:
+            html, reason = self._fetch_http(constancia_ok)
+            if html is not None:
+                self._consecutive_fallbacks = 0
+                self.stats["http"] += 1
+                self.last_source = _FETCH_ROUTE.source = "http"
+                return html
+            self._consecutive_fallbacks += 1
+            self.stats["fallbacks"] += 1
+            logger.info(f"Ruta HTTP descartada para {constancia_ok} ({reason}); usando navegador")
+        html = self._browser_fetch(constancia_ok)
+        self.stats["browser"] += 1
+        self.last_source = _FETCH_ROUTE.source = "browser"
+        self._refresh_session()
+        return html
+
+    def close(self) -> None:
+        self.http.close()
+
+
+@contextmanager
+def _open_detail_session(
+    headless: bool = False,
+    pool=None,
+    http_fast_path: bool = HTTP_FAST_PATH,
+) -> Iterator[Callable[[str], str]]:
+    """
+    Entrega una funcion fetch(constancia_ok) -> html para un lote.
+    Con pool se toma un contexto caliente del navegador compartido (cada sesion paralela en su
+    propio carril del pool); sin pool se lanza un navegador propio.
+    Con http_fast_path el navegador solo se usa para arrancar la sesion y ante desafios (HybridFetcher).
+    """
+    with _open_browser_session(headless=headless, pool=pool) as (browser_fetch, export_session):
+        if not http_fast_path:
+            yield browser_fetch
+            return
+        fetcher = HybridFetcher(browser_fetch, export_session)
+        try:
+            yield fetcher.fetch
+        finally:
+            fetcher.close()
+            logger.info(f"Sesion de detalle: {fetcher.stats}")
+
+
+@contextmanager
+def _open_browser_session(headless: bool = False, pool=None):
+    """Entrega (fetch, export_session) sobre un contexto del pool o de un navegador propio."""
+    if pool is not None:
+        with pool.lease() as lease:
+            yield lease.fetch, lambda: lease.run(_export_browser_session)
+        return
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=headless)
+        context = _new_context(browser)
+        page = context.new_page()
+        try:
+            yield (
+                lambda constancia_ok: _fetch_detail_html_with_page(page, constancia_ok),
+                lambda: _export_browser_session(page),
+            )
+        finally:
+            context.close()
+            browser.close()
+
+
+def open_html_cache(root: Optional[Path] = None) -> Optional[HtmlCache]:
+    """Cache de HTML segun la configuracion (None si SECOP_HTML_CACHE=0)."""
+    if not HTML_CACHE_ENABLED:
+        return None
+    return HtmlCache(
+        root or HTML_CACHE_DIR,
+        ttl_seconds=HTML_CACHE_TTL_HOURS * 3600,
+        max_bytes=int(HTML_CACHE_MAX_MB * 1024 * 1024),
+        freshness=FreshnessPolicy(
+            terminal_ttl=HTML_CACHE_TERMINAL_DAYS * DAY_SECONDS,
+            settled_ttl=HTML_CACHE_SETTLED_DAYS * DAY_SECONDS,
+            active_ttl=HTML_CACHE_ACTIVE_HOURS * 3600,
+        ),
+    )
+
+
+def _staged(stage: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Envuelve una etapa del lote para medir su tiempo por constancia (secop_stage_seconds)."""
+    def timed(*args: Any) -> Any:
+        with STAGE_SECONDS.time(stage=stage):
+            return fn(*args)
+
+    return timed
+
+
+def _default_breaker() -> Optional[circuit_breaker.CircuitBreaker]:
+    """Circuit breaker segun la configuracion (None si SECOP_BREAKER=0)."""
+    if not BREAKER_ENABLED:
+        return None
+    return circuit_breaker.CircuitBreaker(
+        first_probe_seconds=BREAKER_FIRST_PROBE_SECONDS,
+        max_probe_seconds=BREAKER_MAX_PROBE_SECONDS,
+        max_wait_seconds=BREAKER_MAX_WAIT_HOURS * 3600,
+        log_path=BLOCK_INCIDENTS_PATH,
+    )
+
+
+class _BatchRun:
+    """
+    Recorrido comun de los lotes: cache -> red (al ritmo del limitador del host) -> registro.
+
+    El lote corre como pipeline (batch_pipeline): fetch -> parse (pool de parse_workers
+    hilos; solapa el parseo con la descarga, no lo paraleliza) -> write (el hilo que llama run), con colas acotadas entre etapas; el parseo y
+    la escritura avanzan mientras la etapa fetch espera la pausa del limitador.
+    `stage_stats` queda con items, tiempos y profundidad de cola por etapa.
+
+    run(on_record) llama on_record(constancia_ok, record) por cada detalle extraido y
+    acumula los errores en `errors`. Ante un bloqueo anti-DDoS el circuit breaker
+    (circuit_breaker) estaciona el resto del lote, sondea con esperas crecientes y sigue
+    cuando SECOP responde; si el bloqueo no cede (o sin breaker) se detiene (`blocked`).
+    El navegador solo se abre si alguna constancia no esta en cache, y solo las
+    peticiones reales a SECOP pasan por el limitador (rate_limit, token bucket por host
+    con AIMD). Solo los errores del servidor al pedir (timeout, red) y los bloqueos
+    frenan el ritmo; un error de parseo o un proceso inexistente no.
+    rate_profile elige el perfil; sin el, se arma uno desde delay_seconds/backoff_max_seconds.
+
+    Con fetch_workers > 1 las constancias se piden en varias sesiones a la vez
+    (fetch_scheduler: un contexto de navegador con sus cookies por hilo) bajo el mismo
+    limitador del host; las filas se escriben igual en el orden del lote.
+    Ante un bloqueo una sola sesion sondea y las demas esperan a que se recupere.
+
+    progress(event) recibe los eventos del lote (dicts con "event", "constancia",
+    "index" (posicion 1..total), "total" y "completed"). Los de una constancia llegan en
+    orden; los de constancias distintas pueden intercalarse (cada etapa emite los suyos):
+    - started: empieza la constancia
+    - backoff: pausa antes de pedirla ("seconds", "reason": delay|backoff|probe)
+    - fetched: HTML obtenido ("source": cache|network)
+    - parsed: registro extraido
+    - written: fila escrita ("status": ok)
+    - error / blocked: la constancia fallo ("status": error, "message"); blocked detiene el lote
+    - blocked sin "status": circuito abierto ("message", "incident_id", "parked"); el lote espera
+    - resumed: el sondeo respondio bien ("seconds" de bloqueo, "probes"); el lote sigue
+    - skipped: ya estaba en la bitacora de un intento anterior ("status": ok, "source": journal)
+
+    Las constancias de `skip` (ya extraidas) no se piden ni se escriben de nuevo.
+    """
+
+    def __init__(
+        self,
+        constancias: List[str],
+        headless: bool = False,
+        delay_seconds: float = 30.0,
+        backoff_max_seconds: float = 600.0,
+        pool=None,
+        http_fast_path: bool = HTTP_FAST_PATH,
+        cache: Optional[HtmlCache] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        skip: Optional[Set[str]] = None,
+        rate_profile: Optional[rate_limit.RateProfile] = None,
+        breaker: Optional[circuit_breaker.CircuitBreaker] = None,
+        fetch_workers: int = FETCH_WORKERS,
+        parse_workers: int = PARSE_WORKERS,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+    ):
+        self.constancias = constancias
+        self.headless = headless
+        self.rate_profile = rate_profile or rate_limit.RateProfile.from_delay(delay_seconds, backoff_max_seconds)
+        self.limiter = rate_limit.limiter_for(SECOP_HOST, self.rate_profile)
+        self.breaker = breaker if breaker is not None else _default_breaker()
+        self.pool = pool
+        self.http_fast_path = http_fast_path
+        self.cache = cache
+        self.progress = progress
+        self.skip = skip or set()
+        self.errors: List[Tuple[str, str]] = []
+        self.blocked = False
+        self.fetch_workers = max(1, int(fetch_workers))
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.stats = {"cache_hits": 0, "network": 0}
+        self.stage_stats: Dict[str, Dict[str, Any]] = {}
+        self._position = 0
+        self._completed = 0
+        # Estado compartido entre sesiones paralelas
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._healthy = threading.Event()
+        self._healthy.set()
+        self._parking = False
+        self._gave_up: Optional[SecopExtractionError] = None
+        self._stopping = threading.Event()
+        # Primera aparicion de cada constancia -> escrita (las repetidas la esperan y salen de cache)
+        self._first_seen: Dict[str, threading.Event] = {}
+
+    def _current_position(self) -> int:
+        return getattr(self._local, "position", self._position)
+
+    def _emit(self, event: str, constancia: str, **fields: Any) -> None:
+        if self.progress is None:
+            return
+        payload = {
+            "event": event,
+            "constancia": constancia,
+            "index": self._current_position(),
+            "total": len(self.constancias),
+            "completed": self._completed,
+        }
+        payload.update(fields)
+        try:
+            self.progress(payload)
+        except Exception as e:
+            logger.warning(f"Callback de progreso fallo: {e}")
+
+    def _finish(self, event: str, constancia: str, status: str, **fields: Any) -> None:
+        self._completed += 1
+        self._emit(event, constancia, status=status, **fields)
+
+    def _pause(self, constancia: str, seconds: float, reason: str) -> None:
+        self._emit("backoff", constancia, seconds=round(seconds, 1), reason=reason)
+        if self._stopping.wait(seconds):
+            raise SecopExtractionError("Lote detenido durante la pausa.")
+
+    def _fail(self, constancia: str, message: str, on_error) -> None:
+        self.errors.append((constancia, message))
+        if on_error is not None:
+            on_error(constancia, message)
+
+    def _fetch(self, fetch: Callable[[str], str], constancia_ok: str, paced: bool = True) -> str:
+        """Pide el detalle al ritmo del limitador (paced) y le informa el resultado."""
+        if paced:
+            wait = self.limiter.reserve()
+            if wait > 0:
+                self._pause(constancia_ok, wait, "backoff" if self.limiter.consecutive_errors else "delay")
+        _reset_fetch_source()
+        t0 = time.perf_counter()
+        try:
+            html = fetch(constancia_ok)
+        except SecopExtractionError as e:
+            if _is_block_message(str(e)):
+                self.limiter.on_block()
+            # Otros (proceso inexistente): respuesta valida del sitio, el ritmo no cambia
+            raise
+        except Exception:
+            # Timeout / red / navegador: el sitio no respondio bien
+            self.limiter.on_server_error()
+            raise
+        self.limiter.on_success(time.perf_counter() - t0, _fetch_source())
+        with self._lock:
+            self.stats["network"] += 1
+        return html
+
+    def _wait_for_recovery(self, fetch: Callable[[str], str], constancia_ok: str, error: Exception) -> str:
+        """
+        Circuito abierto: el resto del lote queda en espera y se sondea SECOP con una sola
+        peticion (esta constancia) por intento. Retorna el HTML del sondeo que respondio;
+        si el bloqueo no cede en el tiempo maximo relanza el ultimo error de bloqueo.
+        """
+        breaker = self.breaker
+        parked = len(self.constancias) - self._current_position() + 1
+        incident = breaker.trip(constancia_ok, str(error), getattr(error, "html", ""), parked=parked)
+        self._emit("blocked", constancia_ok, message=str(error), incident_id=incident["incident_id"], parked=parked)
+        while True:
+            delay = breaker.next_probe_delay()
+            if delay is None:
+                breaker.give_up()
+                raise error
+            self._pause(constancia_ok, delay, "probe")
+            try:
+                html = self._fetch(fetch, constancia_ok, paced=False)
+            except SecopExtractionError as e:
+                if not _is_block_message(str(e)):
+                    # El sitio responde (p.ej. proceso inexistente): el bloqueo termino
+                    self._resume(constancia_ok)
+                    raise
+                error = e
+                breaker.probe_failed(str(e), getattr(e, "html", ""))
+                self._emit("blocked", constancia_ok, message=str(e), incident_id=breaker.incident["incident_id"],
+                           parked=parked, probes=breaker.incident["probes"])
+                continue
+            except Exception as e:
+                # Timeout / red durante el sondeo: el sitio aun no esta sano
+                breaker.probe_failed(str(e))
+                continue
+            self._resume(constancia_ok)
+            return html
+
+    def _resume(self, constancia_ok: str) -> None:
+        probes = self.breaker.incident["probes"] + 1
+        seconds = self.breaker.recovered()
+        self.limiter.on_recovered()
+        self._emit("resumed", constancia_ok, seconds=round(seconds, 1), probes=probes)
+
+    def _fetch_shared(self, fetch: Callable[[str], str], constancia_ok: str) -> str:
+        """
+        Pide el detalle; ante un bloqueo la primera sesion que lo ve sondea (_wait_for_recovery)
+        y las demas esperan y reintentan. Un bloqueo definitivo detiene las demas descargas.
+        """
+        while True:
+            self._healthy.wait()
+            if self._stopping.is_set():
+                raise SecopExtractionError("Lote detenido.")
+            if self._gave_up is not None:
+                raise SecopBlockedError(str(self._gave_up))
+            try:
+                return self._fetch(fetch, constancia_ok)
+            except SecopExtractionError as e:
+                if not _is_block_message(str(e)):
+                    raise
+                if self.breaker is None:
+                    self._gave_up = e
+                    raise
+                with self._lock:
+                    leader = not self._parking
+                    if leader:
+                        self._parking = True
+                        self._healthy.clear()
+                if not leader:
+                    # Otra sesion ya esta sondeando: esperar y reintentar esta constancia
+                    continue
+                try:
+                    return self._wait_for_recovery(fetch, constancia_ok, e)
+                except SecopExtractionError as blocked:
+                    if _is_block_message(str(blocked)):
+                        self._gave_up = blocked
+                    raise
+                finally:
+                    with self._lock:
+                        self._parking = False
+                    self._healthy.set()
+
+    def _open_session(self):
+        return _open_detail_session(headless=self.headless, pool=self.pool, http_fast_path=self.http_fast_path)
+
+    def _failed(self, constancia: str, error: SecopExtractionError, on_error) -> bool:
+        """Registra el error de la constancia; True si fue un bloqueo y el lote se detiene."""
+        msg = str(error)
+        self._fail(constancia, msg, on_error)
+        if _is_block_message(msg):
+            self.blocked = True
+            self._finish("blocked", constancia, "error", message=msg)
+            return True
+        self._finish("error", constancia, "error", message=msg)
+        return False
+
+    def _stop(self) -> None:
+        # Despierta a las sesiones en pausa para que el cierre no espere el backoff
+        self._stopping.set()
+        self._healthy.set()
+
+    def run(
+        self,
+        on_record: Callable[[str, Dict[str, str]], None],
+        on_error: Optional[Callable[[str, str], None]] = None,
+    ) -> None:
+        scheduler = fetch_scheduler.FetchScheduler(self._open_session, self.fetch_workers)
+        pipeline = batch_pipeline.Pipeline(self.parse_workers, self.queue_size, on_stop=self._stop)
+        try:
+            pipeline.run(
+                scheduler.map(enumerate(self.constancias, start=1), _staged("fetch", self._load)),
+                _staged("parse", self._parse),
+                _staged("write", lambda item, parsed: self._write(item, parsed, on_record, on_error)),
+            )
+        finally:
+            self.stage_stats = pipeline.snapshot()
+        logger.info(f"Lote: {self.stats} sesiones={scheduler.stats} ritmo={self.limiter.snapshot()}")
+        if self.cache is not None:
+            logger.info(f"Cache: {self.cache.stats}")
+
+    # -----------------------------
+    # Etapas (ver batch_pipeline)
+    # -----------------------------
+    def _load(self, fetch: Callable[[str], str], item: Tuple[int, str]) -> Tuple[str, Optional[str], bool]:
+        """fetch: (constancia_ok, html, from_cache); html None si ya estaba en la bitacora."""
+        position, c = item
+        self._local.position = position
+        if self._gave_up is not None:
+            raise SecopBlockedError(str(self._gave_up))
+        constancia_ok = validate_constancia(c)
+        if constancia_ok in self.skip:
+            return constancia_ok, None, False
+        self._wait_first_occurrence(constancia_ok)
+        self._emit("started", constancia_ok)
+        html = self.cache.get(constancia_ok) if self.cache is not None else None
+        from_cache = html is not None
+        if not from_cache:
+            html = self._fetch_shared(fetch, constancia_ok)
+        self._emit("fetched", constancia_ok, source="cache" if from_cache else "network")
+        return constancia_ok, html, from_cache
+
+    def _wait_first_occurrence(self, constancia_ok: str) -> None:
+        with self._lock:
+            written = self._first_seen.get(constancia_ok)
+            if written is None:
+                self._first_seen[constancia_ok] = threading.Event()
+                return
+        while not written.wait(0.1):
+            if self._stopping.is_set():
+                raise SecopExtractionError("Lote detenido.")
+
+    def _parse(self, item: Tuple[int, str], loaded: Tuple[str, Optional[str], bool]):
+        """parse: (constancia_ok, html, record, from_cache)."""
+        self._local.position = item[0]
+        constancia_ok, html, from_cache = loaded
+        if html is None:
+            return constancia_ok, None, None, from_cache
+        record = _build_record_from_soup(parse_detail_html(html), constancia_ok)
+        self._emit("parsed", constancia_ok)
+        return constancia_ok, html, record, from_cache
+
+    def _write(self, item: Tuple[int, str], parsed: Any, on_record, on_error) -> bool:
+        """write: escribe la fila (o el error). False detiene el lote (bloqueo)."""
+        try:
+            return self._write_item(item, parsed, on_record, on_error)
+        finally:
+            written = self._first_seen.get(normalize_constancia(item[1]))
+            if written is not None:
+                written.set()
+
+    def _write_item(self, item: Tuple[int, str], parsed: Any, on_record, on_error) -> bool:
+        position, c = item
+        self._position = position
+        if isinstance(parsed, fetch_scheduler.SessionError):
+            # No se pudo abrir el navegador: el lote no puede continuar
+            raise parsed.__cause__ or parsed
+        try:
+            if isinstance(parsed, BaseException):
+                raise parsed
+            constancia_ok, html, record, from_cache = parsed
+            if html is None:
+                self._finish("skipped", constancia_ok, "ok", source="journal")
+                return True
+            on_record(constancia_ok, record)
+            if from_cache:
+                self.stats["cache_hits"] += 1
+            elif self.cache is not None:
+                self.cache.put(constancia_ok, html, record=record)
+            self._finish("written", constancia_ok, "ok", source="cache" if from_cache else "network")
+        except SecopExtractionError as e:
+            return not self._failed(c, e, on_error)
+        except Exception as e:
+            self._fail(c, str(e), on_error)
+            self._finish("error", c, "error", message=str(e))
+        return True
+
 
 def _extract_digits(s: str) -> str:
     s = (s or "").strip()
@@ -697,12 +1680,13 @@ def _extract_rp_code(raw: str) -> str:
     return re.sub(r"[^\d]", "", s)
 
 
-def _extract_crp_code(soup: BeautifulSoup) -> str:
+def _extract_crp_code(page) -> str:
     """Extrae el codigo CRP usando tabla + fallback (elimina duplicacion)."""
-    rp = _parse_rp_table(soup)
+    idx = _as_index(page)
+    rp = _parse_rp_table(idx)
     crp_from_table = _extract_rp_code(rp.get("codigo_rp", ""))
     if not crp_from_table:
-        crp_fallback = _find_rp_code(soup)
+        crp_fallback = _find_rp_code(idx)
         return crp_fallback
     return crp_from_table
 
@@ -718,14 +1702,181 @@ def _determine_tipo_proceso(tipo_gasto: str) -> str:
     return ""
 
 
+# -----------------------------
+# Plan de extraccion (campos del registro)
+# -----------------------------
+# Secciones KV de la pagina: la de la seccion gana y se completa con el baseline tolerante
+RECORD_SECTIONS = {
+    "baseline": lambda run: _kv_to_map(_parse_all_kv(run.idx)),
+    "general": lambda run: _merge_maps_keep_first(
+        _kv_to_map(_parse_section_kv(run.idx, "Informacion General del Proceso")), run.section("baseline")
+    ),
+    "contrato": lambda run: _merge_maps_keep_first(
+        _kv_to_map(_parse_section_kv(run.idx, "Informacion del Contrato")), run.section("baseline")
+    ),
+}
+
+# Un campo por columna de la plantilla, en orden del registro. Las fuentes se prueban en
+# orden y la primera con valor gana; "ident" es auxiliar (sin columna) y "departamento"
+# es un campo extra que solo se evalua si se pide.
+RECORD_FIELDS = [
+    field_plan.Field("numero_proceso", "Numero de proceso (informativo)", [field_plan.extractor(_parse_numero_proceso_informativo)]),
+    field_plan.Field("constancia", "Numero de constancia", [field_plan.param("constancia")]),
+    field_plan.Field(
+        "tipo_gasto",
+        "Tipo de Gasto",
+        [
+            field_plan.labels("general", "Tipo de Gasto", "Tipo Gasto"),
+            field_plan.labels("contrato", "Tipo de Gasto", "Tipo Gasto"),
+        ],
+        cleaner=_determine_tipo_proceso,
+    ),
+    field_plan.Field(
+        "estado_proc",
+        "Estado del proceso",
+        [field_plan.labels("general", "Estado del Proceso", "Estado del Contrato", "Estado")],
+    ),
+    field_plan.Field(
+        "modalidad",
+        "Modalidad de contratacion",
+        [field_plan.labels("general", "Tipo de Proceso", "Modalidad de Contratacion", "Modalidad")],
+        criticality=field_plan.CRITICAL,
+    ),
+    field_plan.Field(
+        "fuente_financiacion",
+        "Fuente de financiacion",
+        [
+            field_plan.extractor(_parse_fuente_financiacion),
+            field_plan.labels("general", "Fuente de Financiacion", "Fuentes de Financiacion", "Fuente"),
+        ],
+        cleaner=_clean_fuente_financiacion,
+    ),
+    # Prioridad RP: tabla presupuestal de la seccion; fallback conservador a busqueda tolerante
+    field_plan.Field("rp", "Registro Presupuestal (RP)", [field_plan.extractor(_extract_crp_code)]),
+    field_plan.Field("cdp", "Certificado de disponibilidad presupuestal", [field_plan.extractor(_extract_cdp)]),
+    field_plan.Field(
+        "num_contrato",
+        "Numero de contrato",
+        [field_plan.labels("contrato", "Numero del Contrato", "No. Contrato", "Contrato No", "Numero de Contrato")],
+        criticality=field_plan.IMPORTANT,
+    ),
+    field_plan.Field(
+        "objeto",
+        "Objeto del contrato",
+        [field_plan.labels("contrato", "Objeto del Contrato", "Objeto")],
+        criticality=field_plan.CRITICAL,
+    ),
+    field_plan.Field(
+        "valor",
+        "Valor del contrato (COP)",
+        [
+            field_plan.labels(
+                "contrato", "Cuantia Definitiva del Contrato", "Cuantia del Contrato", "Valor del Contrato", "Cuantia", "Valor"
+            )
+        ],
+        cleaner=_clean_money,
+        criticality=field_plan.CRITICAL,
+    ),
+    field_plan.Field(
+        "plazo",
+        "Plazo de ejecucion",
+        [field_plan.labels("contrato", "Plazo de Ejecucion del Contrato", "Plazo de Ejecucion", "Plazo")],
+        criticality=field_plan.IMPORTANT,
+    ),
+    field_plan.Field(
+        "fecha_inicio",
+        "Fecha de inicio",
+        [field_plan.labels("contrato", "Fecha de Inicio de Ejecucion del Contrato", "Fecha de Inicio", "Fecha inicio")],
+        criticality=field_plan.IMPORTANT,
+    ),
+    field_plan.Field(
+        "fecha_fin",
+        "Fecha de terminacion",
+        [
+            field_plan.labels(
+                "contrato", "Fecha de Terminacion del Contrato", "Fecha de Terminacion", "Fecha fin", "Fecha terminacion"
+            )
+        ],
+    ),
+    field_plan.Field(
+        "razon_social",
+        "Razon social del proponente/contratista",
+        [field_plan.labels("contrato", "Nombre o Razon Social del Contratista", "Contratista", "Adjudicatario")],
+        criticality=field_plan.CRITICAL,
+    ),
+    field_plan.Field(
+        "ident",
+        None,
+        [
+            field_plan.labels(
+                "contrato", "Identificacion del Contratista", "NIT del Contratista", "NIT", "Cedula", "Identificacion"
+            ),
+            field_plan.labels("general", "Identificacion", "NIT", "Cedula"),
+        ],
+    ),
+    field_plan.Field("tipo_ident", "Tipo de identificacion", [field_plan.field("ident")], cleaner=_extract_id_type),
+    field_plan.Field(
+        "ident_clean", "Identificacion del proponente/contratista", [field_plan.field("ident")], cleaner=_clean_id
+    ),
+    field_plan.Field(
+        "rep_legal",
+        "Representante legal",
+        [
+            field_plan.labels(
+                "contrato", "Nombre del Representante Legal del Contratista", "Representante Legal", "Representante"
+            ),
+            field_plan.labels("general", "Representante Legal", "Representante"),
+        ],
+    ),
+    # Prioridad: identificacion del representante legal capturada por rotulo (mas estable en SECOP)
+    field_plan.Field(
+        "rep_ident_final",
+        "Identificación del representante legal",
+        [
+            field_plan.extractor(lambda idx: _find_row_value_by_label(idx, "Identificacion del Representante Legal")),
+            field_plan.labels(
+                "contrato",
+                "Identificacion del Representante Legal del Contratista",
+                "Identificacion del Representante Legal",
+                "Identificacion Representante Legal",
+                "Cedula Representante",
+                "Identificacion Representante",
+            ),
+            field_plan.labels("general", "Identificacion del Representante Legal", "Identificacion Representante Legal"),
+        ],
+        cleaner=_clean_id,
+    ),
+    field_plan.Field(
+        "bpim",
+        "Codigo BPIM",
+        [
+            field_plan.labels("contrato", "BPIM", "BPIN", "Codigo BPIM"),
+            field_plan.labels("general", "BPIM", "BPIN", "Codigo BPIM"),
+        ],
+        cleaner=_clean_bpim,
+    ),
+    field_plan.Field("fuente_documento", "Fuente del documento", [field_plan.const("SECOP I (detalleProceso)")]),
+    field_plan.Field(
+        "departamento",
+        None,
+        [field_plan.labels("general", "Departamento y Municipio de Ejecucion", "Departamento")],
+    ),
+]
+
+FIELD_PLAN = field_plan.FieldPlan(
+    RECORD_FIELDS,
+    RECORD_SECTIONS,
+    normalize=_norm_key,
+    observe=lambda name, seconds: FIELD_SECONDS.observe(seconds, field=name),
+)
+# Sinonimos compilados (campo:seccion -> rotulos) y su indice Aho-Corasick
+FIELD_SYNONYMS = FIELD_PLAN.synonyms
+FIELD_INDEX = FIELD_PLAN.index
+
+
 def _estado_validacion(record: Dict[str, str]) -> Tuple[str, str]:
     # Campos criticos para que el cuadro sea util
-    critical = {
-        "Modalidad de contratacion": record.get("Modalidad de contratacion", ""),
-        "Objeto del contrato": record.get("Objeto del contrato", ""),
-        "Valor del contrato (COP)": record.get("Valor del contrato (COP)", ""),
-        "Razon social del proponente/contratista": record.get("Razon social del proponente/contratista", ""),
-    }
+    critical = {k: record.get(k, "") for k in FIELD_PLAN.columns_with(field_plan.CRITICAL)}
 
     missing = [k for k, v in critical.items() if not (v or "").strip()]
     if not missing:
@@ -735,185 +1886,66 @@ def _estado_validacion(record: Dict[str, str]) -> Tuple[str, str]:
     return "Incompleto", "Faltan: " + "; ".join(missing)
 
 
-def _load_template(template_path: Path):
-    if not template_path.exists():
-        raise SecopExtractionError(f"No se encontro la plantilla: {template_path}")
-    wb = openpyxl.load_workbook(template_path)
-    if "Resultados_Extraccion" not in wb.sheetnames:
-        raise SecopExtractionError("La plantilla no contiene la hoja 'Resultados_Extraccion'.")
-    return wb
-
-
-def _append_errors_sheet(wb, errors: List[Tuple[str, str]]) -> None:
-    if not errors:
-        return
-    if "Errores" in wb.sheetnames:
-        ws_err = wb["Errores"]
-    else:
-        ws_err = wb.create_sheet("Errores")
-        ws_err.append(["numConstancia", "error"])
-    for c, err in errors:
-        ws_err.append([c, err])
-
-
-def _find_next_row(ws) -> int:
-    """
-    Encuentra la siguiente fila vacia basada en columnas clave (evita columna con formula).
-    """
-    headers = [c.value for c in ws[1]]
-    header_map = {_norm_key(str(h or "")): i + 1 for i, h in enumerate(headers)}
-    col_a = header_map.get(_norm_key("Numero de proceso (informativo)"), 1)
-    col_b = header_map.get(_norm_key("Numero de constancia"), 2)
-    for r in range(2, ws.max_row + 2):
-        a = ws.cell(row=r, column=col_a).value
-        b = ws.cell(row=r, column=col_b).value
-        if (a is None or str(a).strip() == "") and (b is None or str(b).strip() == ""):
-            return r
-    return ws.max_row + 1
-
-
-def _get_hyperlink_base(wb) -> str:
-    base = ""
-    if "Config" in wb.sheetnames:
-        base = str(wb["Config"]["B1"].value or "").strip()
-    if not base:
-        base = SECOP_BASE_URL
-    return base
-
-
-def _write_record_row(ws, wb, headers, record: Dict[str, str], constancia_ok: str, row_idx: int) -> None:
-    record_norm = {_norm_key(k): v for k, v in record.items()}
-    base = _get_hyperlink_base(wb)
-    for col_idx, h in enumerate(headers, start=1):
-        if not h:
-            continue
-        h_norm = _norm_key(str(h))
-        if h_norm == _norm_key("Abrir detalle"):
-            cell = ws.cell(row=row_idx, column=col_idx)
-            cell.value = "Abrir"
-            cell.hyperlink = base + constancia_ok
-            try:
-                cell.style = "Hyperlink"
-            except Exception:
-                pass
-            continue
-        if h_norm in record_norm:
-            ws.cell(row=row_idx, column=col_idx, value=record_norm[h_norm])
-
-
-def _build_record_from_soup(soup: BeautifulSoup, constancia_ok: str) -> Dict[str, str]:
-    # Extracciones dirigidas (sin depender de secciones): representante legal e RP
-    rep_id_raw = _find_row_value_by_label(soup, "Identificacion del Representante Legal")
-
-    # 0) Baseline KV tolerante (anti-regresion)
-    baseline_pairs = _parse_all_kv(soup)
-    baseline_map = _kv_to_map(baseline_pairs)
-
-    # 1) General (KV por seccion) - si no se encuentra, se apoya en baseline_map
-    general_pairs = _parse_section_kv(soup, "Informacion General del Proceso")
-    general_map = _merge_maps_keep_first(_kv_to_map(general_pairs), baseline_map)
-
-    # 2) Contrato (KV por seccion) - si no se encuentra, se apoya en baseline_map
-    contrato_pairs = _parse_section_kv(soup, "Informacion del Contrato")
-    contrato_map = _merge_maps_keep_first(_kv_to_map(contrato_pairs), baseline_map)
+def _open_results_writer(template_path: Path, out_path: Path) -> XlsxStreamWriter:
+    """Excel de salida en streaming a partir de la plantilla (memoria constante por fila)."""
+    try:
+        return XlsxStreamWriter(template_path, out_path, SECOP_BASE_URL)
+    except (FileNotFoundError, ValueError) as e:
+        raise SecopExtractionError(str(e)) from e
 
-    # 3) Presupuestal (RP table + fallback KV)
-    # Prioridad RP: tabla presupuestal de la seccion; fallback conservador a busqueda tolerante
-    rp_code = _extract_crp_code(soup)
-    cdp = _extract_cdp(soup)
 
-    # Campo informativo "Numero de proceso"
-    num_proceso_info = _parse_numero_proceso_informativo(soup)
+def _write_timings(writer: XlsxStreamWriter, timings: metrics.TimingSummary) -> None:
+    """Resume los tiempos del lote en el log y en la hoja Tiempos (wb.save queda en /metrics)."""
+    rows = timings.rows()
+    if rows:
+        top = "; ".join(f"{r[0]}{{{r[1]}}} {r[3]} s" for r in rows[:5])
+        logger.info(f"Tiempos del lote (mayor total): {top}")
+    if TIMING_SHEET:
+        writer.write_timings(rows)
 
-    modalidad = _get_first(general_map, ["Tipo de Proceso", "Modalidad de Contratacion", "Modalidad"])
-    estado_proc = _get_first(general_map, ["Estado del Proceso", "Estado del Contrato", "Estado"])
 
-    fuente_fin = _parse_fuente_financiacion(soup)
-    if not fuente_fin:
-        fuente_fin = _get_first(general_map, ["Fuente de Financiacion", "Fuentes de Financiacion", "Fuente"])
+def _check_export_formats(export_formats: Sequence[str]) -> List[str]:
+    """Valida los formatos extra (csv, parquet, arrow) antes de empezar a extraer."""
+    try:
+        return columnar_export.check_formats(export_formats)
+    except (ValueError, ImportError) as e:
+        raise SecopExtractionError(str(e)) from e
 
-    fuente_fin = _clean_fuente_financiacion(fuente_fin)
 
-    # Contrato info
-    num_contrato = _get_first(contrato_map, ["Numero del Contrato", "No. Contrato", "Contrato No", "Numero de Contrato"])
-    objeto = _get_first(contrato_map, ["Objeto del Contrato", "Objeto"])
-    valor = _get_first(contrato_map, ["Cuantia Definitiva del Contrato", "Cuantia del Contrato", "Valor del Contrato", "Cuantia", "Valor"])
-    valor_num = _clean_money(valor)
+def _export_columnar(records, out_path: Path, formats: List[str]) -> Dict[str, Path]:
+    """Escribe los formatos columnares junto al Excel (mismo nombre); ver columnar_export."""
+    if not formats:
+        return {}
+    try:
+        paths = columnar_export.export_records(records, out_path, formats)
+    except OSError as e:
+        raise SecopExtractionError(f"No se pudo exportar {', '.join(formats)}: {e}") from e
+    for fmt, path in paths.items():
+        logger.info(f"Exportado {fmt}: {path.name}")
+    return paths
 
-    plazo = _get_first(contrato_map, ["Plazo de Ejecucion del Contrato", "Plazo de Ejecucion", "Plazo"])
-    fecha_inicio = _get_first(contrato_map, ["Fecha de Inicio de Ejecucion del Contrato", "Fecha de Inicio", "Fecha inicio"])
-    fecha_fin = _get_first(contrato_map, ["Fecha de Terminacion del Contrato", "Fecha de Terminacion", "Fecha fin", "Fecha terminacion"])
 
-    razon_social = _get_first(contrato_map, ["Nombre o Razon Social del Contratista", "Nombre o Razon Social del Contratista", "Contratista", "Adjudicatario"])
-    ident = _get_first(contrato_map, ["Identificacion del Contratista", "Identificacion del Contratista", "NIT del Contratista", "NIT", "Cedula", "Cedula", "Identificacion", "Identificacion"])
-    if not ident:
-        ident = _get_first(general_map, ["Identificacion", "Identificacion", "NIT", "Cedula", "Cedula"])
-    rep_legal = _get_first(contrato_map, ["Nombre del Representante Legal del Contratista", "Representante Legal", "Representante"])
-    if not rep_legal:
-        rep_legal = _get_first(general_map, ["Representante Legal", "Representante"])
+def _timed_field(field: str, fn: Callable[..., Any], *args: Any) -> Any:
+    t0 = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        FIELD_SECONDS.observe(time.perf_counter() - t0, field=field)
 
-    rep_ident = _get_first(
-        contrato_map,
-        [
-            "Identificacion del Representante Legal del Contratista",
-            "Identificacion del Representante Legal",
-            "Identificacion Representante Legal",
-            "Cedula Representante",
-            "Identificacion Representante",
-        ],
-    )
-    if not rep_ident:
-        rep_ident = _get_first(general_map, ["Identificacion del Representante Legal", "Identificacion Representante Legal"])
 
-    tipo_ident = _extract_id_type(ident)
-    ident_clean = _clean_id(ident)
+def _build_record_from_soup(soup, constancia_ok: str) -> Dict[str, str]:
+    # Un solo indice por pagina: todas las extracciones consultan el mismo recorrido
+    idx = _timed_field("indice", _as_index, soup)
 
-    # Prioridad: identificacion del representante legal capturada por rotulo (mas estable en SECOP)
-    rep_ident_final = _clean_id(rep_id_raw or rep_ident)
-
-    # BPIM (si esta en cualquier mapa)
-    bpim = _get_first(contrato_map, ["BPIM", "BPIN", "Codigo BPIM", "Codigo BPIM"])
-    if not bpim:
-        bpim = _get_first(general_map, ["BPIM", "BPIN", "Codigo BPIM", "Codigo BPIM"])
-
-    bpim = _clean_bpim(bpim)
-
-    tipo_gasto = _get_first(general_map, ["Tipo de Gasto", "Tipo Gasto"])
-    if not tipo_gasto:
-        tipo_gasto = _get_first(contrato_map, ["Tipo de Gasto", "Tipo Gasto"])
-    tipo_proc = _determine_tipo_proceso(tipo_gasto)
-
-    record = {
-        "Numero de proceso (informativo)": num_proceso_info,
-        "Numero de constancia": constancia_ok,
-        "Tipo de Gasto": tipo_proc,
-        "Estado del proceso": estado_proc,
-        "Modalidad de contratacion": modalidad,
-        "Fuente de financiacion": fuente_fin,
-        "Registro Presupuestal (RP)": rp_code,
-        "Certificado de disponibilidad presupuestal": cdp,
-        "Numero de contrato": num_contrato,
-        "Objeto del contrato": objeto,
-        "Valor del contrato (COP)": valor_num,
-        "Plazo de ejecucion": plazo,
-        "Fecha de inicio": fecha_inicio,
-        "Fecha de terminacion": fecha_fin,
-        "Razon social del proponente/contratista": razon_social,
-        "Tipo de identificacion": tipo_ident,
-        "Identificacion del proponente/contratista": ident_clean,
-        "Representante legal": rep_legal,
-        "Identificación del representante legal": rep_ident_final,
-        "Codigo BPIM": bpim,
-        "Fuente del documento": "SECOP I (detalleProceso)",
-    }
+    record = FIELD_PLAN.bind(idx, constancia=constancia_ok).record()
 
-    estado_val, obs_val = _estado_validacion(record)
+    estado_val, obs_val = _timed_field("validacion", _estado_validacion, record)
     # Observaciones extendidas: anadir faltantes de campos importantes de contrato/presupuesto
     obs_parts = []
     if obs_val:
         obs_parts.append(obs_val)
     # Faltantes extra
-    extra_keys = ["Numero de contrato", "Plazo de ejecucion", "Fecha de inicio"]
+    extra_keys = FIELD_PLAN.columns_with(field_plan.IMPORTANT)
     missing_extra = [k for k in extra_keys if not (record.get(k) or "").strip()]
     if missing_extra:
         obs_parts.append("Campos sin dato: " + ", ".join(missing_extra))
@@ -928,32 +1960,36 @@ def extract_to_excel(
     out_dir: Path,
     headless: bool = False,
     template_path: Optional[Path] = None,
+    pool=None,
+    cache: Optional[HtmlCache] = None,
+    export_formats: Sequence[str] = (),
 ) -> Path:
     """
     Extrae datos del detalle SECOP I y llena la plantilla estandar (v1.2.3+).
-    Genera un XLSX por constancia.
+    Genera un XLSX por constancia; export_formats agrega csv/parquet/arrow con el mismo nombre.
     """
     constancia_ok = validate_constancia(constancia)
+    formats = _check_export_formats(export_formats)
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
     if template_path is None:
         template_path = TEMPLATES_DIR / "Plantilla_Salida_EXTRACTOR_SECOP_v1.2.10.xlsx"
 
-    html = fetch_detail_html(constancia_ok, headless=headless)
-    soup = BeautifulSoup(html, "html.parser")
-    record = _build_record_from_soup(soup, constancia_ok)
+    html = cache.get(constancia_ok) if cache is not None else None
+    from_cache = html is not None
+    if not from_cache:
+        html = fetch_detail_html(constancia_ok, headless=headless, pool=pool)
+    record = _build_record_from_soup(parse_detail_html(html), constancia_ok)
+    if cache is not None and not from_cache:
+        cache.put(constancia_ok, html, record=record)
 
     # Escribir en plantilla
-    wb = _load_template(template_path)
-    ws = wb["Resultados_Extraccion"]
-    headers = [c.value for c in ws[1]]
-
-    row_idx = _find_next_row(ws)
-    _write_record_row(ws, wb, headers, record, constancia_ok, row_idx)
-
     out_path = out_dir / f"Resultados_Extraccion_{constancia_ok}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    wb.save(out_path)
+    writer = _open_results_writer(template_path, out_path)
+    writer.write_record(constancia_ok, record)
+    writer.close()
+    _export_columnar([(constancia_ok, record)], out_path, formats)
     return out_path
 
 
@@ -964,68 +2000,92 @@ def extract_batch_to_excel(
     template_path: Optional[Path] = None,
     delay_seconds: float = 30.0,
     backoff_max_seconds: float = 600.0,
+    pool=None,
+    http_fast_path: bool = HTTP_FAST_PATH,
+    cache: Optional[HtmlCache] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    journal_path: Optional[Path] = None,
+    resume: bool = False,
+    export_formats: Sequence[str] = (),
+    rate_profile: Optional[rate_limit.RateProfile] = None,
+    breaker: Optional[circuit_breaker.CircuitBreaker] = None,
+    fetch_workers: int = FETCH_WORKERS,
 ) -> Tuple[Path, List[Tuple[str, str]]]:
+    """
+    Procesa el lote y genera un XLSX con todas las constancias.
+
+    Cada resultado se guarda en una bitacora JSONL (batch_journal) apenas termina la
+    constancia y la fila se envia al Excel en streaming (xlsx_export). Con resume=True
+    se reutiliza la bitacora de `journal_path`: sus registros van primero al Excel y
+    esas constancias no se vuelven a pedir.
+    Sin journal_path la bitacora va en <out_dir>/_journal/ y se borra si el lote termina.
+    Con export_formats (csv, parquet, arrow) los registros tipados se exportan desde la
+    bitacora junto al Excel, con el mismo nombre (columnar_export.export_path).
+    rate_profile (rate_limit.PROFILES) fija el ritmo; sin el se usa delay_seconds.
+    Ante un bloqueo el lote espera a que SECOP se recupere (breaker, ver _BatchRun).
+    fetch_workers > 1 pide lo que no esta en cache con varias sesiones a la vez.
+    """
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
     if template_path is None:
         template_path = TEMPLATES_DIR / "Plantilla_Salida_EXTRACTOR_SECOP_v1.2.10.xlsx"
+    if resume and journal_path is None:
+        raise SecopExtractionError("Para reanudar un lote se requiere la ruta de su bitacora.")
+    formats = _check_export_formats(export_formats)
 
-    wb = _load_template(template_path)
-    ws = wb["Resultados_Extraccion"]
-    headers = [c.value for c in ws[1]]
-    row_idx = _find_next_row(ws)
+    out_path = out_dir / f"Resultados_Extraccion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    own_journal = journal_path is None
+    if own_journal:
+        journal_path = out_dir / JOURNAL_DIRNAME / f"{out_path.stem}.jsonl"
+    journal = BatchJournal(journal_path)
+    if not resume and len(journal):
+        raise SecopExtractionError(f"La bitacora {journal_path.name} ya tiene resultados; usa resume para continuar.")
+    skip = journal.completed() if resume else set()
+    if skip:
+        logger.info(f"Reanudando lote: {len(skip)} constancia(s) ya extraidas en {journal_path.name}")
+
+    writer = _open_results_writer(template_path, out_path)
+    writer.write_records(journal.records())
+
+    run = _BatchRun(
+        constancias,
+        headless=headless,
+        delay_seconds=delay_seconds,
+        backoff_max_seconds=backoff_max_seconds,
+        pool=pool,
+        http_fast_path=http_fast_path,
+        cache=cache,
+        progress=progress,
+        skip=skip,
+        rate_profile=rate_profile,
+        breaker=breaker,
+        fetch_workers=fetch_workers,
+    )
 
-    errors: List[Tuple[str, str]] = []
-    blocked = False
-    backoff = delay_seconds
+    def _write(constancia_ok: str, record: Dict[str, str]) -> None:
+        journal.append_record(constancia_ok, record)
+        writer.write_record(constancia_ok, record)
 
-    total_constancias = len(constancias)
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=headless)
-        context = browser.new_context(viewport={"width": 1280, "height": 720})
-        page = context.new_page()
+    with metrics.REGISTRY.summary() as timings:
         try:
-            if total_constancias > 2:
-                warmup = random.uniform(15.0, 30.0)
-                time.sleep(warmup)
-            for idx, c in enumerate(constancias):
-                try:
-                    constancia_ok = validate_constancia(c)
-                    # Pausa antes de abrir el detalle para evitar bloqueos
-                    if total_constancias > 2 and idx > 0:
-                        jitter = random.uniform(0.8, 1.2)
-                        time.sleep(backoff * jitter)
-                    html = _fetch_detail_html_with_page(page, constancia_ok)
-                    soup = BeautifulSoup(html, "html.parser")
-                    record = _build_record_from_soup(soup, constancia_ok)
-                    _write_record_row(ws, wb, headers, record, constancia_ok, row_idx)
-                    row_idx += 1
-                    backoff = delay_seconds
-                except SecopExtractionError as e:
-                    msg = str(e)
-                    errors.append((c, msg))
-                    if "bloqueado" in msg.lower() or "blocked" in msg.lower():
-                        blocked = True
-                        break
-                    backoff = min(backoff * 2, backoff_max_seconds)
-                except Exception as e:
-                    errors.append((c, str(e)))
-                    backoff = min(backoff * 2, backoff_max_seconds)
-
-        finally:
-            context.close()
-            browser.close()
-
-    if errors:
-        if "Errores" in wb.sheetnames:
-            del wb["Errores"]
-        _append_errors_sheet(wb, errors)
-
-    out_path = out_dir / f"Resultados_Extraccion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    wb.save(out_path)
+            run.run(_write, journal.append_error)
+        except BaseException:
+            # Lo extraido queda en la bitacora; el Excel parcial no se guarda
+            writer.discard()
+            raise
+    blocked = run.blocked
+
+    errors = journal.errors()
+    writer.write_errors(errors)
+    _write_timings(writer, timings)
+    writer.close()
+    _export_columnar(journal.records, out_path, formats)
     if blocked:
         errors.append(("_BLOQUEO_", "Lote detenido por bloqueo anti-DDoS. Reintenta mas tarde."))
+        logger.warning(f"Lote bloqueado; para reanudarlo usa la bitacora {journal_path}")
+    elif own_journal:
+        journal_path.unlink(missing_ok=True)
     return out_path, errors
 
 
@@ -1036,74 +2096,116 @@ def append_batch_to_excel(
     template_path: Optional[Path] = None,
     delay_seconds: float = 30.0,
     backoff_max_seconds: float = 600.0,
+    pool=None,
+    http_fast_path: bool = HTTP_FAST_PATH,
+    cache: Optional[HtmlCache] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    export_formats: Sequence[str] = (),
+    rate_profile: Optional[rate_limit.RateProfile] = None,
+    breaker: Optional[circuit_breaker.CircuitBreaker] = None,
+    fetch_workers: int = FETCH_WORKERS,
 ) -> Tuple[Path, List[Tuple[str, str]], int]:
+    """
+    Agrega el lote a un Excel acumulado (out_path).
+
+    Lo acumulado vive en la bitacora <out_path>.jsonl: cada llamada agrega ahi sus
+    resultados y reescribe el Excel en streaming desde la bitacora, sin cargar el libro
+    anterior. Un libro acumulado sin bitacora (version anterior) se importa una vez.
+    Con export_formats los archivos csv/parquet/arrow se reescriben con todo lo acumulado.
+    """
     out_path = Path(out_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     if template_path is None:
         template_path = TEMPLATES_DIR / "Plantilla_Salida_EXTRACTOR_SECOP_v1.2.10.xlsx"
 
-    if out_path.exists():
-        wb = openpyxl.load_workbook(out_path)
-        if "Resultados_Extraccion" not in wb.sheetnames:
-            raise SecopExtractionError("La plantilla no contiene la hoja 'Resultados_Extraccion'.")
-    else:
-        wb = _load_template(template_path)
-
-    ws = wb["Resultados_Extraccion"]
-    headers = [c.value for c in ws[1]]
-    row_idx = _find_next_row(ws)
-
-    errors: List[Tuple[str, str]] = []
-    blocked = False
-    backoff = delay_seconds
-    ok_count = 0
-
-    total_constancias = len(constancias)
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=headless)
-        context = browser.new_context(viewport={"width": 1280, "height": 720})
-        page = context.new_page()
+    formats = _check_export_formats(export_formats)
+    journal = BatchJournal(out_path.with_suffix(".jsonl"))
+    if out_path.exists() and not len(journal):
         try:
-            if total_constancias > 2:
-                warmup = random.uniform(15.0, 30.0)
-                time.sleep(warmup)
-            for idx, c in enumerate(constancias):
-                try:
-                    constancia_ok = validate_constancia(c)
-                    if total_constancias > 2 and idx > 0:
-                        jitter = random.uniform(0.8, 1.2)
-                        time.sleep(backoff * jitter)
-                    html = _fetch_detail_html_with_page(page, constancia_ok)
-                    soup = BeautifulSoup(html, "html.parser")
-                    record = _build_record_from_soup(soup, constancia_ok)
-                    _write_record_row(ws, wb, headers, record, constancia_ok, row_idx)
-                    row_idx += 1
-                    ok_count += 1
-                    backoff = delay_seconds
-                except SecopExtractionError as e:
-                    msg = str(e)
-                    errors.append((c, msg))
-                    if "bloqueado" in msg.lower() or "blocked" in msg.lower():
-                        blocked = True
-                        break
-                    backoff = min(backoff * 2, backoff_max_seconds)
-                except Exception as e:
-                    errors.append((c, str(e)))
-                    backoff = min(backoff * 2, backoff_max_seconds)
-        finally:
-            context.close()
-            browser.close()
+            for constancia, record in read_results(out_path):
+                journal.append_record(constancia, record)
+            for constancia, message in read_errors(out_path):
+                journal.append_error(constancia, message)
+        except ValueError as e:
+            raise SecopExtractionError(str(e)) from e
+
+    # El libro se escribe al final en un temporal; abrirlo ya valida la plantilla
+    tmp_path = out_path.with_name(out_path.stem + ".tmp.xlsx")
+    writer = _open_results_writer(template_path, tmp_path)
+
+    run = _BatchRun(
+        constancias,
+        headless=headless,
+        delay_seconds=delay_seconds,
+        backoff_max_seconds=backoff_max_seconds,
+        pool=pool,
+        http_fast_path=http_fast_path,
+        cache=cache,
+        progress=progress,
+        rate_profile=rate_profile,
+        breaker=breaker,
+        fetch_workers=fetch_workers,
+    )
+    ok_count = 0
 
-    if errors:
-        _append_errors_sheet(wb, errors)
+    def _write(constancia_ok: str, record: Dict[str, str]) -> None:
+        nonlocal ok_count
+        journal.append_record(constancia_ok, record)
+        ok_count += 1
 
-    wb.save(out_path)
+    with metrics.REGISTRY.summary() as timings:
+        try:
+            run.run(_write, journal.append_error)
+        except BaseException:
+            writer.discard()
+            raise
+        writer.write_records(journal.records())
+    errors = run.errors
+    blocked = run.blocked
+
+    writer.write_errors(journal.errors())
+    _write_timings(writer, timings)
+    writer.close()
+    os.replace(tmp_path, out_path)
+    _export_columnar(journal.records, out_path, formats)
     if blocked:
         errors.append(("_BLOQUEO_", "Lote detenido por bloqueo anti-DDoS. Reintenta mas tarde."))
     return out_path, errors, ok_count
 
 
+def extract_fields(page, fields: Optional[Iterable[str]] = None, constancia_ok: str = "") -> Dict[str, Any]:
+    """
+    Registro parcial de una pagina ya parseada: solo se evaluan los campos pedidos (nombre del
+    plan, p.ej. "rp", o columna de la plantilla) y las secciones que esos campos necesitan.
+    Las claves son las columnas (o el nombre para campos sin columna, como "departamento").
+    Sin fields se arma el registro completo, con estado de validacion y observaciones.
+    """
+    if fields is None:
+        return _build_record_from_soup(page, constancia_ok)
+    try:
+        names = FIELD_PLAN.field_names(fields)
+    except ValueError as e:
+        raise SecopExtractionError(str(e)) from e
+    idx = _timed_field("indice", _as_index, page)
+    return FIELD_PLAN.bind(idx, constancia=constancia_ok).values(names)
+
+
+def extract(
+    html: str,
+    fields: Optional[Iterable[str]] = None,
+    constancia_ok: str = "",
+    parser: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Extrae del HTML de detalle solo los campos pedidos (modo OFFLINE, sin Playwright).
+
+        extract(html, fields={"rp", "cdp"})
+        -> {"Registro Presupuestal (RP)": "...", "Certificado de disponibilidad presupuestal": "..."}
+    """
+    return extract_fields(parse_detail_html(html, parser), fields, constancia_ok)
+
+
 def extract_record_from_html(html: str, constancia_ok: str = "") -> dict:
     """Extrae un subconjunto de campos criticos desde HTML (modo OFFLINE).
 
@@ -1111,35 +2213,59 @@ def extract_record_from_html(html: str, constancia_ok: str = "") -> dict:
     - No escribe Excel
     - Esta disenado para validacion y regresion de extraccion (RP y CDP)
     """
-    soup = BeautifulSoup(html, "html.parser")
+    return {"Numero de constancia": constancia_ok, **extract(html, fields={"rp", "cdp"})}
 
-    rp_code = _extract_crp_code(soup)
-    cdp = _extract_cdp(soup)
 
-    return {
-        "Numero de constancia": constancia_ok,
-        "Registro Presupuestal (RP)": rp_code,
-        "Certificado de disponibilidad presupuestal": cdp,
-    }
+# Compatibilidad con tu UI: permite secop_extract.main(url) o main(constancia)
+def _constancia_from_arg(arg: str) -> str:
+    s = (arg or "").strip()
+    if "numConstancia=" in s:
+        return s.split("numConstancia=", 1)[1].split("&", 1)[0]
+    return s
 
 
-# Compatibilidad con tu UI: permite secop_extract.main(url) o main(constancia)
-def main(arg: str):
+def main(arg: str, export_formats: Sequence[str] = ()):
     """
     Soporta:
     - main("25-11-14555665")
     - main("https://www.contratos.gov.co/consultas/detalleProceso.do?numConstancia=25-11-14555665")
+    - main("25-11-14555665", export_formats=["csv", "parquet"])
     """
-    s = (arg or "").strip()
-    if "numConstancia=" in s:
-        const = s.split("numConstancia=", 1)[1].split("&", 1)[0]
-    else:
-        const = s
-    return extract_to_excel(const, Path.home() / "secop_exports", headless=False)
+    const = _constancia_from_arg(arg)
+    return extract_to_excel(
+        const, Path.home() / "secop_exports", headless=False, cache=open_html_cache(), export_formats=export_formats
+    )
 
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) < 2:
-        raise SystemExit("Uso: python scripts\\secop_extract.py <numConstancia>")
-    print(main(sys.argv[1]))
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extrae constancias SECOP I a la plantilla Excel.")
+    parser.add_argument("constancias", nargs="+", help="numConstancia o URL del detalle (varias => un lote)")
+    parser.add_argument(
+        "--formato",
+        default="",
+        help=f"Formatos extra separados por coma: {', '.join(columnar_export.EXPORT_FORMATS)} (parquet/arrow requieren pyarrow)",
+    )
+    parser.add_argument("--salida", default=str(Path.home() / "secop_exports"), help="Carpeta de salida")
+    args = parser.parse_args()
+
+    try:
+        formats = _check_export_formats(args.formato)
+    except SecopExtractionError as e:
+        parser.error(str(e))
+    constancias = [_constancia_from_arg(a) for a in args.constancias]
+    errors = []
+    if len(constancias) == 1:
+        out_path = extract_to_excel(
+            constancias[0], Path(args.salida), headless=False, cache=open_html_cache(), export_formats=formats
+        )
+    else:
+        out_path, errors = extract_batch_to_excel(
+            constancias, Path(args.salida), headless=False, cache=open_html_cache(), export_formats=formats
+        )
+    print(out_path)
+    for fmt in formats:
+        print(columnar_export.export_path(out_path, fmt))
+    for constancia, message in errors:
+        print(f"  ERROR {constancia}: {message}")
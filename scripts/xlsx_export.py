@@ -0,0 +1,360 @@
+# xlsx_export.py
+"""
+Escritura del Excel de resultados en streaming (openpyxl write-only).
+
+El libro de salida no se arma cargando la plantilla y escribiendo celda por celda:
+las filas se envian a disco a medida que llegan, con memoria constante sin importar
+cuantas constancias tenga el lote. De la plantilla se replica:
+- las hojas en el mismo orden (Config se copia completa)
+- en Resultados_Extraccion: encabezado con su estilo, orden de columnas, anchos,
+  panel fijo y las filas de la plantilla que queden despues de los datos
+  (formula de "Abrir detalle" incluida)
+- la columna "Abrir detalle" como hipervinculo a SECOP (base tomada de Config!B1).
+  Se escribe como formula HYPERLINK, igual que en la plantilla: los hipervinculos de
+  celda de openpyxl agregan una relacion por fila y guardar cuesta O(n^2) filas.
+
+Los errores del lote van al final en la hoja "Errores" (numConstancia, error) y, si se
+pide, el resumen de tiempos del lote en la hoja "Tiempos" (metrics.TimingSummary).
+
+La plantilla se procesa una vez (TemplateSchema: encabezados, columna de vinculo, base
+de URL, columnas con formula, filas del cuerpo) y queda en cache entre lotes; se vuelve
+a leer solo si cambia la fecha de modificacion del archivo.
+
+Uso:
+    with XlsxStreamWriter(template_path, out_path, SECOP_BASE_URL) as writer:
+        for constancia, record in records:
+            writer.write_record(constancia, record)
+        writer.write_errors(errors)
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import unicodedata
+from copy import copy
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles.cell_style import StyleArray
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RESULTS_SHEET = "Resultados_Extraccion"
+ERRORS_SHEET = "Errores"
+TIMINGS_SHEET = "Tiempos"
+CONFIG_SHEET = "Config"
+LINK_HEADER = "Abrir detalle"
+LINK_TEXT = "Abrir"
+LINK_FORMULA = '=HYPERLINK("{url}", "{text}")'
+# Columnas que marcan una fila con datos al leer un libro ya escrito (read_results)
+KEY_HEADERS = ("Numero de proceso (informativo)", "Numero de constancia")
+
+WRITE_SECONDS = metrics.histogram("secop_xlsx_write_seconds", "Escritura del Excel de resultados (row, save)", ("op",))
+
+
+def _norm_key(s: str) -> str:
+    s = (s or "").strip().lower()
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    s = re.sub(r"\s+", " ", s)
+    s = s.replace(":", "")
+    return s
+
+
+def _is_blank(value: Any) -> bool:
+    return value is None or str(value).strip() == ""
+
+
+class TemplateSchema:
+    """
+    Plantilla de salida procesada una sola vez:
+    - headers / columns: encabezados y mapa encabezado normalizado -> columna (0-based)
+    - link_col y link_base: columna "Abrir detalle" y base de URL (Config!B1)
+    - formula_cols: columnas con formula en el cuerpo de la plantilla
+    - body: filas de la plantilla (sin encabezado) con su estilo
+    - first_free: primera fila del cuerpo sin datos (las anteriores se conservan)
+
+    Se obtiene con load_template_schema(), que la reutiliza mientras el archivo no cambie.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"No se encontro la plantilla: {self.path}")
+        self.mtime_ns = self.path.stat().st_mtime_ns
+        self.workbook = openpyxl.load_workbook(self.path)
+        if RESULTS_SHEET not in self.workbook.sheetnames:
+            raise ValueError(f"La plantilla no contiene la hoja '{RESULTS_SHEET}'.")
+
+        ws = self.workbook[RESULTS_SHEET]
+        self.headers = [c.value for c in ws[1]]
+        self.columns: Dict[str, int] = {}
+        for col, h in enumerate(self.headers):
+            key = _norm_key(str(h or ""))
+            if key:
+                self.columns.setdefault(key, col)
+        self.link_col = self.columns.get(_norm_key(LINK_HEADER))
+        self.link_base = ""
+        if CONFIG_SHEET in self.workbook.sheetnames:
+            self.link_base = str(self.workbook[CONFIG_SHEET]["B1"].value or "").strip()
+
+        self.body = [list(row) for row in ws.iter_rows(min_row=2, max_row=ws.max_row, max_col=len(self.headers))]
+        self.formula_cols = {c.column - 1 for row in self.body for c in row if c.data_type == "f"}
+        self.first_free = 0
+        while self.first_free < len(self.body) and self._is_filled(self.body[self.first_free]):
+            self.first_free += 1
+        # Claves de registro ya resueltas a columna (los registros repiten las mismas claves)
+        self._record_cols: Dict[str, Optional[int]] = {}
+
+    def _is_filled(self, row: List[Any]) -> bool:
+        return any(not _is_blank(c.value) for c in row if c.column - 1 not in self.formula_cols)
+
+    def column_of(self, key: str) -> Optional[int]:
+        """Columna (0-based) del campo del registro, o None si la plantilla no lo tiene."""
+        try:
+            return self._record_cols[key]
+        except KeyError:
+            col = self._record_cols[key] = self.columns.get(_norm_key(key))
+            return col
+
+
+_SCHEMAS: Dict[Path, TemplateSchema] = {}
+_SCHEMAS_LOCK = threading.Lock()
+
+
+def load_template_schema(template_path: Path) -> TemplateSchema:
+    """Esquema de la plantilla en cache; se vuelve a leer si cambia la fecha del archivo."""
+    path = Path(template_path)
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        raise FileNotFoundError(f"No se encontro la plantilla: {path}")
+    key = path.resolve()
+    with _SCHEMAS_LOCK:
+        schema = _SCHEMAS.get(key)
+        if schema is None or schema.mtime_ns != mtime_ns:
+            schema = _SCHEMAS[key] = TemplateSchema(path)
+            logger.debug(f"Plantilla cargada: {path.name} ({len(schema.headers)} columnas)")
+        return schema
+
+
+class XlsxStreamWriter:
+    """
+    Libro de resultados en modo write-only a partir de la plantilla (TemplateSchema).
+
+    Lanza FileNotFoundError si la plantilla no existe y ValueError si no tiene la
+    hoja Resultados_Extraccion.
+    """
+
+    def __init__(self, template_path: Path, out_path: Path, default_link_base: str = ""):
+        self.schema = load_template_schema(template_path)
+        self.out_path = Path(out_path)
+        self.link_base = self.schema.link_base or default_link_base
+        self.rows_written = 0
+        self._closed = False
+        self._wb = openpyxl.Workbook(write_only=True)
+        self._styles: Dict[Tuple[str, int], StyleArray] = {}
+        self._link_style: Optional[StyleArray] = None
+
+        template = self.schema.workbook
+        self._ws = None
+        for sheet in template.worksheets:
+            ws = self._wb.create_sheet(sheet.title)
+            self._copy_layout(sheet, ws)
+            if sheet.title == RESULTS_SHEET:
+                self._ws = ws
+            else:
+                for row in sheet.iter_rows():
+                    ws.append([self._cell_from(ws, c, c.value) for c in row])
+
+        self._ws.append([self._cell_from(self._ws, c, c.value) for c in template[RESULTS_SHEET][1]])
+        self._row = 2
+        # Filas ya ocupadas en la plantilla: se conservan tal cual antes de los datos
+        while self._row - 2 < self.schema.first_free:
+            self._emit_template_row()
+
+    # -----------------------------
+    # Plantilla
+    # -----------------------------
+    @staticmethod
+    def _copy_layout(src, ws) -> None:
+        for key, dim in src.column_dimensions.items():
+            if dim.width:
+                ws.column_dimensions[key].width = dim.width
+            if dim.hidden:
+                ws.column_dimensions[key].hidden = True
+        if src.freeze_panes:
+            ws.freeze_panes = src.freeze_panes
+        if src.sheet_properties.tabColor is not None:
+            ws.sheet_properties.tabColor = copy(src.sheet_properties.tabColor)
+
+    def _style_of(self, ws, cell) -> Optional[StyleArray]:
+        """Estilo de la celda de plantilla registrado en el libro de salida (una vez por estilo)."""
+        if not cell.has_style:
+            return None
+        key = (ws.title, cell.style_id)
+        style = self._styles.get(key)
+        if style is None:
+            probe = WriteOnlyCell(ws)
+            probe.font = copy(cell.font)
+            probe.fill = copy(cell.fill)
+            probe.border = copy(cell.border)
+            probe.alignment = copy(cell.alignment)
+            probe.number_format = cell.number_format
+            probe.protection = copy(cell.protection)
+            style = self._styles[key] = probe._style
+        return style
+
+    def _cell_from(self, ws, template_cell, value: Any) -> WriteOnlyCell:
+        cell = WriteOnlyCell(ws, value=value)
+        style = self._style_of(ws, template_cell)
+        if style is not None:
+            cell._style = StyleArray(style)
+        return cell
+
+    def _link_cell(self, constancia: str) -> WriteOnlyCell:
+        url = (self.link_base + constancia).replace('"', '""')
+        cell = WriteOnlyCell(self._ws, value=LINK_FORMULA.format(url=url, text=LINK_TEXT))
+        if self._link_style is None:
+            cell.style = "Hyperlink"
+            self._link_style = StyleArray(cell._style)
+        else:
+            cell._style = StyleArray(self._link_style)
+        return cell
+
+    def _template_row(self) -> List[Any]:
+        i = self._row - 2
+        body = self.schema.body
+        return body[i] if i < len(body) else []
+
+    def _emit_template_row(self) -> None:
+        self._ws.append([self._cell_from(self._ws, c, c.value) for c in self._template_row()])
+        self._row += 1
+
+    # -----------------------------
+    # API
+    # -----------------------------
+    def write_record(self, constancia: str, record: Dict[str, Any]) -> None:
+        """Agrega una fila: los campos del registro por encabezado y el vinculo al detalle."""
+        with WRITE_SECONDS.time(op="row"):
+            self._write_row(constancia, record)
+
+    def _write_row(self, constancia: str, record: Dict[str, Any]) -> None:
+        schema = self.schema
+        values: Dict[int, Any] = {}
+        for key, value in record.items():
+            col = schema.column_of(key)
+            if col is not None:
+                values[col] = value
+        template_row = self._template_row()
+        cells: List[Any] = []
+        for col in range(len(schema.headers)):
+            src = template_row[col] if col < len(template_row) else None
+            if col == schema.link_col and constancia:
+                cells.append(self._link_cell(constancia))
+                continue
+            value = values[col] if col in values else (src.value if src is not None else None)
+            cells.append(self._cell_from(self._ws, src, value) if src is not None else value)
+        self._ws.append(cells)
+        self._row += 1
+        self.rows_written += 1
+
+    def write_records(self, records: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        for constancia, record in records:
+            self.write_record(constancia, record)
+
+    def write_errors(self, errors: List[Tuple[str, str]]) -> None:
+        if not errors:
+            return
+        ws = self._wb.create_sheet(ERRORS_SHEET)
+        ws.append(["numConstancia", "error"])
+        for c, err in errors:
+            ws.append([c, err])
+
+    def write_timings(self, rows: List[List[Any]]) -> None:
+        """Hoja de tiempos del lote (filas de metrics.TimingSummary.rows())."""
+        if not rows:
+            return
+        ws = self._wb.create_sheet(TIMINGS_SHEET)
+        ws.column_dimensions["A"].width = 28
+        ws.column_dimensions["B"].width = 28
+        ws.append(metrics.SUMMARY_HEADERS)
+        for row in rows:
+            ws.append(row)
+
+    def close(self) -> Path:
+        """Completa las filas restantes de la plantilla y guarda el libro."""
+        if self._closed:
+            return self.out_path
+        while self._row - 2 < len(self.schema.body):
+            self._emit_template_row()
+        with WRITE_SECONDS.time(op="save"):
+            self._wb.save(self.out_path)
+        self._closed = True
+        logger.debug(f"Excel escrito en streaming: {self.out_path.name} ({self.rows_written} fila(s))")
+        return self.out_path
+
+    def discard(self) -> None:
+        """Abandona el libro sin guardarlo (lote interrumpido) y borra sus temporales."""
+        if self._closed:
+            return
+        self._closed = True
+        for ws in self._wb.worksheets:
+            try:
+                if not ws.closed:
+                    ws.close()
+                if ws._writer is not None:
+                    ws._writer.cleanup()
+            except OSError:
+                pass
+
+    def __enter__(self) -> "XlsxStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def read_results(path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    (constancia, registro) de las filas con datos de un Excel de resultados ya escrito
+    (modo read-only). Sirve para pasar a la bitacora un libro acumulado anterior.
+    """
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        if RESULTS_SHEET not in wb.sheetnames:
+            raise ValueError(f"El libro no contiene la hoja '{RESULTS_SHEET}'.")
+        rows = wb[RESULTS_SHEET].iter_rows(values_only=True)
+        headers = [str(h or "") for h in next(rows, ())]
+        keys = [_norm_key(h) for h in headers]
+        const_col = keys.index(_norm_key("Numero de constancia")) if _norm_key("Numero de constancia") in keys else None
+        key_cols = [keys.index(_norm_key(h)) for h in KEY_HEADERS if _norm_key(h) in keys]
+        for row in rows:
+            if not any(k < len(row) and not _is_blank(row[k]) for k in key_cols):
+                continue
+            record = {h: v for h, k, v in zip(headers, keys, row) if h and k != _norm_key(LINK_HEADER)}
+            constancia = str(row[const_col] or "").strip() if const_col is not None and const_col < len(row) else ""
+            yield constancia, record
+    finally:
+        wb.close()
+
+
+def read_errors(path: Path) -> List[Tuple[str, str]]:
+    """Filas de la hoja Errores de un Excel de resultados ([] si no la tiene)."""
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        if ERRORS_SHEET not in wb.sheetnames:
+            return []
+        rows = wb[ERRORS_SHEET].iter_rows(min_row=2, values_only=True)
+        return [(str(r[0] or ""), str(r[1] or "")) for r in rows if r and r[0]]
+    finally:
+        wb.close()
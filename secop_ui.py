@@ -5,7 +5,7 @@ Interfaz web Flask para procesamiento por lotes de constancias SECOP.
 Proporciona:
 - Interfaz HTML simple para ingresar constancias
 - Deteccion automatica de constancias en texto pegado
-- Procesamiento secuencial con manejo de reCAPTCHA
+- Procesamiento secuencial con manejo de reCAPTCHA, en segundo plano (cola de trabajos)
 - Generacion automatica de resultados
 - Descargas seguras con tokens aleatorios
 """
@@ -13,16 +13,18 @@ Proporciona:
 from __future__ import annotations
 
 import os
+import atexit
 import secrets
 import logging
 import time
+import json
 import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Tuple, Dict, Optional
+from typing import Any, Tuple, Dict, List, Optional
 from html import escape
 
-from flask import Flask, request, send_file, render_template, url_for, redirect, after_this_request, session, jsonify
+from flask import Flask, Response, request, send_file, render_template, url_for, redirect, after_this_request, session, jsonify
 
 BASE_DIR = Path(__file__).resolve().parent
 SCRIPTS_DIR = BASE_DIR / "scripts"
@@ -31,6 +33,11 @@ if SCRIPTS_DIR.exists():
 
 import secop_extract
 import constancia_config
+import browser_pool
+import columnar_export
+import job_queue
+import metrics
+import rate_limit
 
 # ============================================================================
 # CONFIGURACION DE LOGGING
@@ -73,6 +80,154 @@ MAX_ERRORS_DISPLAY = 25  # Limite de errores mostrados en UI
 _WORKSPACES: Dict[str, Tuple[Path, float, int]] = {}
 MAX_WORKSPACE_AGE_SECONDS = 6 * 3600  # 6 horas
 
+# ============================================================================
+# POOL DE NAVEGADOR
+# ============================================================================
+# Navegador compartido y caliente entre lotes (evita el arranque de Chromium por lote).
+# SECOP_BROWSER_POOL=0 desactiva el pool y vuelve a un navegador por lote.
+BROWSER_POOL_ENABLED = os.environ.get("SECOP_BROWSER_POOL", "1").strip() != "0"
+BROWSER_POOL_MAX_PAGES = int(os.environ.get("SECOP_POOL_MAX_PAGES", str(browser_pool.DEFAULT_MAX_PAGES_PER_CONTEXT)))
+# Navegadores (carriles) del pool: uno por sesion paralela; se abren solo cuando hacen falta
+BROWSER_POOL_MAX_BROWSERS = int(os.environ.get("SECOP_POOL_MAX_BROWSERS", str(browser_pool.DEFAULT_MAX_BROWSERS)))
+BROWSER_POOL: Optional[browser_pool.BrowserPool] = None
+
+
+def start_browser_pool() -> Optional[browser_pool.BrowserPool]:
+    """
+    Arranca el pool de navegador una sola vez por proceso.
+    Si falla, la UI sigue funcionando con un navegador por lote.
+    """
+    global BROWSER_POOL
+    if not BROWSER_POOL_ENABLED or BROWSER_POOL is not None:
+        return BROWSER_POOL
+    try:
+        BROWSER_POOL = browser_pool.BrowserPool(
+            headless=False,
+            max_pages_per_context=BROWSER_POOL_MAX_PAGES,
+            max_browsers=BROWSER_POOL_MAX_BROWSERS,
+        ).start()
+        atexit.register(BROWSER_POOL.close)
+        logger.info("Pool de navegador iniciado")
+    except Exception as e:
+        BROWSER_POOL = None
+        logger.warning(f"No se pudo iniciar el pool de navegador; se usara un navegador por lote: {e}")
+    return BROWSER_POOL
+
+
+def _active_pool() -> Optional[browser_pool.BrowserPool]:
+    if BROWSER_POOL is not None and BROWSER_POOL.is_running:
+        return BROWSER_POOL
+    return None
+
+
+# ============================================================================
+# CACHE DE HTML
+# ============================================================================
+# Re-ejecutar un lote reutiliza el HTML ya descargado (sin navegador ni pausas).
+# SECOP_HTML_CACHE=0 la desactiva.
+HTML_CACHE = secop_extract.open_html_cache()
+
+
+# ============================================================================
+# COLA DE TRABAJOS
+# ============================================================================
+# /extract encola el lote y responde de inmediato; un hilo de fondo lo procesa y
+# persiste el estado (queued/running/done/failed + resultado por constancia).
+# /jobs/<id>/events publica el avance por constancia como Server-Sent Events.
+JOBS_DIR = Path(os.environ.get("SECOP_JOBS_DIR", str(OUTPUT_DIR / "_jobs")))
+SSE_KEEPALIVE_SECONDS = float(os.environ.get("SECOP_SSE_KEEPALIVE_SECONDS", "15"))
+# Bitacora JSONL por lote: un trabajo interrumpido o bloqueado se reanuda sin repetir lo extraido
+JOURNALS_DIR = JOBS_DIR / "journals"
+JOB_QUEUE: Optional[job_queue.JobQueue] = None
+# job_id -> token de descarga vigente
+_JOB_DOWNLOADS: Dict[str, str] = {}
+# Duracion de los lotes por resultado (GET /metrics)
+BATCH_SECONDS = metrics.histogram("secop_batch_seconds", "Duracion de los lotes de la UI", ("outcome",))
+
+
+def _run_extract_job(job: Dict[str, Any], emit: job_queue.Emitter) -> Dict[str, Any]:
+    """Runner de la cola: procesa el lote del trabajo y devuelve la ruta del Excel y los errores."""
+    params = job["params"]
+    journal_id = params.get("journal") or job["id"]
+    logger.info(f"Iniciando extraccion del trabajo {job['id']}: {len(params['constancias'])} constancia(s)")
+    t0 = time.perf_counter()
+    outcome = "failed"
+    try:
+        final_path, errors = secop_extract.extract_batch_to_excel(
+            params["constancias"],
+            OUTPUT_DIR,
+            headless=False,
+            rate_profile=rate_limit.get_profile(params.get("mode")),
+            pool=_active_pool(),
+            cache=HTML_CACHE,
+            progress=emit,
+            journal_path=_journal_path(journal_id),
+            resume=bool(params.get("journal")),
+            export_formats=params.get("formats", []),
+        )
+        outcome = "blocked" if any(c == "_BLOQUEO_" for c, _ in errors) else "done"
+    finally:
+        elapsed = time.perf_counter() - t0
+        BATCH_SECONDS.observe(elapsed, outcome=outcome)
+        logger.info(f"Trabajo {job['id']} terminado ({outcome}) en {elapsed:.1f} s")
+    return {
+        "output_path": str(final_path),
+        "output_name": final_path.name,
+        "exports": {fmt: str(columnar_export.export_path(final_path, fmt)) for fmt in params.get("formats", [])},
+        "errors": [[c, str(e)] for c, e in errors],
+    }
+
+
+def _journal_path(journal_id: str) -> Path:
+    return JOURNALS_DIR / f"{journal_id}.jsonl"
+
+
+def _cleanup_old_journals(max_age_seconds: float = job_queue.DEFAULT_MAX_AGE_SECONDS) -> int:
+    """Elimina bitacoras sin cambios en max_age_seconds (un lote reanudado las renueva)."""
+    now = time.time()
+    deleted = 0
+    for path in JOURNALS_DIR.glob("*.jsonl"):
+        try:
+            if now - path.stat().st_mtime > max_age_seconds:
+                path.unlink()
+                deleted += 1
+        except OSError:
+            pass
+    return deleted
+
+
+def _job_queue() -> job_queue.JobQueue:
+    """Cola de trabajos del proceso (se inicia en el primer uso)."""
+    global JOB_QUEUE
+    if JOB_QUEUE is None:
+        JOB_QUEUE = job_queue.JobQueue(JOBS_DIR, _run_extract_job).start()
+        atexit.register(JOB_QUEUE.close)
+    return JOB_QUEUE
+
+
+def _job_summary(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Estado publico del trabajo para /jobs/<id>."""
+    items = job.get("items") or {}
+    ok = sum(1 for item in items.values() if item["status"] == "ok")
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "total": job.get("total", 0),
+        "processed": len(items),
+        "ok": ok,
+        "failed": len(items) - ok,
+        "items": [{"constancia": c, **item} for c, item in items.items()],
+        "error": job.get("error", ""),
+        "view_url": url_for("job_view", job_id=job["id"]),
+        "events_url": url_for("job_events", job_id=job["id"]),
+    }
+
+
+def _sse_message(event: Dict[str, Any]) -> str:
+    """Evento en formato text/event-stream (id = seq para reanudar con Last-Event-ID)."""
+    data = json.dumps(event, ensure_ascii=False)
+    return f"id: {event['seq']}\nevent: {event['event']}\ndata: {data}\n\n"
+
 
 def cleanup_old_downloads(max_age_seconds: int = MAX_DOWNLOAD_AGE_SECONDS) -> int:
     """
@@ -149,7 +304,15 @@ def _get_workspace_info() -> Tuple[str, Optional[Path], int]:
     return workspace_id, path, count
 
 
-def _render_main(raw: str, result: Optional[dict], mode: str, accumulate: bool, auto_download: bool = False):
+def _render_main(
+    raw: str,
+    result: Optional[dict],
+    mode: str,
+    accumulate: bool,
+    auto_download: bool = False,
+    job: Optional[dict] = None,
+    selected_formats: Optional[List[str]] = None,
+):
     _, batch_path, batch_count = _get_workspace_info()
     return render_template(
         "index.html",
@@ -162,6 +325,11 @@ def _render_main(raw: str, result: Optional[dict], mode: str, accumulate: bool,
         batch_count=batch_count,
         batch_name=batch_path.name if batch_path else "-",
         auto_download=auto_download,
+        job=job,
+        profiles=list(rate_limit.PROFILES.values()),
+        export_formats=list(columnar_export.EXPORT_FORMATS),
+        available_formats=columnar_export.available_formats(),
+        selected_formats=selected_formats or [],
     )
 
 
@@ -180,6 +348,50 @@ def _resolve_output_path(path_value: str) -> Tuple[Optional[Path], Optional[str]
 
 
 
+def _build_result(detected_count: int, final_path: Optional[Path], errors: List[Tuple[str, str]], download_url: Optional[str]) -> dict:
+    """Resumen del lote para el panel de resultados."""
+    # Limitar errores mostrados en UI
+    errors_safe = [(c, escape(str(e))) for c, e in errors]
+    errors_ui = errors_safe[:MAX_ERRORS_DISPLAY]
+    has_more_errors = len(errors) > MAX_ERRORS_DISPLAY
+
+    return {
+        "detected_count": detected_count,
+        "ok_count": detected_count - len(errors),
+        "fail_count": len(errors),
+        "output_name": final_path.name if final_path else "-",
+        "output_path": str(final_path) if final_path else "-",
+        "download_url": download_url,
+        "errors": errors_ui,
+        "has_more_errors": has_more_errors,
+        "total_errors": len(errors),
+    }
+
+
+def _job_download_url(job_id: str, final_path: Path, fmt: str = "xlsx") -> Optional[str]:
+    """Token de descarga de un archivo del trabajo (se crea de nuevo si expiro o ya se uso)."""
+    key = job_id if fmt == "xlsx" else f"{job_id}.{fmt}"
+    token = _JOB_DOWNLOADS.get(key)
+    if token not in _DOWNLOADS:
+        if not final_path.exists():
+            return None
+        token = secrets.token_urlsafe(16)
+        _DOWNLOADS[token] = (final_path, time.time())
+        _JOB_DOWNLOADS[key] = token
+    return url_for("download", token=token)
+
+
+def _job_exports(job_id: str, exports: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Archivos csv/parquet/arrow del trabajo con su enlace de descarga."""
+    items = []
+    for fmt, path_value in exports.items():
+        path = Path(path_value)
+        url = _job_download_url(job_id, path, fmt)
+        if url:
+            items.append({"format": fmt, "name": path.name, "download_url": url})
+    return items
+
+
 # ============================================================================
 # RUTAS
 # ============================================================================
@@ -189,7 +401,9 @@ def index():
     """Pagina principal con formulario de entrada."""
     cleanup_old_downloads()
     cleanup_old_workspaces()
-    return _render_main(raw="", result=None, mode="normal", accumulate=False)
+    _job_queue().cleanup()
+    _cleanup_old_journals()
+    return _render_main(raw="", result=None, mode=rate_limit.DEFAULT_PROFILE, accumulate=False)
 
 
 @APP.post("/open-folder")
@@ -230,12 +444,17 @@ def extract():
     
     Recibe:
     - POST form field "raw": texto con constancias (una por linea o tabla)
+    - POST form field "formats" (repetible): csv, parquet, arrow ademas del Excel
     
     Retorna:
-    - HTML con resultados o lista de errores
+    - Redireccion a la vista del trabajo en segundo plano (/jobs/<id>/view)
+    - JSON {job_id, status_url, view_url, events_url} si se pide con Accept: application/json
+    - HTML con aviso si no hay constancias validas
     """
     raw = request.form.get("raw", "").strip()
-    mode = request.form.get("mode", "normal").strip().lower()
+    mode = rate_limit.get_profile(request.form.get("mode")).name
+    available = columnar_export.available_formats()
+    formats = columnar_export.parse_formats([f for f in request.form.getlist("formats") if f in available])
     accumulate = False
     cleanup_old_workspaces()
     
@@ -253,7 +472,7 @@ def extract():
             "total_errors": 0,
         }
         logger.warning("POST /extract con entrada vacia")
-        return _render_main(raw=raw, result=result, mode=mode, accumulate=accumulate)
+        return _render_main(raw=raw, result=result, mode=mode, accumulate=accumulate, selected_formats=formats)
     
     # Extraccion de constancias
     constancias = constancia_config.extract_constancias(raw)
@@ -272,54 +491,133 @@ def extract():
             "total_errors": 0,
         }
         logger.warning(f"No se detectaron constancias validas en entrada: {raw[:100]}")
-        return _render_main(raw=raw, result=result, mode=mode, accumulate=accumulate)
+        return _render_main(raw=raw, result=result, mode=mode, accumulate=accumulate, selected_formats=formats)
     
-    logger.info(f"Iniciando extraccion de {detected_count} constancia(s)")
-
-    # Proceso secuencial (permite interaccion manual con reCAPTCHA)
-    if mode == "seguro":
-        delay_seconds = 30.0
-        backoff_max_seconds = 600.0
-    else:
-        delay_seconds = 10.0
-        backoff_max_seconds = 120.0
-
-    final_path, errors = secop_extract.extract_batch_to_excel(
-        constancias,
-        OUTPUT_DIR,
-        headless=False,
-        delay_seconds=delay_seconds,
-        backoff_max_seconds=backoff_max_seconds,
+    job_id = _job_queue().submit({"constancias": constancias, "mode": mode, "formats": formats}, total=detected_count)
+    logger.info(f"Lote de {detected_count} constancia(s) encolado como trabajo {job_id}")
+
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({
+            "job_id": job_id,
+            "status_url": url_for("job_status", job_id=job_id),
+            "view_url": url_for("job_view", job_id=job_id),
+            "events_url": url_for("job_events", job_id=job_id),
+        }), 202
+    return redirect(url_for("job_view", job_id=job_id))
+
+
+@APP.get("/jobs/<job_id>")
+def job_status(job_id: str):
+    """Estado del trabajo en JSON (lo consulta la UI mientras el lote corre)."""
+    job = _job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado."}), 404
+    return jsonify(_job_summary(job))
+
+
+@APP.get("/jobs/<job_id>/events")
+def job_events(job_id: str):
+    """
+    Flujo SSE del trabajo: started, backoff, fetched, parsed, written, error, blocked,
+    resumed por constancia y "job" en cada cambio de estado. Se cierra cuando el trabajo termina.
+    """
+    queue = _job_queue()
+    if queue.get(job_id) is None:
+        return jsonify({"error": "Trabajo no encontrado."}), 404
+    try:
+        last_seq = int(request.headers.get("Last-Event-ID") or request.args.get("after") or 0)
+    except ValueError:
+        last_seq = 0
+
+    def stream():
+        seq = last_seq
+        yield "retry: 3000\n\n"
+        while True:
+            events = queue.wait_events(job_id, seq, timeout=SSE_KEEPALIVE_SECONDS)
+            for event in events:
+                seq = event["seq"]
+                yield _sse_message(event)
+            if not events:
+                job = queue.get(job_id)
+                if job is None or job["status"] in job_queue.FINISHED_STATES:
+                    return
+                yield ": keepalive\n\n"
+
+    response = Response(stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@APP.get("/metrics")
+def metrics_endpoint():
+    """Histogramas de tiempos en formato de texto de Prometheus (navegacion, parseo, campos, Excel)."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@APP.get("/jobs/<job_id>/view")
+def job_view(job_id: str):
+    """Pagina principal siguiendo un trabajo: progreso mientras corre, resultados al terminar."""
+    cleanup_old_downloads()
+    job = _job_queue().get(job_id)
+    if job is None:
+        return redirect(url_for("index"))
+    params = job["params"]
+    raw = "\n".join(params.get("constancias", []))
+    mode = params.get("mode", rate_limit.DEFAULT_PROFILE)
+    formats = params.get("formats", [])
+
+    if job["status"] not in job_queue.FINISHED_STATES:
+        return _render_main(
+            raw=raw, result=None, mode=mode, accumulate=False, job=_job_summary(job), selected_formats=formats
+        )
+
+    detected_count = job.get("total", 0)
+    journal_id = params.get("journal") or job_id
+    resume_url = url_for("job_resume", job_id=job_id) if _journal_path(journal_id).exists() else None
+    if job["status"] == job_queue.FAILED:
+        errors = [("_LOTE_", job.get("error") or "El lote no pudo completarse.")]
+        result = _build_result(detected_count, None, errors, None)
+        result["ok_count"] = 0
+        result["resume_url"] = resume_url
+        return _render_main(raw=raw, result=result, mode=mode, accumulate=False, selected_formats=formats)
+
+    final_path = Path(job["result"]["output_path"])
+    errors = [(c, e) for c, e in job["result"].get("errors", [])]
+    result = _build_result(detected_count, final_path, errors, _job_download_url(job_id, final_path))
+    result["exports"] = _job_exports(job_id, job["result"].get("exports") or {})
+    if errors:
+        result["resume_url"] = resume_url
+    return _render_main(
+        raw=raw, result=result, mode=mode, accumulate=False, auto_download=False, selected_formats=formats
     )
-    download_url = None
 
-    ok_count = detected_count - len(errors)
-    fail_count = len(errors)
 
-    output_name = final_path.name
-    output_path = str(final_path)
-    token = secrets.token_urlsafe(16)
-    _DOWNLOADS[token] = (final_path, time.time())
-    download_url = url_for("download", token=token)
-    
-    # Limitar errores mostrados en UI
-    errors_safe = [(c, escape(str(e))) for c, e in errors]
-    errors_ui = errors_safe[:MAX_ERRORS_DISPLAY]
-    has_more_errors = len(errors) > MAX_ERRORS_DISPLAY
-    
-    result = {
-        "detected_count": detected_count,
-        "ok_count": ok_count,
-        "fail_count": fail_count,
-        "output_name": output_name,
-        "output_path": output_path,
-        "download_url": download_url,
-        "errors": errors_ui,
-        "has_more_errors": has_more_errors,
-        "total_errors": len(errors),
-    }
-    
-    return _render_main(raw=raw, result=result, mode=mode, accumulate=accumulate, auto_download=False)
+@APP.post("/jobs/<job_id>/resume")
+def job_resume(job_id: str):
+    """
+    Reanuda un lote terminado con errores o interrumpido: encola un trabajo nuevo sobre
+    la misma bitacora, que salta las constancias ya extraidas y reintenta el resto.
+    """
+    job = _job_queue().get(job_id)
+    if job is None or job["status"] not in job_queue.FINISHED_STATES:
+        return redirect(url_for("index"))
+    params = job["params"]
+    journal_id = params.get("journal") or job_id
+    if not _journal_path(journal_id).exists():
+        return redirect(url_for("job_view", job_id=job_id))
+    constancias = params.get("constancias", [])
+    new_id = _job_queue().submit(
+        {
+            "constancias": constancias,
+            "mode": params.get("mode", rate_limit.DEFAULT_PROFILE),
+            "formats": params.get("formats", []),
+            "journal": journal_id,
+        },
+        total=len(constancias),
+    )
+    logger.info(f"Trabajo {job_id} reanudado como {new_id}")
+    return redirect(url_for("job_view", job_id=new_id))
 
 
 @APP.post("/finalize")
@@ -351,7 +649,7 @@ def finalize():
         "total_errors": 0,
     }
 
-    return _render_main(raw="", result=result, mode="normal", accumulate=False)
+    return _render_main(raw="", result=result, mode=rate_limit.DEFAULT_PROFILE, accumulate=False)
 
 
 @APP.post("/reset_batch")
@@ -431,4 +729,5 @@ def download(token: str):
 
 if __name__ == "__main__":
     logger.info("Iniciando SECOP UI en http://127.0.0.1:5000")
+    start_browser_pool()
     APP.run(host="127.0.0.1", port=5000, debug=False)
@@ -283,7 +283,160 @@
       raw.focus();
     });
 
-    document.getElementById("form").addEventListener("submit", (e) => {
+    const progressContainer = document.getElementById("progressContainer");
+    const JOB_POLL_MS = 2000;
+
+    function showProcessing() {
+      document.getElementById("btnExtract").disabled = true;
+      document.getElementById("btnIcon").innerHTML = "<span class=\"spinner\"></span>";
+      document.getElementById("btnText").textContent = "Procesando...";
+      document.getElementById("runtime").style.display = "block";
+      progressContainer.style.display = "block";
+      setStage(2);
+    }
+
+    function renderJobProgress(job) {
+      const pct = job.total > 0 ? (100 * job.processed) / job.total : 0;
+      document.getElementById("progressFill").style.width = pct + "%";
+      let text = `Procesadas ${job.processed} de ${job.total}`;
+      if (job.failed > 0) text += ` (${job.failed} con error)`;
+      if (job.status === "queued") text += " (en cola)";
+      document.getElementById("progressText").textContent = text;
+    }
+
+    function formatDuration(seconds) {
+      seconds = Math.max(0, Math.round(seconds));
+      if (seconds < 60) return `${seconds}s`;
+      const minutes = Math.floor(seconds / 60);
+      if (minutes < 60) return `${minutes} min ${seconds % 60}s`;
+      return `${Math.floor(minutes / 60)} h ${minutes % 60} min`;
+    }
+
+    // Estado del lote armado con los eventos SSE (/jobs/<id>/events)
+    function createEventProgress() {
+      const state = {
+        total: 0,
+        completed: 0,
+        failed: 0,
+        skipped: 0,
+        current: "",
+        step: "",
+        startTs: null,
+        lastTs: null,
+        pauseUntil: 0,
+        blocked: "",
+      };
+      const STEPS = {
+        started: "consultando",
+        fetched: "analizando",
+        parsed: "guardando",
+      };
+
+      function render() {
+        const pct = state.total > 0 ? (100 * state.completed) / state.total : 0;
+        document.getElementById("progressFill").style.width = pct + "%";
+        let text = `Procesadas ${state.completed} de ${state.total}`;
+        if (state.failed > 0) text += ` (${state.failed} con error)`;
+        const remaining = state.total - state.completed;
+        const measured = state.completed - state.skipped;
+        if (measured > 0 && remaining > 0 && state.lastTs > state.startTs) {
+          const perItem = (state.lastTs - state.startTs) / measured;
+          text += ` - faltan ~${formatDuration(perItem * remaining)}`;
+        }
+        const pause = (state.pauseUntil - Date.now()) / 1000;
+        if (state.blocked) {
+          text += ` - SECOP bloqueo la consulta (${state.current})`;
+          if (pause > 0) text += `; nuevo intento en ${formatDuration(pause)}`;
+        } else if (pause > 0) {
+          text += ` - Pausa anti-bloqueo: ${formatDuration(pause)}`;
+        } else if (state.current && state.step) {
+          text += ` - ${state.current}: ${state.step}`;
+        }
+        document.getElementById("progressText").textContent = text;
+      }
+
+      function apply(event) {
+        state.total = event.total || state.total;
+        if (typeof event.completed === "number") state.completed = event.completed;
+        if (event.constancia) state.current = event.constancia;
+        if (event.event === "started" && state.startTs === null) state.startTs = event.ts;
+        if (STEPS[event.event]) state.step = STEPS[event.event];
+        if (event.event === "backoff") state.pauseUntil = (event.ts + event.seconds) * 1000;
+        if (event.event === "skipped") {
+          state.skipped += 1;
+        } else if (event.status) {
+          state.lastTs = event.ts;
+          state.step = "";
+          state.pauseUntil = 0;
+          if (event.status === "error") state.failed += 1;
+        }
+        if (event.event === "blocked") state.blocked = event.message || "bloqueado";
+        if (event.event === "resumed") state.blocked = "";
+        render();
+      }
+
+      return { apply, render };
+    }
+
+    function followJob(statusUrl, viewUrl, eventsUrl) {
+      showProcessing();
+      const poll = async () => {
+        try {
+          const response = await fetch(statusUrl, { headers: { Accept: "application/json" } });
+          if (response.status === 404) {
+            window.location.href = "/";
+            return;
+          }
+          const job = await response.json();
+          renderJobProgress(job);
+          if (job.status === "done" || job.status === "failed") {
+            window.location.href = viewUrl;
+            return;
+          }
+        } catch (e) {
+          // Servidor ocupado o reiniciando: reintentar
+        }
+        window.setTimeout(poll, JOB_POLL_MS);
+      };
+
+      if (!eventsUrl || !window.EventSource) {
+        poll();
+        return;
+      }
+
+      const progress = createEventProgress();
+      const ticker = window.setInterval(progress.render, 1000);
+      const source = new EventSource(eventsUrl);
+      const onEvent = (e) => progress.apply(JSON.parse(e.data));
+      ["started", "backoff", "fetched", "parsed", "written", "skipped", "error", "blocked", "resumed"].forEach((name) => {
+        source.addEventListener(name, onEvent);
+      });
+      source.addEventListener("job", (e) => {
+        const job = JSON.parse(e.data);
+        if (job.status === "done" || job.status === "failed") {
+          source.close();
+          window.clearInterval(ticker);
+          window.location.href = viewUrl;
+        }
+      });
+      source.onerror = () => {
+        // Flujo cerrado o no disponible: seguir con consultas periodicas
+        source.close();
+        window.clearInterval(ticker);
+        poll();
+      };
+    }
+
+    // Vista de un trabajo en curso (p. ej. tras recargar la pagina)
+    if (progressContainer && progressContainer.getAttribute("data-job-status")) {
+      followJob(
+        progressContainer.getAttribute("data-job-status"),
+        progressContainer.getAttribute("data-job-view"),
+        progressContainer.getAttribute("data-job-events")
+      );
+    }
+
+    document.getElementById("form").addEventListener("submit", async (e) => {
       const raw_val = raw.value.trim();
       const constancias = detectConstancias();
       
@@ -294,21 +447,25 @@
         return false;
       }
       
-      document.getElementById("btnExtract").disabled = true;
-      document.getElementById("btnIcon").innerHTML = "<span class=\"spinner\"></span>";
-      document.getElementById("btnText").textContent = "Procesando...";
-      document.getElementById("runtime").style.display = "block";
-      document.getElementById("progressContainer").style.display = "block";
-      setStage(2);
-      
-      let progress = 0;
-      const interval = setInterval(() => {
-        progress += Math.random() * 30;
-        if (progress > 90) progress = 90;
-        document.getElementById("progressFill").style.width = progress + "%";
-      }, 500);
-      
-      window.addEventListener("beforeunload", () => clearInterval(interval));
+      e.preventDefault();
+      const form = e.target;
+      showProcessing();
+      try {
+        const response = await fetch(form.action, {
+          method: "POST",
+          headers: { Accept: "application/json" },
+          body: new FormData(form),
+        });
+        if (response.status !== 202) {
+          throw new Error("respuesta inesperada");
+        }
+        const data = await response.json();
+        window.history.replaceState(null, "", data.view_url);
+        followJob(data.status_url, data.view_url, data.events_url);
+      } catch (err) {
+        // Sin API de trabajos: envio normal del formulario
+        form.submit();
+      }
     });
 
   
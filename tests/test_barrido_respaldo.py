@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+test_barrido_respaldo.py
+
+Valida el barrido unico de fallbacks sobre el texto completo (secop_extract._fallback_candidates):
+1. Los textos de la pagina salen de un solo recorrido y equivalen a get_text con cada backend
+2. El barrido da lo mismo que las busquedas separadas originales (incluso con patrones
+   solapados, CRP vs RP, respaldo presupuestal y lineas sin ':')
+3. El texto se barre una sola vez por pagina aunque se pidan varios campos
+"""
+
+import importlib.util
+import random
+import re
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import page_index
+import secop_extract
+
+FIXTURES = [
+    ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html",
+    ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ CMA 008-25.html",
+]
+
+
+def _backends():
+    modules = {"html.parser": None, "lxml": "lxml", "selectolax": "selectolax"}
+    return [b for b, m in modules.items() if m is None or importlib.util.find_spec(m) is not None]
+
+
+def _separate_searches(text_space, text_lines):
+    """Busquedas originales: un re.search por patron y un recorrido de lineas."""
+    out = {}
+    for name, pat in (
+        ("rp", r"\bRP\b\s*(?:No\.|Nro\.|#|:)?\s*(\d{6,})"),
+        ("crp", r"\bCRP\b\s*(?:No\.|Nro\.|#|:)?\s*(\d{6,})"),
+        ("cdp", r"\bCDP\b\s*(?:No\.|Nro\.|#|:)?\s*([A-Za-z0-9\-/]+)"),
+        ("respaldo", r"respaldo presupuestal\s*(?:No\.|Nro\.|#|:)?\s*([A-Za-z0-9\-/]+)"),
+    ):
+        m = re.search(pat, text_space, flags=re.IGNORECASE)
+        if m:
+            out[name] = m.group(1)
+    for line in text_lines:
+        if "detalle del proceso numero" in secop_extract._norm_text(line):
+            parts = line.split(":", 1)
+            if len(parts) == 2:
+                out["numero_proceso"] = parts[1].strip()
+                break
+    return out
+
+
+def _page(*texts):
+    return "<html><body><table>" + "".join(f"<tr><td>{t}</td></tr>" for t in texts) + "</table></body></html>"
+
+
+def test_textos_de_un_recorrido():
+    for path in FIXTURES:
+        html = path.read_text(encoding="utf-8")
+        for backend in _backends():
+            idx = page_index.parse_html(html, backend)
+            assert idx.text_space == idx._node_text(idx.soup, " "), backend
+            assert idx.text_newline == idx._node_text(idx.soup, "\n"), backend
+            assert idx.text_lines == idx.text_newline.splitlines()
+            assert idx.page_strings is idx.page_strings  # cacheado
+        soup = page_index.parse_html(html, "html.parser").soup
+        assert page_index.parse_html(html, "html.parser").text_space == soup.get_text(" ", strip=True)
+
+
+def test_equivale_a_busquedas_separadas():
+    pages = [path.read_text(encoding="utf-8") for path in FIXTURES]
+    pages += [
+        _page("CDP No. RP 2503100004", "CRP 2601130001"),
+        _page("CRP: 2601130001", "RP 123"),
+        _page("Certificado CDP: N/A", "Respaldo Presupuestal Nro. 2502060001"),
+        _page("cdp#ABC-12/3", "xRP 999999", "RP:", "1234567"),
+        _page("Detalle del Proceso Numero LIC 001", "DETALLE DEL PROCESO NÚMERO: CMA 008-25"),
+        _page("Detalle - del  proceso número : SA-MC 3", "Detalle del Proceso Número: otro"),
+        _page("Detalle del proceso", "número: 5", "sin fallbacks"),
+    ]
+    words = ["RP", "CRP", "CDP", "No.", "Nro.", "#", ":", "2503100004", "12345", "A-1/2", "respaldo presupuestal",
+             "Detalle del Proceso Número:", "LIC 002-25", "texto", "Detalle"]
+    rnd = random.Random(11)
+    for _ in range(200):
+        pages.append(_page(*(" ".join(rnd.choices(words, k=rnd.randint(1, 6))) for _ in range(rnd.randint(1, 5)))))
+    for html in pages:
+        for backend in _backends():
+            idx = page_index.parse_html(html, backend)
+            expected = _separate_searches(idx.text_space, idx.text_lines)
+            assert secop_extract._fallback_candidates(idx) == expected, (backend, html[:200])
+
+
+def test_un_barrido_por_pagina():
+    calls = []
+    original = secop_extract._FALLBACK_TRIGGER_RE
+
+    class Counted:
+        def finditer(self, text):
+            calls.append(len(text))
+            return original.finditer(text)
+
+    secop_extract._FALLBACK_TRIGGER_RE = Counted()
+    try:
+        html = _page("Detalle del Proceso Número: LIC 9", "CRP 2601130001", "CDP 2502060001")
+        idx = secop_extract.parse_detail_html(html)
+        assert secop_extract._parse_numero_proceso_informativo(idx) == "LIC 9"
+        assert secop_extract._find_rp_code(idx) == "2601130001"
+        assert secop_extract._extract_cdp(idx) == "2502060001"
+        assert calls == [len(idx.text_newline)]
+    finally:
+        secop_extract._FALLBACK_TRIGGER_RE = original
+
+
+def main():
+    tests = [
+        test_textos_de_un_recorrido,
+        test_equivale_a_busquedas_separadas,
+        test_un_barrido_por_pagina,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
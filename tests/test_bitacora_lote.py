@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+test_bitacora_lote.py
+
+Valida la bitacora JSONL de los lotes (scripts/batch_journal.py) y la reanudacion:
+1. Cada resultado queda en disco; una ultima linea truncada no rompe la lectura
+2. Un error reintentado con exito deja de contar como error
+3. Un lote cortado a mitad se reanuda sin volver a pedir lo ya extraido y el Excel
+   final incluye las filas de ambos intentos
+"""
+
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import openpyxl
+
+import batch_journal
+import secop_extract
+
+FIXTURES = {
+    "25-1-240855": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html",
+    "25-1-241304": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ CMA 008-25.html",
+}
+
+
+class _Corte(BaseException):
+    """Simula un corte del proceso (no lo atrapa el manejo de errores del lote)."""
+
+
+def test_bitacora_tolera_linea_truncada():
+    work = Path(tempfile.mkdtemp(prefix="secop_journal_"))
+    try:
+        path = work / "lote.jsonl"
+        journal = batch_journal.BatchJournal(path)
+        journal.append_record("25-1-1", {"Numero de constancia": "25-1-1"})
+        journal.append_error("25-1-2", "Constancia no encontrada")
+        with path.open("a", encoding="utf-8") as f:
+            f.write('{"constancia": "25-1-3", "status": "o')
+        again = batch_journal.BatchJournal(path)
+        assert again.completed() == {"25-1-1"}
+        assert again.errors() == [("25-1-2", "Constancia no encontrada")]
+        # Lo que se agregue despues del corte queda en su propia linea
+        again.append_record("25-1-2", {"Numero de constancia": "25-1-2"})
+        final = batch_journal.BatchJournal(path)
+        assert [c for c, _ in final.records()] == ["25-1-1", "25-1-2"]
+        assert final.errors() == []
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def test_lote_reanudado_no_repite_constancias():
+    fetched = []
+    state = {"cortar_en": "25-1-241304"}
+
+    @contextmanager
+    def fake_session(headless=False, pool=None, http_fast_path=True):
+        def fetch(c):
+            if c == state["cortar_en"]:
+                raise _Corte()
+            fetched.append(c)
+            return FIXTURES[c].read_text(encoding="utf-8")
+
+        yield fetch
+
+    original_session = secop_extract._open_detail_session
+    secop_extract._open_detail_session = fake_session
+    out_dir = Path(tempfile.mkdtemp(prefix="secop_out_"))
+    journal_path = out_dir / "lote.jsonl"
+    try:
+        constancias = list(FIXTURES)
+        try:
+            secop_extract.extract_batch_to_excel(constancias, out_dir, delay_seconds=0, journal_path=journal_path)
+            raise AssertionError("se esperaba el corte")
+        except _Corte:
+            pass
+        assert batch_journal.BatchJournal(journal_path).completed() == {"25-1-240855"}
+
+        # Sin resume la bitacora existente no se mezcla con un lote nuevo
+        try:
+            secop_extract.extract_batch_to_excel(constancias, out_dir, delay_seconds=0, journal_path=journal_path)
+            raise AssertionError("se esperaba SecopExtractionError")
+        except secop_extract.SecopExtractionError:
+            pass
+
+        state["cortar_en"] = None
+        events = []
+        out_path, errors = secop_extract.extract_batch_to_excel(
+            constancias, out_dir, delay_seconds=0, journal_path=journal_path, resume=True, progress=events.append
+        )
+        assert not errors
+        assert fetched == ["25-1-240855", "25-1-241304"]
+        assert [e["event"] for e in events if e.get("status")] == ["skipped", "written"]
+
+        ws = openpyxl.load_workbook(out_path)["Resultados_Extraccion"]
+        headers = [secop_extract._norm_key(str(c.value or "")) for c in ws[1]]
+        col = headers.index(secop_extract._norm_key("Numero de constancia")) + 1
+        written = [ws.cell(row=r, column=col).value for r in range(2, ws.max_row + 1)]
+        assert [v for v in written if v] == constancias
+        # La bitacora indicada por el llamador se conserva
+        assert journal_path.exists()
+    finally:
+        secop_extract._open_detail_session = original_session
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def main():
+    tests = [
+        test_bitacora_tolera_linea_truncada,
+        test_lote_reanudado_no_repite_constancias,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
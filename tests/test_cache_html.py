@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+test_cache_html.py
+
+Valida la cache de HTML de detalle (scripts/html_cache.py) y su uso en los lotes:
+1. put/get conserva el HTML; el mismo contenido se guarda una sola vez (sha256)
+2. Las entradas vencen por TTL y se desalojan las mas antiguas al superar el tamano
+3. El TTL de cada entrada depende del estado del proceso (FreshnessPolicy)
+4. Re-ejecutar un lote con todo en cache no abre el navegador ni hace pausas
+5. El indice es un diario de solo-agregar compartido: varias instancias sobre la misma
+   carpeta no pierden entradas, se compacta y un index.json anterior se importa
+"""
+
+import shutil
+import sys
+import gzip
+import hashlib
+import json
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import html_cache
+import secop_extract
+
+FIXTURES = {
+    "25-1-240855": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html",
+    "25-1-241304": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ CMA 008-25.html",
+}
+
+
+@contextmanager
+def _tmp_cache(**kwargs):
+    root = Path(tempfile.mkdtemp(prefix="secop_cache_"))
+    try:
+        yield html_cache.HtmlCache(root, **kwargs)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_put_get_y_contenido_compartido():
+    html = FIXTURES["25-1-240855"].read_text(encoding="utf-8")
+    with _tmp_cache() as cache:
+        assert cache.get("25-1-240855") is None
+        a = cache.put("25-1-240855", html)
+        b = cache.put("25-1-999999", html)
+        assert a["sha256"] == b["sha256"]
+        assert cache.get("25-1-240855") == html
+        assert len(list((cache.root / "objects").glob("*/*.html.gz"))) == 1
+        # Un indice nuevo sobre la misma carpeta ve las entradas
+        again = html_cache.HtmlCache(cache.root)
+        assert again.get("25-1-999999") == html
+        assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_ttl_y_desalojo_por_tamano():
+    with _tmp_cache(ttl_seconds=60) as cache:
+        cache.put("25-1-1000", "<html>viejo</html>", fetched_at=time.time() - 30)
+        assert cache.get("25-1-1000") == "<html>viejo</html>"
+        cache.ttl_seconds = 10
+        assert cache.get("25-1-1000") is None
+        assert cache.evict() == 1
+        assert not list((cache.root / "objects").glob("*/*.html.gz"))
+
+    with _tmp_cache(ttl_seconds=0) as cache:
+        now = time.time()
+        for i, c in enumerate(FIXTURES):
+            cache.put(c, FIXTURES[c].read_text(encoding="utf-8"), fetched_at=now - 100 + i)
+        size = sum(e["size"] for e in cache._load_index().values())
+        cache.max_bytes = size - 1
+        cache.put("25-1-2000", "<html>nuevo</html>", fetched_at=now)
+        # Sale la entrada mas antigua; la nueva queda
+        assert not cache.contains("25-1-240855")
+        assert cache.contains("25-1-2000")
+
+
+def test_ttl_segun_estado_del_proceso():
+    policy = html_cache.FreshnessPolicy(terminal_ttl=1000, settled_ttl=100, active_ttl=10)
+    assert policy.ttl_for({"Estado del proceso": "Liquidado"}) == 1000
+    assert policy.ttl_for({"Estado del proceso": "Terminado Anormalmente después de Convocado"}) == 1000
+    assert policy.ttl_for({"Estado del proceso": "Celebrado", "Registro Presupuestal (RP)": "2601130001"}) == 100
+    assert policy.ttl_for({"Estado del proceso": "Celebrado", "Registro Presupuestal (RP)": ""}) == 10
+    assert policy.ttl_for({"Estado del proceso": "Convocado"}) == 10
+    assert policy.ttl_for({"Estado del proceso": ""}) is None
+
+    with _tmp_cache(ttl_seconds=60, freshness=policy) as cache:
+        old = time.time() - 500
+        cache.put("25-1-1", "<html>1</html>", fetched_at=old, record={"Estado del proceso": "Liquidado"})
+        cache.put("25-1-2", "<html>2</html>", fetched_at=old, record={"Estado del proceso": "Convocado"})
+        # Sin estado se aplica el TTL general (60 s)
+        cache.put("25-1-3", "<html>3</html>", fetched_at=time.time() - 30, record={})
+        assert cache.get("25-1-1") == "<html>1</html>"
+        assert cache.get("25-1-2") is None
+        assert cache.get("25-1-3") == "<html>3</html>"
+        assert cache.entry("25-1-1")["estado"] == "Liquidado"
+
+
+def test_lote_reutiliza_cache_sin_navegador():
+    opened = []
+    sleeps = []
+
+    @contextmanager
+    def fake_session(headless=False, pool=None, http_fast_path=True):
+        opened.append(True)
+        yield lambda c: FIXTURES[c].read_text(encoding="utf-8")
+
+    original_session, original_sleep = secop_extract._open_detail_session, secop_extract.time.sleep
+    secop_extract._open_detail_session = fake_session
+    secop_extract.time.sleep = lambda s: sleeps.append(s)
+    out_dir = Path(tempfile.mkdtemp(prefix="secop_out_"))
+    try:
+        with _tmp_cache() as cache:
+            constancias = list(FIXTURES) * 2
+            _, errors = secop_extract.extract_batch_to_excel(constancias, out_dir, cache=cache)
+            assert not errors and len(opened) == 1
+            # Dentro del mismo lote la repeticion ya sale de cache
+            assert cache.stats["hits"] == 2
+            opened.clear()
+            sleeps.clear()
+            events = []
+            _, errors = secop_extract.extract_batch_to_excel(constancias, out_dir, cache=cache, progress=events.append)
+            assert not errors
+            assert opened == [] and sleeps == []
+            # Eventos por constancia: started -> fetched -> parsed -> written
+            first = constancias[0]
+            assert [e["event"] for e in events if e["constancia"] == first][:4] == ["started", "fetched", "parsed", "written"]
+            assert all(e["source"] == "cache" for e in events if e["event"] in ("fetched", "written"))
+            assert [e["completed"] for e in events if e["event"] == "written"] == [1, 2, 3, 4]
+    finally:
+        secop_extract._open_detail_session = original_session
+        secop_extract.time.sleep = original_sleep
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def test_indice_diario_compartido():
+    with _tmp_cache(ttl_seconds=0) as cache:
+        journal = cache.root / html_cache.INDEX_NAME
+        cache.put("25-1-1", "<html>1</html>")
+        before = journal.read_bytes()
+        cache.put("25-1-2", "<html>2</html>")
+        after = journal.read_bytes()
+        assert after.startswith(before) and after.count(b"\n") == 2  # se agrega, no se reescribe
+        assert not (cache.root / html_cache.LEGACY_INDEX_NAME).exists()
+
+        # Otra instancia (o proceso) sobre la misma carpeta: nadie pisa las entradas del otro
+        other = html_cache.HtmlCache(cache.root, ttl_seconds=0)
+        other.put("25-1-3", "<html>3</html>")
+        cache.put("25-1-4", "<html>4</html>")
+        other.invalidate("25-1-1")
+        assert cache.get("25-1-3") == "<html>3</html>" and cache.get("25-1-1") is None
+        assert other.get("25-1-4") == "<html>4</html>"
+
+        def writer(instance, prefix):
+            for i in range(25):
+                instance.put(f"25-{prefix}-{i}", f"<html>{prefix}-{i}</html>")
+
+        threads = [threading.Thread(target=writer, args=(inst, p)) for inst, p in ((cache, 7), (other, 8))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        fresh = html_cache.HtmlCache(cache.root, ttl_seconds=0)
+        assert len(fresh.archived()) == 3 + 50
+        assert all(fresh.get(f"25-{p}-{i}") == f"<html>{p}-{i}</html>" for p in (7, 8) for i in range(25))
+
+    original = html_cache.COMPACT_MIN_LINES
+    html_cache.COMPACT_MIN_LINES = 10
+    try:
+        with _tmp_cache(ttl_seconds=0) as cache:
+            reader = html_cache.HtmlCache(cache.root, ttl_seconds=0)
+            for i in range(12):
+                cache.put("25-1-5", f"<html>v{i}</html>")
+                assert reader.get("25-1-5") == f"<html>v{i}</html>"
+            lines = (cache.root / html_cache.INDEX_NAME).read_bytes().count(b"\n")
+            assert lines < 10  # compactado
+            # Las versiones reemplazadas no dejan objetos huerfanos
+            assert len(list((cache.root / "objects").glob("*/*.html.gz"))) == 1
+    finally:
+        html_cache.COMPACT_MIN_LINES = original
+
+
+def test_importa_indice_anterior():
+    with _tmp_cache(ttl_seconds=0) as cache:
+        html = "<html>anterior</html>"
+        sha = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        path = cache.root / "objects" / sha[:2] / f"{sha}.html.gz"
+        path.parent.mkdir(parents=True)
+        with gzip.open(path, "wb") as f:
+            f.write(html.encode("utf-8"))
+        legacy = cache.root / html_cache.LEGACY_INDEX_NAME
+        entry = {"sha256": sha, "fetched_at": time.time(), "size": path.stat().st_size}
+        legacy.write_text(json.dumps({"25-1-9": entry}), encoding="utf-8")
+        assert html_cache.is_cache_dir(cache.root)
+        assert cache.get("25-1-9") == html
+        assert (cache.root / html_cache.INDEX_NAME).exists() and not legacy.exists()
+        assert html_cache.HtmlCache(cache.root).get("25-1-9") == html
+
+
+def main():
+    tests = [
+        test_put_get_y_contenido_compartido,
+        test_ttl_y_desalojo_por_tamano,
+        test_ttl_segun_estado_del_proceso,
+        test_lote_reutiliza_cache_sin_navegador,
+        test_indice_diario_compartido,
+        test_importa_indice_anterior,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+test_circuit_breaker.py
+
+Valida el circuit breaker ante bloqueos (scripts/circuit_breaker.py):
+1. Esperas de sondeo exponenciales, acotadas, y fin al superar la espera maxima
+2. En el lote un bloqueo estaciona el resto, sondea la constancia bloqueada y al
+   responder sigue con todo; el incidente (Incident ID, sondeos, duracion) queda
+   registrado en el JSONL
+3. Si el bloqueo no cede, el lote se detiene como antes
+4. Tras recuperarse el ritmo vuelve al inicial del perfil, no al minimo
+"""
+
+import copy
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import circuit_breaker
+import rate_limit
+import secop_extract
+
+FIXTURE = ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html"
+BLOCK_PAGE = "<html><body><h1>Access blocked</h1><p>Your Incident ID is: 12345</p></body></html>"
+CONSTANCIAS = ["25-1-1001", "25-1-1002", "25-1-1003"]
+
+
+def test_esperas_de_sondeo():
+    clock = [0.0]
+    breaker = circuit_breaker.CircuitBreaker(10, 35, 90, clock=lambda: clock[0])
+    assert breaker.next_probe_delay() is None
+    breaker.trip("25-1-1001", "bloqueado", BLOCK_PAGE, parked=3)
+    assert breaker.is_open and breaker.incident["incident_id"] == "12345"
+    delays = []
+    while (delay := breaker.next_probe_delay()) is not None:
+        delays.append(delay)
+        clock[0] += delay
+        breaker.probe_failed("bloqueado")
+    assert delays == [10, 20, 35]
+    assert breaker.give_up() == 65 and not breaker.is_open
+
+
+def _run_batch(blocks, breaker):
+    calls = []
+
+    @contextmanager
+    def fake_session(headless=False, pool=None, http_fast_path=True):
+        def fetch(c):
+            calls.append(c)
+            if c == "25-1-1002" and blocks[0] > 0:
+                blocks[0] -= 1
+                raise secop_extract.SecopBlockedError("Acceso bloqueado por el sitio", BLOCK_PAGE)
+            return FIXTURE.read_text(encoding="utf-8")
+
+        yield fetch
+
+    original = secop_extract._open_detail_session
+    secop_extract._open_detail_session = fake_session
+    rate_limit.reset_limiters()
+    out_dir = Path(tempfile.mkdtemp(prefix="secop_breaker_"))
+    events = []
+    try:
+        _, errors = secop_extract.extract_batch_to_excel(
+            CONSTANCIAS,
+            out_dir,
+            rate_profile=rate_limit.RateProfile.from_delay(0, 0),
+            progress=events.append,
+            breaker=breaker,
+        )
+    finally:
+        secop_extract._open_detail_session = original
+        rate_limit.reset_limiters()
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return calls, errors, events
+
+
+def test_lote_espera_y_reanuda():
+    work = Path(tempfile.mkdtemp(prefix="secop_breaker_"))
+    try:
+        log_path = work / "incidents.jsonl"
+        breaker = circuit_breaker.CircuitBreaker(0.01, 0.02, 60, log_path=log_path)
+        calls, errors, events = _run_batch([3], breaker)
+        assert errors == []
+        assert calls == ["25-1-1001"] + ["25-1-1002"] * 4 + ["25-1-1003"]
+        written = [e["constancia"] for e in events if e["event"] == "written"]
+        assert written == CONSTANCIAS
+        opened = next(e for e in events if e["event"] == "blocked")
+        assert "status" not in opened and opened["parked"] == 2 and opened["incident_id"] == "12345"
+        assert [e["reason"] for e in events if e["event"] == "backoff"] == ["probe"] * 3
+        resumed = [e for e in events if e["event"] == "resumed"]
+        assert len(resumed) == 1 and resumed[0]["probes"] == 3
+
+        incidents = circuit_breaker.read_incidents(log_path)
+        assert len(incidents) == 1
+        incident = incidents[0]
+        assert incident["outcome"] == "recovered" and incident["incident_id"] == "12345"
+        assert incident["constancia"] == "25-1-1002" and incident["probes"] == 3
+        assert incident["duration_seconds"] is not None
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def test_lote_se_detiene_si_no_cede():
+    work = Path(tempfile.mkdtemp(prefix="secop_breaker_"))
+    try:
+        log_path = work / "incidents.jsonl"
+        breaker = circuit_breaker.CircuitBreaker(0.01, 0.01, 0.025, log_path=log_path)
+        calls, errors, events = _run_batch([100], breaker)
+        assert [c for c, _ in errors] == ["25-1-1002", "_BLOQUEO_"]
+        assert "25-1-1003" not in calls
+        assert events[-1]["event"] == "blocked" and events[-1]["status"] == "error"
+        assert [i["outcome"] for i in circuit_breaker.read_incidents(log_path)] == ["gave_up"]
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def test_ritmo_tras_recuperarse():
+    for name, shared in rate_limit.PROFILES.items():
+        profile = copy.copy(shared)
+        profile.jitter = 0.0
+        clock = [0.0]
+        limiter = rate_limit.HostRateLimiter(profile, clock=lambda: clock[0])
+        assert limiter.reserve() == 0
+        limiter.on_block()
+        assert limiter.interval == profile.max_interval and limiter.cooldown_remaining() > 0
+        limiter.on_recovered()
+        assert limiter.cooldown_remaining() == 0
+        assert abs(limiter.interval - profile.initial_interval) < 1e-9, name
+        # La siguiente peticion espera un intervalo inicial (30 s en "seguro"), no max_interval
+        assert abs(limiter.reserve() - profile.initial_interval) < 1e-9, name
+
+
+def main():
+    tests = [
+        test_esperas_de_sondeo,
+        test_lote_espera_y_reanuda,
+        test_lote_se_detiene_si_no_cede,
+        test_ritmo_tras_recuperarse,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+test_cola_trabajos.py
+
+Valida la cola de trabajos en segundo plano (scripts/job_queue.py) y su uso en la UI:
+1. submit responde de inmediato; el trabajo pasa por queued/running/done y se persiste
+2. Un runner que falla deja el trabajo en failed con el mensaje
+3. Al reiniciar, un trabajo que quedo corriendo se marca como fallido
+4. /extract devuelve un id de trabajo y /jobs/<id> reporta el avance por constancia
+5. /jobs/<id>/events transmite los eventos del lote (SSE) y se reanuda con Last-Event-ID
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import job_queue
+
+
+def _wait(queue, job_id, states=job_queue.FINISHED_STATES, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in states:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"el trabajo {job_id} no llego a {states}")
+
+
+def _sse_events(body):
+    """Decodifica un cuerpo text/event-stream en la lista de datos JSON."""
+    events = []
+    for block in body.split("\n\n"):
+        for line in block.splitlines():
+            if line.startswith("data: "):
+                events.append(json.loads(line[len("data: "):]))
+    return events
+
+
+def test_ciclo_de_vida_y_persistencia():
+    jobs_dir = Path(tempfile.mkdtemp(prefix="secop_jobs_"))
+    release = threading.Event()
+
+    def runner(job, emit):
+        release.wait(5)
+        for c in job["params"]["constancias"]:
+            emit({"event": "written", "constancia": c, "status": "ok"})
+        return {"output_path": "x.xlsx"}
+
+    queue = job_queue.JobQueue(jobs_dir, runner).start()
+    try:
+        job_id = queue.submit({"constancias": ["25-1-1", "25-1-2"]}, total=2)
+        assert queue.get(job_id)["status"] in (job_queue.QUEUED, job_queue.RUNNING)
+        release.set()
+        job = _wait(queue, job_id)
+        assert job["status"] == job_queue.DONE
+        assert job["result"] == {"output_path": "x.xlsx"}
+        assert list(job["items"]) == ["25-1-1", "25-1-2"]
+        on_disk = json.loads((jobs_dir / f"{job_id}.json").read_text(encoding="utf-8"))
+        assert on_disk["status"] == job_queue.DONE and on_disk["items"]["25-1-2"]["status"] == "ok"
+    finally:
+        queue.close()
+        shutil.rmtree(jobs_dir, ignore_errors=True)
+
+
+def test_runner_fallido():
+    jobs_dir = Path(tempfile.mkdtemp(prefix="secop_jobs_"))
+
+    def runner(job, emit):
+        emit({"event": "error", "constancia": "25-1-1", "status": "error", "message": "Constancia no encontrada"})
+        raise RuntimeError("navegador no disponible")
+
+    queue = job_queue.JobQueue(jobs_dir, runner).start()
+    try:
+        job = _wait(queue, queue.submit({"constancias": ["25-1-1"]}, total=1))
+        assert job["status"] == job_queue.FAILED
+        assert "navegador no disponible" in job["error"]
+        assert job["items"]["25-1-1"]["status"] == "error"
+    finally:
+        queue.close()
+        shutil.rmtree(jobs_dir, ignore_errors=True)
+
+
+def test_reinicio_marca_interrumpidos():
+    jobs_dir = Path(tempfile.mkdtemp(prefix="secop_jobs_"))
+    try:
+        stale = {"id": "viejo", "status": job_queue.RUNNING, "created_at": time.time(), "items": {}}
+        (jobs_dir / "viejo.json").write_text(json.dumps(stale), encoding="utf-8")
+        queue = job_queue.JobQueue(jobs_dir, lambda job, emit: {}).start()
+        job = queue.get("viejo")
+        queue.close()
+        assert job["status"] == job_queue.FAILED
+        assert "interrumpido" in job["error"]
+        assert queue.get("../viejo") is None
+    finally:
+        shutil.rmtree(jobs_dir, ignore_errors=True)
+
+
+def test_endpoints_de_la_ui():
+    work_dir = Path(tempfile.mkdtemp(prefix="secop_ui_"))
+    os.environ["SECOP_OUTPUT_DIR"] = str(work_dir)
+    os.environ["SECOP_HTML_CACHE"] = "0"
+    sys.path.insert(0, str(ROOT_DIR))
+    import secop_extract
+    import secop_ui
+
+    calls = []
+
+    def fake_batch(constancias, out_dir, progress=None, **kwargs):
+        calls.append(kwargs)
+        for i, c in enumerate(constancias, start=1):
+            status = "error" if c.endswith("99999") else "ok"
+            progress({"event": "started", "constancia": c, "index": i, "total": len(constancias), "completed": i - 1})
+            progress({"event": "backoff", "constancia": c, "index": i, "total": len(constancias), "completed": i - 1, "seconds": 0.0, "reason": "delay"})
+            final = "written" if status == "ok" else "error"
+            progress({"event": final, "constancia": c, "status": status, "message": "", "index": i, "total": len(constancias), "completed": i})
+        out = Path(out_dir) / "Resultados_Extraccion_prueba.xlsx"
+        out.write_bytes(b"xlsx")
+        return out, [("25-1-99999", "Constancia no encontrada")]
+
+    original = secop_extract.extract_batch_to_excel
+    secop_extract.extract_batch_to_excel = fake_batch
+    client = secop_ui.APP.test_client()
+    try:
+        response = client.post(
+            "/extract",
+            data={"raw": "25-1-241304\n25-1-99999", "mode": "seguro"},
+            headers={"Accept": "application/json"},
+        )
+        assert response.status_code == 202
+        data = response.get_json()
+        _wait(secop_ui._job_queue(), data["job_id"])
+        status = client.get(data["status_url"]).get_json()
+        assert status["status"] == "done"
+        assert (status["total"], status["processed"], status["ok"], status["failed"]) == (2, 2, 1, 1)
+        assert calls[0]["rate_profile"].name == "seguro"
+        page = client.get(data["view_url"])
+        assert page.status_code == 200 and b"Resultados_Extraccion_prueba.xlsx" in page.data
+        # Envio sin JS: redireccion a la vista del trabajo
+        response = client.post("/extract", data={"raw": "25-1-241304"})
+        assert response.status_code == 302 and "/jobs/" in response.headers["Location"]
+        _wait(secop_ui._job_queue(), response.headers["Location"].split("/jobs/")[1].split("/")[0])
+        assert client.get("/jobs/no-existe").status_code == 404
+
+        # Flujo SSE del primer trabajo (ya terminado: se transmite completo y se cierra)
+        stream = client.get(data["events_url"])
+        assert stream.mimetype == "text/event-stream"
+        events = _sse_events(stream.get_data(as_text=True))
+        names = [e["event"] for e in events]
+        assert names[0] == "job" and names[-1] == "job", names
+        assert names.count("started") == 2 and "backoff" in names
+        assert [e["event"] for e in events if e["event"] != "job" and e.get("status")] == ["written", "error"]
+        assert events[-1]["status"] == "done"
+        seqs = [e["seq"] for e in events]
+        assert seqs == sorted(seqs)
+        # Reanudar desde un evento: solo llegan los posteriores
+        resumed = _sse_events(client.get(data["events_url"], headers={"Last-Event-ID": str(seqs[-2])}).get_data(as_text=True))
+        assert [e["seq"] for e in resumed] == seqs[-1:]
+    finally:
+        secop_extract.extract_batch_to_excel = original
+        secop_ui._job_queue().close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    tests = [
+        test_ciclo_de_vida_y_persistencia,
+        test_runner_fallido,
+        test_reinicio_marca_interrumpidos,
+        test_endpoints_de_la_ui,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
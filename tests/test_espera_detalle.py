@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+test_espera_detalle.py
+
+Valida la espera de pagina lista y su registro (secop_extract._wait_for_detail_ready,
+_load_detail_page y _record_page_timing) con una pagina falsa de Playwright:
+1. Cada resultado de la espera (ready, blocked, not_found, timeout) y la configuracion enviada
+2. Lo que ve el que llama en cada caso: HTML, bloqueo, "El proceso no existe" o HTML parcial
+3. Cada carga deja una linea JSONL en reports/readiness con sus tiempos (best-effort)
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import unicodedata
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import secop_extract
+
+FIXTURE = ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html"
+BLOCK_PAGE = "<html><body><h1>Access blocked</h1><p>Your Incident ID is: 12345</p></body></html>"
+NOT_FOUND_PAGE = "<html><body><p>El proceso no existe</p></body></html>"
+
+
+class FakeHandle:
+    def __init__(self, value):
+        self.value = value
+
+    def json_value(self):
+        return self.value
+
+
+class FakePage:
+    """Pagina con el resultado de la espera fijo (None = se agota el tiempo)."""
+
+    def __init__(self, outcome, html):
+        self.outcome = outcome
+        self.html = html
+        self.visited = []
+        self.waits = []
+
+    def goto(self, url, wait_until=None, timeout=None):
+        self.visited.append(url)
+
+    def wait_for_function(self, js, arg=None, timeout=None, polling=None):
+        self.waits.append((arg, timeout, polling))
+        if self.outcome is None:
+            raise secop_extract.PWTimeoutError("Timeout 20000ms exceeded.")
+        return FakeHandle(self.outcome)
+
+    def content(self):
+        return self.html
+
+
+class _Readiness:
+    """Redirige reports/readiness a un directorio temporal."""
+
+    def __enter__(self):
+        self.dir = Path(tempfile.mkdtemp(prefix="secop_readiness_"))
+        self.original = secop_extract.READINESS_DIR
+        secop_extract.READINESS_DIR = self.dir / "readiness"
+        return self
+
+    def __exit__(self, *exc):
+        secop_extract.READINESS_DIR = self.original
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def lines(self):
+        files = list((self.dir / "readiness").glob("readiness_*.jsonl"))
+        if not files:
+            return []
+        return [json.loads(line) for line in files[0].read_text(encoding="utf-8").splitlines()]
+
+
+def test_resultados_de_la_espera():
+    for outcome in ("ready", "blocked", "not_found"):
+        page = FakePage(outcome, "")
+        assert secop_extract._wait_for_detail_ready(page, timeout_ms=1500) == outcome
+        cfg, timeout, polling = page.waits[0]
+        assert timeout == 1500 and polling == secop_extract.READY_POLL_MS
+        assert cfg["selector"] == secop_extract.READY_SELECTOR
+        assert cfg["notFound"] == secop_extract.NOT_FOUND_MARKERS and cfg["block"] == secop_extract.BLOCK_MARKERS
+    assert secop_extract._wait_for_detail_ready(FakePage(None, "")) == "timeout"
+    # El JS compara contra el texto en minusculas y sin tildes: los marcadores deben venir igual
+    for marker in secop_extract.NOT_FOUND_MARKERS + secop_extract.BLOCK_MARKERS:
+        plain = "".join(ch for ch in unicodedata.normalize("NFD", marker) if not unicodedata.combining(ch))
+        assert marker == plain.lower(), marker
+
+
+def test_lo_que_ve_el_que_llama():
+    html = FIXTURE.read_text(encoding="utf-8")
+    with _Readiness():
+        page = FakePage("ready", html)
+        assert secop_extract._fetch_detail_html_with_page(page, "25-1-1001") == html
+        assert page.visited == [secop_extract.build_url("25-1-1001")]
+
+        try:
+            secop_extract._fetch_detail_html_with_page(FakePage("not_found", NOT_FOUND_PAGE), "25-1-9999")
+            raise AssertionError("el proceso inexistente no fallo")
+        except secop_extract.SecopBlockedError:
+            raise AssertionError("un proceso inexistente no es un bloqueo")
+        except secop_extract.SecopExtractionError as e:
+            assert str(e) == "El proceso no existe en SECOP I: 25-1-9999"
+            assert not secop_extract._is_block_message(str(e))
+
+        original_dump = secop_extract._dump_blocked_html
+        secop_extract._dump_blocked_html = lambda html, constancia: None
+        try:
+            secop_extract._fetch_detail_html_with_page(FakePage("blocked", BLOCK_PAGE), "25-1-1002")
+            raise AssertionError("el bloqueo no fallo")
+        except secop_extract.SecopBlockedError as e:
+            assert "Incident ID" in e.html and secop_extract._is_block_message(str(e))
+        finally:
+            secop_extract._dump_blocked_html = original_dump
+
+        # Tiempo agotado (p.ej. reCAPTCHA sin resolver): se entrega lo que haya y decide el parser
+        partial = "<html><body>Cargando...</body></html>"
+        assert secop_extract._load_detail_page(FakePage(None, partial), "25-1-1003") == partial
+
+
+def test_linea_jsonl_por_pagina():
+    html = FIXTURE.read_text(encoding="utf-8")
+    with _Readiness() as readiness:
+        secop_extract._load_detail_page(FakePage("ready", html), "25-1-1001")
+        try:
+            secop_extract._load_detail_page(FakePage("not_found", NOT_FOUND_PAGE), "25-1-9999")
+        except secop_extract.SecopExtractionError:
+            pass
+        secop_extract._load_detail_page(FakePage(None, ""), "25-1-1003")
+        lines = readiness.lines()
+    assert [(r["constancia"], r["outcome"]) for r in lines] == [
+        ("25-1-1001", "ready"),
+        ("25-1-9999", "not_found"),
+        ("25-1-1003", "timeout"),
+    ]
+    first = lines[0]
+    assert set(first) == {"ts", "constancia", "outcome", "goto_ms", "ready_ms", "content_ms", "html_bytes"}
+    assert first["html_bytes"] == len(html) and lines[2]["html_bytes"] == 0
+    assert all(isinstance(r[k], int) and r[k] >= 0 for r in lines for k in ("goto_ms", "ready_ms", "content_ms"))
+
+    # Best-effort: si no se puede escribir el registro la carga sigue
+    work = Path(tempfile.mkdtemp(prefix="secop_readiness_"))
+    original = secop_extract.READINESS_DIR
+    try:
+        (work / "archivo").write_text("x", encoding="utf-8")
+        secop_extract.READINESS_DIR = work / "archivo" / "readiness"
+        assert secop_extract._load_detail_page(FakePage("ready", html), "25-1-1001") == html
+    finally:
+        secop_extract.READINESS_DIR = original
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    tests = [
+        test_resultados_de_la_espera,
+        test_lo_que_ve_el_que_llama,
+        test_linea_jsonl_por_pagina,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
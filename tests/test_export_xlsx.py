@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+test_export_xlsx.py
+
+Valida el Excel de resultados escrito en streaming (scripts/xlsx_export.py):
+1. Se conserva la plantilla: orden de encabezados, anchos, hoja Config, columna
+   "Abrir detalle" como hipervinculo y filas de la plantilla despues de los datos
+2. Los errores van en la hoja Errores
+3. append_batch_to_excel acumula en la bitacora del libro (sin recargarlo) e importa
+   un libro acumulado anterior que no tenia bitacora
+4. El esquema de la plantilla se lee una vez y se invalida si cambia el archivo
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import openpyxl
+
+import secop_extract
+import xlsx_export
+
+TEMPLATE = ROOT_DIR / "templates" / "Plantilla_Salida_EXTRACTOR_SECOP_v1.2.10.xlsx"
+FIXTURES = {
+    "25-1-240855": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html",
+    "25-1-241304": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ CMA 008-25.html",
+}
+
+
+def _record(constancia):
+    html = FIXTURES[constancia].read_text(encoding="utf-8")
+    return secop_extract._build_record_from_soup(secop_extract.parse_detail_html(html), constancia)
+
+
+def _column(ws, header):
+    keys = [xlsx_export._norm_key(str(c.value or "")) for c in ws[1]]
+    return keys.index(xlsx_export._norm_key(header)) + 1
+
+
+def _filled(ws, header):
+    col = _column(ws, header)
+    return [ws.cell(row=r, column=col).value for r in range(2, ws.max_row + 1) if ws.cell(row=r, column=col).value]
+
+
+def test_libro_conserva_la_plantilla():
+    work = Path(tempfile.mkdtemp(prefix="secop_xlsx_"))
+    try:
+        out = work / "salida.xlsx"
+        with xlsx_export.XlsxStreamWriter(TEMPLATE, out, secop_extract.SECOP_BASE_URL) as writer:
+            for constancia in FIXTURES:
+                writer.write_record(constancia, _record(constancia))
+            writer.write_errors([("25-1-99999", "Constancia no encontrada")])
+
+        template = openpyxl.load_workbook(TEMPLATE)
+        wb = openpyxl.load_workbook(out)
+        assert wb.sheetnames == template.sheetnames + ["Errores"]
+        ws, src = wb["Resultados_Extraccion"], template["Resultados_Extraccion"]
+        assert [c.value for c in ws[1]] == [c.value for c in src[1]]
+        assert ws["A1"].font.b and ws.column_dimensions["D"].width == src.column_dimensions["D"].width
+        assert ws.max_row == src.max_row
+        assert _filled(ws, "Numero de constancia") == list(FIXTURES)
+        assert _filled(ws, "Registro Presupuestal (RP)") == ["2503100004", "2601130001"]
+
+        link = ws.cell(row=2, column=_column(ws, "Abrir detalle"))
+        assert link.value.startswith("=HYPERLINK(") and "25-1-240855" in link.value and link.style == "Hyperlink"
+        # Despues de los datos siguen las filas de la plantilla (formula original)
+        assert ws.cell(row=4, column=_column(ws, "Abrir detalle")).value == src.cell(row=4, column=_column(src, "Abrir detalle")).value
+
+        assert [c.value for c in wb["Config"]["A"]] == [c.value for c in template["Config"]["A"]]
+        assert [[c.value for c in row] for row in wb["Errores"].iter_rows()] == [
+            ["numConstancia", "error"],
+            ["25-1-99999", "Constancia no encontrada"],
+        ]
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def test_acumulado_usa_la_bitacora():
+    @contextmanager
+    def fake_session(headless=False, pool=None, http_fast_path=True):
+        yield lambda c: FIXTURES[c].read_text(encoding="utf-8")
+
+    original_session = secop_extract._open_detail_session
+    secop_extract._open_detail_session = fake_session
+    work = Path(tempfile.mkdtemp(prefix="secop_xlsx_"))
+    try:
+        # Libro acumulado de una version anterior (sin bitacora)
+        out = work / "Lote_Acumulado.xlsx"
+        with xlsx_export.XlsxStreamWriter(TEMPLATE, out, secop_extract.SECOP_BASE_URL) as writer:
+            writer.write_record("25-1-240855", _record("25-1-240855"))
+
+        _, errors, ok = secop_extract.append_batch_to_excel(["25-1-241304"], out, delay_seconds=0)
+        assert not errors and ok == 1
+        assert out.with_suffix(".jsonl").exists()
+        _, errors, ok = secop_extract.append_batch_to_excel(["25-1-240855", "25-1-241304"], out, delay_seconds=0)
+        assert not errors and ok == 2
+
+        ws = openpyxl.load_workbook(out)["Resultados_Extraccion"]
+        assert _filled(ws, "Numero de constancia") == ["25-1-240855", "25-1-241304", "25-1-240855", "25-1-241304"]
+        assert _filled(ws, "Registro Presupuestal (RP)") == ["2503100004", "2601130001"] * 2
+        assert not out.with_name(out.stem + ".tmp.xlsx").exists()
+    finally:
+        secop_extract._open_detail_session = original_session
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def test_esquema_en_cache_hasta_que_cambia_la_plantilla():
+    work = Path(tempfile.mkdtemp(prefix="secop_xlsx_"))
+    try:
+        template = work / "plantilla.xlsx"
+        shutil.copyfile(TEMPLATE, template)
+        schema = xlsx_export.load_template_schema(template)
+        assert xlsx_export.load_template_schema(template) is schema
+        assert schema.headers[schema.link_col] == "Abrir detalle"
+        assert schema.link_base == secop_extract.SECOP_BASE_URL
+        assert schema.formula_cols == {schema.link_col}
+        assert schema.column_of("Numero de constancia") == schema.column_of("Número de constancia:")
+        assert schema.column_of("Campo inexistente") is None
+
+        wb = openpyxl.load_workbook(template)
+        wb["Resultados_Extraccion"].cell(row=1, column=len(schema.headers) + 1, value="Columna nueva")
+        wb.save(template)
+        st = template.stat()
+        os.utime(template, ns=(st.st_atime_ns, schema.mtime_ns + 1_000_000_000))
+        fresh = xlsx_export.load_template_schema(template)
+        assert fresh is not schema and fresh.headers[-1] == "Columna nueva"
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    tests = [
+        test_libro_conserva_la_plantilla,
+        test_acumulado_usa_la_bitacora,
+        test_esquema_en_cache_hasta_que_cambia_la_plantilla,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
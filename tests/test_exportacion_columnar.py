@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+test_exportacion_columnar.py
+
+Valida el modelo tipado (scripts/record_model.py) y la exportacion por formatos
+(scripts/columnar_export.py):
+1. Valor en COP entero, fechas como fecha, estado como enum (vacios => None)
+2. CSV con las columnas del modelo
+3. Un lote con export_formats deja el CSV junto al Excel (mismo nombre)
+4. Parquet y Arrow IPC conservan los tipos (requiere pyarrow)
+"""
+
+import csv
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import columnar_export
+import record_model
+import secop_extract
+from record_model import EstadoProceso
+
+FIXTURES = {
+    "25-1-240855": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html",
+    "25-1-241304": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ CMA 008-25.html",
+}
+
+
+def _records():
+    return [
+        (c, secop_extract._build_record_from_soup(secop_extract.parse_detail_html(p.read_text(encoding="utf-8")), c))
+        for c, p in FIXTURES.items()
+    ]
+
+
+def test_registro_tipado():
+    (_, lic), (_, cma) = _records()
+    typed = record_model.to_typed(lic)
+    assert list(typed) == record_model.COLUMNS
+    assert typed["valor_contrato_cop"] == 496510063
+    assert typed["fecha_inicio"] == date(2025, 3, 17)
+    assert typed["estado"] is EstadoProceso.LIQUIDADO and typed["estado_texto"] == "Liquidado"
+    assert typed["registro_presupuestal"] == "2503100004"
+
+    typed = record_model.to_typed(cma)
+    assert typed["estado"] is EstadoProceso.CELEBRADO
+    assert typed["fecha_terminacion"] is None
+
+    assert record_model.parse_fecha("31/12/2024") == date(2024, 12, 31)
+    assert record_model.parse_fecha("31 de febrero de 2024") is None
+    assert record_model.parse_estado("Terminado Anormalmente después de Convocado") is EstadoProceso.TERMINADO_ANORMALMENTE
+    assert record_model.parse_cop("") is None
+
+
+def test_csv_con_columnas_del_modelo():
+    work = Path(tempfile.mkdtemp(prefix="secop_columnar_"))
+    try:
+        paths = columnar_export.export_records(_records(), work / "lote.xlsx", ["csv"])
+        assert paths == {"csv": work / "lote.csv"}
+        with paths["csv"].open(encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert list(rows[0]) == record_model.COLUMNS
+        assert [r["numero_constancia"] for r in rows] == list(FIXTURES)
+        assert rows[0]["fecha_inicio"] == "2025-03-17" and rows[0]["estado"] == "liquidado"
+        assert rows[0]["valor_contrato_cop"] == "496510063" and rows[1]["fecha_terminacion"] == ""
+
+        try:
+            columnar_export.parse_formats("csv,xml")
+            raise AssertionError("se esperaba ValueError")
+        except ValueError:
+            pass
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def test_lote_exporta_junto_al_excel():
+    @contextmanager
+    def fake_session(headless=False, pool=None, http_fast_path=True):
+        yield lambda c: FIXTURES[c].read_text(encoding="utf-8")
+
+    original_session = secop_extract._open_detail_session
+    secop_extract._open_detail_session = fake_session
+    out_dir = Path(tempfile.mkdtemp(prefix="secop_out_"))
+    try:
+        out_path, errors = secop_extract.extract_batch_to_excel(
+            list(FIXTURES), out_dir, delay_seconds=0, export_formats=["csv"]
+        )
+        assert not errors
+        csv_path = columnar_export.export_path(out_path, "csv")
+        assert csv_path.exists() and csv_path.stem == out_path.stem
+        with csv_path.open(encoding="utf-8-sig", newline="") as f:
+            assert [r["registro_presupuestal"] for r in csv.DictReader(f)] == ["2503100004", "2601130001"]
+    finally:
+        secop_extract._open_detail_session = original_session
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def test_parquet_y_arrow_conservan_tipos():
+    if columnar_export.pa is None:
+        print("  [SKIP] pyarrow no instalado")
+        return
+    import pyarrow.parquet as pq
+
+    work = Path(tempfile.mkdtemp(prefix="secop_columnar_"))
+    try:
+        paths = columnar_export.export_records(_records(), work / "lote.xlsx", ["parquet", "arrow"])
+        table = pq.read_table(paths["parquet"])
+        assert table.column("valor_contrato_cop").to_pylist()[0] == 496510063
+        assert table.column("fecha_inicio").to_pylist()[0] == date(2025, 3, 17)
+        assert table.column("estado").to_pylist() == ["liquidado", "celebrado"]
+        with columnar_export.pa.memory_map(str(paths["arrow"])) as source:
+            ipc = columnar_export.pa.ipc.open_file(source).read_all()
+        assert ipc.schema.equals(columnar_export.arrow_schema()) and ipc.num_rows == 2
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    tests = [
+        test_registro_tipado,
+        test_csv_con_columnas_del_modelo,
+        test_lote_exporta_junto_al_excel,
+        test_parquet_y_arrow_conservan_tipos,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
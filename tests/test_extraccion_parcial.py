@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+test_extraccion_parcial.py
+
+Valida la extraccion por campos (secop_extract.extract / extract_fields):
+1. extract(html, fields={"rp", "cdp"}) da lo mismo que el registro completo y no arma
+   las secciones KV que esos campos no necesitan
+2. Se aceptan nombres del plan o columnas; un campo desconocido es un error claro
+3. La re-extraccion offline con --campos escribe solo esas columnas
+"""
+
+import csv
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import offline_reextract
+import secop_extract
+
+FIXTURES = {
+    "25-1-240855": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html",
+    "25-1-241304": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ CMA 008-25.html",
+}
+RP = "Registro Presupuestal (RP)"
+CDP = "Certificado de disponibilidad presupuestal"
+
+
+def test_solo_los_campos_pedidos():
+    calls = []
+    original = secop_extract._parse_all_kv
+
+    def counted(page):
+        calls.append(1)
+        return original(page)
+
+    secop_extract._parse_all_kv = counted
+    try:
+        for constancia, path in FIXTURES.items():
+            html = path.read_text(encoding="utf-8")
+            full = secop_extract.extract(html, constancia_ok=constancia)
+            calls.clear()
+            partial = secop_extract.extract(html, fields={"cdp", "rp"})
+            assert partial == {RP: full[RP], CDP: full[CDP]}
+            assert list(partial) == [RP, CDP]  # orden del registro, no del pedido
+            assert calls == []  # RP y CDP no necesitan el baseline KV
+            assert secop_extract.extract(html, fields={"objeto"}) == {"Objeto del contrato": full["Objeto del contrato"]}
+            assert calls == [1]
+    finally:
+        secop_extract._parse_all_kv = original
+
+    html = FIXTURES["25-1-240855"].read_text(encoding="utf-8")
+    assert secop_extract.extract_record_from_html(html, "25-1-240855") == {
+        "Numero de constancia": "25-1-240855",
+        RP: "2503100004",
+        CDP: secop_extract.extract(html, fields={"cdp"})[CDP],
+    }
+
+
+def test_nombres_y_errores():
+    html = FIXTURES["25-1-240855"].read_text(encoding="utf-8")
+    by_column = secop_extract.extract(html, fields=[RP, "Numero de constancia"], constancia_ok="25-1-240855")
+    assert by_column == {"Numero de constancia": "25-1-240855", RP: "2503100004"}
+    assert secop_extract.extract(html, fields={"departamento"}) == {"departamento": "La Guajira : Albania"}
+    try:
+        secop_extract.extract(html, fields={"rp", "entidad_x"})
+        raise AssertionError("un campo desconocido no fallo")
+    except secop_extract.SecopExtractionError as e:
+        assert "entidad_x" in str(e) and "rp" in str(e)
+
+
+def test_reextraccion_con_campos():
+    work = Path(tempfile.mkdtemp(prefix="secop_parcial_"))
+    try:
+        src = work / "paginas"
+        src.mkdir()
+        for constancia, path in FIXTURES.items():
+            shutil.copyfile(path, src / f"{constancia}.html")
+        out_path, run = offline_reextract.reextract(src, work / "rp.csv", fmt="csv", workers=1, fields=["rp", "cdp"])
+        assert not run.failures
+        with out_path.open(encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert [r["numero_constancia"] for r in rows] == list(FIXTURES)
+        assert [r["registro_presupuestal"] for r in rows] == ["2503100004", "2601130001"]
+        assert all(r["cdp"] for r in rows)
+        assert not any(r["objeto_contrato"] or r["estado_validacion"] for r in rows)
+        try:
+            offline_reextract.reextract(src, work / "x.csv", fmt="csv", workers=1, fields=["nada"])
+            raise AssertionError("un campo desconocido no fallo")
+        except secop_extract.SecopExtractionError:
+            pass
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    tests = [
+        test_solo_los_campos_pedidos,
+        test_nombres_y_errores,
+        test_reextraccion_con_campos,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+test_filtro_recursos.py
+
+Valida el filtro de peticiones del contexto Playwright (secop_extract._should_block_request):
+1. El documento principal del detalle y los scripts propios pasan
+2. CSS, imagenes y fuentes (los recursos guardados en fixtures/detalle) se abortan
+3. Todo lo que reCAPTCHA necesita pasa
+4. Iframes del portal y hosts de terceros se abortan
+"""
+
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import secop_extract
+
+SECOP = "https://www.contratos.gov.co"
+
+
+def test_documento_principal_pasa():
+    url = secop_extract.build_url("25-1-241304")
+    assert not secop_extract._should_block_request("document", url)
+    assert not secop_extract._should_block_request("script", f"{SECOP}/puc/comun/js/general.js")
+
+
+def test_recursos_estaticos_se_abortan():
+    for resource_type, path in [
+        ("stylesheet", "/puc/comun/css/secop.css"),
+        ("stylesheet", "/puc/comun/css/tablas.css"),
+        ("image", "/puc/comun/images/icono_secop.png"),
+        ("image", "/puc/comun/images/fb_pata.png"),
+        ("font", "/puc/comun/fonts/arial.woff"),
+    ]:
+        assert secop_extract._should_block_request(resource_type, SECOP + path), path
+
+
+def test_recaptcha_pasa():
+    for resource_type, url in [
+        ("script", "https://www.google.com/recaptcha/api.js?render=explicit"),
+        ("script", "https://www.gstatic.com/recaptcha/releases/abc/recaptcha__es_419.js"),
+        ("document", "https://www.google.com/recaptcha/api2/anchor?k=xyz"),
+        ("image", "https://www.google.com/recaptcha/api2/payload?p=1"),
+        ("stylesheet", "https://www.gstatic.com/recaptcha/releases/abc/styles__ltr.css"),
+    ]:
+        assert not secop_extract._should_block_request(resource_type, url, is_subframe=True), url
+
+
+def test_iframes_y_terceros_se_abortan():
+    assert secop_extract._should_block_request("document", f"{SECOP}/puc/ServletCabezote", is_subframe=True)
+    assert secop_extract._should_block_request("document", f"{SECOP}/puc/pie.html", is_subframe=True)
+    assert secop_extract._should_block_request("script", "https://connect.facebook.net/es_LA/sdk.js")
+    assert secop_extract._should_block_request("script", "https://www.google-analytics.com/analytics.js")
+    assert secop_extract._should_block_request("image", "https://www.flickr.com/ico_flickr.png")
+    # Un host que solo "contiene" el dominio no es el portal
+    assert secop_extract._should_block_request("script", "https://contratos.gov.co.evil.example/x.js")
+
+
+def test_esquemas_no_http_pasan():
+    assert not secop_extract._should_block_request("image", "data:image/png;base64,AAAA")
+
+
+def main():
+    tests = [
+        test_documento_principal_pasa,
+        test_recursos_estaticos_se_abortan,
+        test_recaptcha_pasa,
+        test_iframes_y_terceros_se_abortan,
+        test_esquemas_no_http_pasan,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+test_indice_pagina.py
+
+Valida el indice de pagina de una sola pasada (scripts/page_index.py):
+1. Tablas, filas y celdas coinciden con los recorridos find_all de BeautifulSoup
+2. "Tablas despues de un encabezado" equivale a find_all_next("table")
+3. Los registros de los fixtures se extraen con los valores esperados
+"""
+
+import sys
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import page_index
+import secop_extract
+
+FIXTURES_DIR = ROOT_DIR / "fixtures" / "detalle"
+LIC = FIXTURES_DIR / "Detalle del proceso_ LIC 002-25.html"
+CMA = FIXTURES_DIR / "Detalle del proceso_ CMA 008-25.html"
+
+
+def _soup(path):
+    return BeautifulSoup(path.read_text(encoding="utf-8"), "html.parser")
+
+
+def test_estructura_igual_a_find_all():
+    for path in (LIC, CMA):
+        soup = _soup(path)
+        idx = page_index.build_index(soup)
+        tables = soup.find_all("table")
+        assert len(idx.tables) == len(tables), path.name
+        for table, t in zip(tables, idx.tables):
+            trs = table.find_all("tr")
+            assert len(t.rows) == len(trs)
+            for tr, row in zip(trs, t.rows):
+                assert [c.node for c in row.cells] == tr.find_all(["th", "td"])
+                assert [c.node for c in row.direct] == tr.find_all(["th", "td"], recursive=False)
+                assert [c.node for c in row.direct_td] == tr.find_all("td", recursive=False)
+
+
+def test_tablas_despues_del_encabezado():
+    soup = _soup(LIC)
+    idx = page_index.build_index(soup)
+    assert idx.section_headers
+    for cell in idx.section_headers:
+        header_tr = cell.node.find_parent("tr")
+        expected = header_tr.find_all_next("table", limit=12)
+        got = [t.pos for t in idx.tables_after(cell.row.pos, 12)]
+        assert got == [idx.tables[soup.find_all("table").index(t)].pos for t in expected]
+
+
+def test_registros_de_fixtures():
+    lic = secop_extract.extract_record_from_html(LIC.read_text(encoding="utf-8"), "25-1-240855")
+    assert lic["Registro Presupuestal (RP)"] == "2503100004"
+    assert lic["Certificado de disponibilidad presupuestal"] == "2502060001"
+    cma = secop_extract._build_record_from_soup(_soup(CMA), "25-1-241304")
+    assert cma["Registro Presupuestal (RP)"] == "2601130001"
+    assert cma["Estado del proceso"] == "Celebrado"
+
+
+def main():
+    tests = [
+        test_estructura_igual_a_find_all,
+        test_tablas_despues_del_encabezado,
+        test_registros_de_fixtures,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
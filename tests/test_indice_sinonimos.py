@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+test_indice_sinonimos.py
+
+Valida la resolucion de campos por sinonimos (scripts/label_index.py):
+1. Aho-Corasick encuentra todos los patrones, incluso solapados o contenidos
+2. El indice da lo mismo que la busqueda anidada (exacto primero, luego "contiene")
+3. La normalizacion de rotulos se memoiza con un LRU acotado
+"""
+
+import random
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import label_index
+import secop_extract
+
+FIXTURE = ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html"
+
+
+def _nested_get_first(m, keys):
+    """Busqueda anidada original: exacto en orden de sinonimos y luego 'contiene'."""
+    for k in keys:
+        nk = secop_extract._norm_key(k)
+        if nk in m and m[nk]:
+            return m[nk]
+    for k in keys:
+        nk = secop_extract._norm_key(k)
+        for mk, mv in m.items():
+            if mv and nk in mk:
+                return mv
+    return ""
+
+
+def test_aho_corasick_con_solapes():
+    matcher = label_index.AhoCorasick(["he", "she", "his", "hers", "contrato", "numero del contrato"])
+    found = {matcher.patterns[i] for i in matcher.find("ushers")}
+    assert found == {"he", "she", "hers"}
+    found = {matcher.patterns[i] for i in matcher.find("numero del contrato firmado")}
+    assert found == {"contrato", "numero del contrato"}
+    assert matcher.find("nada que ver") == set()
+
+
+def test_indice_equivale_a_busqueda_anidada():
+    labels = sorted({secop_extract._norm_key(k) for keys in secop_extract.FIELD_SYNONYMS.values() for k in keys})
+    extra = ["nombre del representante legal", "valor total", "fecha de inicio del contrato", "estado", "otro rotulo"]
+    rnd = random.Random(7)
+    for _ in range(300):
+        chosen = rnd.sample(labels + extra, rnd.randint(1, 12))
+        m = {}
+        for label in chosen:
+            decorated = rnd.choice([label, f"{label} inicial", f"la {label}"])
+            m.setdefault(decorated, rnd.choice(["", f"v-{decorated}"]))
+        resolved = secop_extract.FIELD_INDEX.resolve(m)
+        for field, keys in secop_extract.FIELD_SYNONYMS.items():
+            assert resolved.get(field) == _nested_get_first(m, keys), (field, m)
+
+    idx = secop_extract.parse_detail_html(FIXTURE.read_text(encoding="utf-8"))
+    baseline = secop_extract._kv_to_map(secop_extract._parse_all_kv(idx))
+    general = secop_extract._merge_maps_keep_first(
+        secop_extract._kv_to_map(secop_extract._parse_section_kv(idx, "Informacion General del Proceso")), baseline
+    )
+    resolved = secop_extract.FIELD_INDEX.resolve(general)
+    for field, keys in secop_extract.FIELD_SYNONYMS.items():
+        assert resolved.get(field) == _nested_get_first(general, keys), field
+
+
+def test_normalizacion_memoizada():
+    secop_extract._norm_key.cache_clear()
+    for _ in range(3):
+        secop_extract._norm_key("Número del Contrato:")
+    info = secop_extract._norm_key.cache_info()
+    assert info.maxsize == secop_extract.NORM_CACHE_SIZE
+    assert (info.hits, info.misses) == (2, 1)
+    assert secop_extract._norm_key("Número del Contrato:") == "numero del contrato"
+    assert secop_extract._norm_text(None) == ""
+    assert secop_extract._norm_text("Fuente: Recursos-Propios") == "fuente recursos propios"
+
+
+def main():
+    tests = [
+        test_aho_corasick_con_solapes,
+        test_indice_equivale_a_busqueda_anidada,
+        test_normalizacion_memoizada,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
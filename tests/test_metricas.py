@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+test_metricas.py
+
+Valida los tiempos por etapa (scripts/metrics.py):
+1. El histograma se expone en formato Prometheus (buckets acumulados, suma, conteo)
+2. El resumen de un lote calcula n, total y percentiles por metrica/etiqueta
+3. Un lote escribe la hoja Tiempos con las etapas, el parseo, los campos y la escritura
+4. GET /metrics de la UI expone los histogramas acumulados
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import metrics
+import rate_limit
+import secop_extract
+import xlsx_export
+
+FIXTURE = ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html"
+CONSTANCIAS = ["25-1-1001", "25-1-1002"]
+
+
+@contextmanager
+def _fake_site():
+    html = FIXTURE.read_text(encoding="utf-8")
+
+    @contextmanager
+    def fake_session(headless=False, pool=None, http_fast_path=True):
+        yield lambda c: html
+
+    original = secop_extract._open_detail_session
+    secop_extract._open_detail_session = fake_session
+    rate_limit.reset_limiters()
+    try:
+        yield
+    finally:
+        secop_extract._open_detail_session = original
+        rate_limit.reset_limiters()
+
+
+def test_exposicion_prometheus():
+    registry = metrics.Registry()
+    hist = registry.histogram("prueba_seconds", "Prueba", ["op"], buckets=(0.01, 0.1))
+    hist.observe(0.005, op='a"b')
+    hist.observe(0.05, op='a"b')
+    hist.observe(5.0, op='a"b')
+    text = registry.render()
+    assert "# TYPE prueba_seconds histogram" in text
+    assert 'prueba_seconds_bucket{op="a\\"b",le="0.01"} 1' in text
+    assert 'prueba_seconds_bucket{op="a\\"b",le="0.1"} 2' in text
+    assert 'prueba_seconds_bucket{op="a\\"b",le="+Inf"} 3' in text
+    assert 'prueba_seconds_count{op="a\\"b"} 3' in text
+    assert 'prueba_seconds_sum{op="a\\"b"} 5.055' in text
+    try:
+        hist.observe(0.1)
+        raise AssertionError("faltan etiquetas y no fallo")
+    except ValueError:
+        pass
+
+
+def test_resumen_del_lote():
+    registry = metrics.Registry()
+    fast = registry.histogram("rapido_seconds", "Rapido")
+    slow = registry.histogram("lento_seconds", "Lento", ["fase"])
+    fast.observe(1.0)  # fuera del resumen
+    with registry.summary() as timings:
+        for n in range(1, 11):
+            fast.observe(n / 1000)
+        slow.observe(0.5, fase="goto")
+    fast.observe(1.0)
+    rows = timings.rows()
+    assert [r[:2] for r in rows] == [["lento_seconds", 'fase="goto"'], ["rapido_seconds", ""]]
+    assert rows[1][2:] == [10, 0.055, 5.5, 6.0, 10.0, 10.0]
+
+
+def test_hoja_de_tiempos_del_lote():
+    out_dir = Path(tempfile.mkdtemp(prefix="secop_metricas_"))
+    try:
+        with _fake_site():
+            out_path, errors = secop_extract.extract_batch_to_excel(
+                CONSTANCIAS, out_dir, rate_profile=rate_limit.RateProfile.from_delay(0, 0), breaker=None
+            )
+        assert errors == []
+        wb = load_workbook(out_path)
+        assert xlsx_export.TIMINGS_SHEET in wb.sheetnames
+        ws = wb[xlsx_export.TIMINGS_SHEET]
+        rows = [list(r) for r in ws.iter_rows(values_only=True)]
+        assert rows[0] == metrics.SUMMARY_HEADERS
+        counts = {(r[0], r[1]): r[2] for r in rows[1:]}
+        assert counts[("secop_stage_seconds", 'stage="parse"')] == 2
+        assert counts[("secop_parse_seconds", f'parser="{secop_extract.HTML_PARSER}"')] == 2
+        assert counts[("secop_field_seconds", 'field="rp"')] == 2
+        assert counts[("secop_xlsx_write_seconds", 'op="row"')] == 2
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def test_endpoint_metrics():
+    work_dir = Path(tempfile.mkdtemp(prefix="secop_ui_"))
+    os.environ["SECOP_OUTPUT_DIR"] = str(work_dir)
+    sys.path.insert(0, str(ROOT_DIR))
+    import secop_ui
+
+    try:
+        with _fake_site():
+            secop_extract.extract_batch_to_excel(
+                CONSTANCIAS[:1], work_dir, rate_profile=rate_limit.RateProfile.from_delay(0, 0), breaker=None
+            )
+        response = secop_ui.APP.test_client().get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["Content-Type"] == metrics.CONTENT_TYPE
+        body = response.get_data(as_text=True)
+        assert 'secop_field_seconds_bucket{field="rp",le="+Inf"}' in body
+        assert "# TYPE secop_batch_seconds histogram" in body
+    finally:
+        secop_ui._job_queue().close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    tests = [
+        test_exposicion_prometheus,
+        test_resumen_del_lote,
+        test_hoja_de_tiempos_del_lote,
+        test_endpoint_metrics,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
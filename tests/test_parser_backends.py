@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+test_parser_backends.py
+
+Valida que los backends de parseo (SECOP_HTML_PARSER) producen la misma extraccion:
+1. Cada campo de _build_record_from_soup sale igual con html.parser, lxml y selectolax
+2. El CDP minimo (cdp_extract_min) sale igual con todos los backends
+3. Un backend desconocido se reporta como SecopExtractionError; en cdp_extract_min como
+   ValueError (desconocido) o ImportError (sin su dependencia), no SystemExit
+
+Los backends opcionales que no esten instalados se omiten ([SKIP]).
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import cdp_extract_min
+import secop_extract
+
+FIXTURES = {
+    "25-1-240855": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html",
+    "25-1-241304": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ CMA 008-25.html",
+}
+REFERENCE = "html.parser"
+
+
+def _available_backends():
+    backends = []
+    for backend, module in [("lxml", "lxml"), ("selectolax", "selectolax")]:
+        if importlib.util.find_spec(module) is None:
+            print(f"[SKIP] Backend no instalado: {backend}")
+            continue
+        backends.append(backend)
+    return backends
+
+
+def test_registros_iguales_en_todos_los_backends():
+    for constancia, path in FIXTURES.items():
+        html = path.read_text(encoding="utf-8")
+        expected = secop_extract._build_record_from_soup(secop_extract.parse_detail_html(html, REFERENCE), constancia)
+        assert expected["Registro Presupuestal (RP)"], path.name
+        for backend in _available_backends():
+            got = secop_extract._build_record_from_soup(secop_extract.parse_detail_html(html, backend), constancia)
+            diff = {k: (v, got.get(k)) for k, v in expected.items() if got.get(k) != v}
+            assert not diff, f"{backend} / {path.name}: {diff}"
+            assert set(got) == set(expected)
+
+
+def test_cdp_minimo_igual_en_todos_los_backends():
+    for path in FIXTURES.values():
+        html = path.read_text(encoding="utf-8")
+        expected = cdp_extract_min.extract_cdp_from_html(html, REFERENCE)
+        for backend in _available_backends():
+            assert cdp_extract_min.extract_cdp_from_html(html, backend) == expected, f"{backend} / {path.name}"
+
+
+def test_backend_desconocido():
+    try:
+        secop_extract.parse_detail_html("<html></html>", "html5lib-rapido")
+        raise AssertionError("se esperaba SecopExtractionError")
+    except secop_extract.SecopExtractionError as e:
+        assert "no soportado" in str(e)
+
+    html = FIXTURES["25-1-240855"].read_text(encoding="utf-8")
+    try:
+        cdp_extract_min.extract_cdp_from_html(html, "html5lib-rapido")
+        raise AssertionError("se esperaba ValueError")
+    except ValueError as e:
+        assert "no soportado" in str(e)
+
+    original = cdp_extract_min.page_index.LexborHTMLParser
+    cdp_extract_min.page_index.LexborHTMLParser = None  # selectolax no instalado
+    try:
+        cdp_extract_min.extract_cdp_from_html(html, "selectolax")
+        raise AssertionError("se esperaba ImportError")
+    except ImportError as e:
+        assert "pip install selectolax" in str(e)
+    finally:
+        cdp_extract_min.page_index.LexborHTMLParser = original
+
+
+def main():
+    tests = [
+        test_registros_iguales_en_todos_los_backends,
+        test_cdp_minimo_igual_en_todos_los_backends,
+        test_backend_desconocido,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
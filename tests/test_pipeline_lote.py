@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+test_pipeline_lote.py
+
+Valida el lote en etapas fetch -> parse -> write (scripts/batch_pipeline.py):
+1. El parseo se solapa con la pausa del limitador (el lote tarda menos que la suma)
+2. Las colas entre etapas son acotadas: un escritor lento frena a fetch
+3. El orden de escritura y las fallas de cada item se conservan
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import batch_pipeline
+import rate_limit
+import secop_extract
+
+FIXTURE = ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html"
+CONSTANCIAS = [f"25-1-100{n}" for n in range(1, 7)]
+
+
+@contextmanager
+def _patched(fetched):
+    html = FIXTURE.read_text(encoding="utf-8")
+
+    @contextmanager
+    def fake_session(headless=False, pool=None, http_fast_path=True):
+        def fetch(c):
+            fetched.append(c)
+            return html
+
+        yield fetch
+
+    original_session = secop_extract._open_detail_session
+    original_build = secop_extract._build_record_from_soup
+
+    def slow_build(page, constancia_ok):
+        time.sleep(0.08)
+        return original_build(page, constancia_ok)
+
+    secop_extract._open_detail_session = fake_session
+    secop_extract._build_record_from_soup = slow_build
+    rate_limit.reset_limiters()
+    try:
+        yield
+    finally:
+        secop_extract._open_detail_session = original_session
+        secop_extract._build_record_from_soup = original_build
+        rate_limit.reset_limiters()
+
+
+def test_parseo_solapa_la_pausa():
+    fetched, written = [], []
+    profile = rate_limit.RateProfile("prueba", "Prueba", 0.1, 0.1, 0.1, 0.1, jitter=0)
+    with _patched(fetched):
+        run = secop_extract._BatchRun(CONSTANCIAS, rate_profile=profile, breaker=None, parse_workers=1)
+        t0 = time.perf_counter()
+        run.run(lambda c, record: written.append(c))
+        elapsed = time.perf_counter() - t0
+    assert written == CONSTANCIAS and not run.errors
+    stages = run.stage_stats
+    assert [stages[s]["items"] for s in batch_pipeline.STAGES] == [6, 6, 6]
+    assert stages["parse"]["busy_seconds"] >= 0.45
+    # En serie tardaria las pausas (~0.5 s) mas todo el parseo; en etapas se solapan
+    serial = stages["fetch"]["wait_seconds"] + stages["parse"]["busy_seconds"]
+    assert stages["fetch"]["wait_seconds"] >= 0.45 and elapsed < serial - 0.25, (elapsed, serial)
+
+
+def test_colas_acotadas_frenan_a_fetch():
+    fetched, ahead = [], []
+
+    def slow_write(c, record):
+        ahead.append(len(fetched) - len(ahead))
+        time.sleep(0.05)
+
+    with _patched(fetched):
+        run = secop_extract._BatchRun(
+            CONSTANCIAS * 2, rate_profile=rate_limit.RateProfile.from_delay(0, 0), breaker=None, queue_size=1
+        )
+        run.run(slow_write)
+    stages = run.stage_stats
+    assert len(ahead) == 12
+    assert stages["parse"]["max_queue_depth"] <= 1 and stages["write"]["max_queue_depth"] <= 1
+    # Fetch no se adelanta mas que lo que cabe en colas + hilos en vuelo
+    assert max(ahead) <= 8, ahead
+
+
+def test_orden_y_fallas_por_item():
+    written = []
+
+    def parse(item, loaded):
+        if item == 3:
+            raise ValueError("tabla inesperada")
+        time.sleep(0.01 * (5 - item))  # los primeros tardan mas
+        return loaded * 10
+
+    def write(item, outcome):
+        written.append((item, outcome if not isinstance(outcome, Exception) else str(outcome)))
+        return item != 4
+
+    source = ((n, ValueError("red") if n == 2 else n) for n in range(1, 7))
+    pipeline = batch_pipeline.Pipeline(parse_workers=3, queue_size=2)
+    pipeline.run(source, parse, write)
+    assert written == [(1, 10), (2, "red"), (3, "tabla inesperada"), (4, 40)]
+    assert pipeline.snapshot()["write"]["items"] == 4
+    assert not [t for t in threading.enumerate() if t.name.startswith("secop-pipeline")]
+
+
+def main():
+    tests = [
+        test_parseo_solapa_la_pausa,
+        test_colas_acotadas_frenan_a_fetch,
+        test_orden_y_fallas_por_item,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+test_plan_campos.py
+
+Valida el plan declarativo de campos (scripts/field_plan.py y secop_extract.FIELD_PLAN):
+1. Las fuentes se prueban en orden y las siguientes no se evaluan una vez hay valor
+2. Los campos y secciones se evaluan solo al pedirlos, una vez, con su tiempo propio
+3. El plan de SECOP arma el registro completo y expone campos extra sin costo en el registro
+4. Errores de especificacion (seccion o dependencia desconocida, ciclos)
+"""
+
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import field_plan
+import secop_extract
+
+FIXTURE = ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html"
+
+
+def _plan(calls, observed=None):
+    def tracked(name, value):
+        def fn(idx):
+            calls.append(name)
+            return value
+
+        return fn
+
+    sections = {
+        "kv": lambda run: calls.append("seccion") or {"objeto del contrato": "Aseo", "nit": "900.1"},
+    }
+    fields = [
+        field_plan.Field(
+            "objeto",
+            "Objeto",
+            [field_plan.extractor(tracked("vacio", "")), field_plan.labels("kv", "Objeto del Contrato")],
+            criticality=field_plan.CRITICAL,
+        ),
+        field_plan.Field(
+            "ident",
+            None,
+            [field_plan.labels("kv", "NIT"), field_plan.extractor(tracked("respaldo", "no se usa"))],
+        ),
+        field_plan.Field("ident_clean", "Identificacion", [field_plan.field("ident")], cleaner=lambda v: v.replace(".", "")),
+        field_plan.Field("rp", "RP", [field_plan.extractor(tracked("rp", ""))]),
+        field_plan.Field("constancia", "Constancia", [field_plan.param("constancia")]),
+    ]
+    observe = (lambda name, s: observed.append((name, s))) if observed is not None else None
+    return field_plan.FieldPlan(fields, sections, normalize=secop_extract._norm_key, observe=observe)
+
+
+def test_fuentes_en_orden_y_sin_fallbacks_innecesarios():
+    calls = []
+    run = _plan(calls).bind(None, constancia="25-1-1001")
+    assert run.get("objeto") == "Aseo"
+    assert run.get("ident_clean") == "9001"
+    assert calls == ["vacio", "seccion"]  # "respaldo" no se evaluo: el NIT ya tenia valor
+    assert run.get("rp") == ""
+    assert run.record() == {"Objeto": "Aseo", "Identificacion": "9001", "RP": "", "Constancia": "25-1-1001"}
+    assert calls == ["vacio", "seccion", "rp"]  # record() reutiliza lo ya evaluado
+
+
+def test_evaluacion_perezosa_y_tiempo_propio():
+    calls, observed = [], []
+    plan = _plan(calls, observed)
+    run = plan.bind(None)
+    assert run.get("rp") == ""
+    assert calls == ["rp"]  # la seccion KV no se parsea si nadie la pide
+    run.get("ident_clean")
+    names = [name for name, _ in observed]
+    assert names == ["rp", "seccion_kv", "ident", "ident_clean"]
+    assert all(seconds >= 0 for _, seconds in observed)
+    assert plan.columns_with(field_plan.CRITICAL) == ["Objeto"]
+
+
+def test_plan_de_secop():
+    idx = secop_extract.parse_detail_html(FIXTURE.read_text(encoding="utf-8"))
+    record = secop_extract._build_record_from_soup(idx, "25-1-1001")
+    assert list(record)[:2] == ["Numero de proceso (informativo)", "Numero de constancia"]
+    assert list(record)[-2:] == ["Estado de validacion", "Observaciones"]
+    assert record["Registro Presupuestal (RP)"] == "2503100004"
+    assert record["Estado de validacion"] == "Completo"
+    assert "departamento" not in record and "Departamento" not in record
+    run = secop_extract.FIELD_PLAN.bind(idx, constancia="25-1-1001")
+    assert run.get("departamento") == "La Guajira : Albania"
+    assert secop_extract.FIELD_PLAN.columns_with(field_plan.IMPORTANT) == [
+        "Numero de contrato",
+        "Plazo de ejecucion",
+        "Fecha de inicio",
+    ]
+
+
+def test_errores_de_especificacion():
+    def build(fields, sections=None):
+        try:
+            field_plan.FieldPlan(fields, sections or {}, normalize=secop_extract._norm_key)
+        except ValueError as e:
+            return str(e)
+        raise AssertionError("la especificacion invalida no fallo")
+
+    assert "seccion desconocida" in build([field_plan.Field("a", "A", [field_plan.labels("x", "A")])])
+    assert "campo desconocido" in build([field_plan.Field("a", "A", [field_plan.field("b")])])
+    assert "duplicado" in build([field_plan.Field("a", "A", []), field_plan.Field("a", "B", [])])
+
+    cyclic = field_plan.FieldPlan(
+        [field_plan.Field("a", "A", [field_plan.field("b")]), field_plan.Field("b", "B", [field_plan.field("a")])],
+        {},
+        normalize=secop_extract._norm_key,
+    )
+    try:
+        cyclic.bind(None).get("a")
+        raise AssertionError("el ciclo no fallo")
+    except ValueError as e:
+        assert "a -> b -> a" in str(e)
+
+
+def main():
+    tests = [
+        test_fuentes_en_orden_y_sin_fallbacks_innecesarios,
+        test_evaluacion_perezosa_y_tiempo_propio,
+        test_plan_de_secop,
+        test_errores_de_especificacion,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+test_pool_navegador.py
+
+Valida el ciclo de vida del pool de navegador (scripts/browser_pool.py) con un Playwright falso:
+1. El contexto se recicla despues de max_pages_per_context paginas
+2. Si el navegador se desconecta se relanza y el lote sigue
+3. Al liberar un lease el contexto queda inactivo o se cierra segun su estado
+4. Los trabajos en cola fallan con un error claro cuando el pool se cierra
+5. Si reciclar tras un error falla, el que llama ve el error original de la pagina
+6. Dos leases a la vez corren en carriles (hilos y navegadores) distintos y se solapan
+"""
+
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import browser_pool
+import secop_extract
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed or self.context.closed or not self.context.browser.connected
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+        self.pages = []
+
+    def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.contexts = []
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        self.closed = True
+        self.connected = False
+
+
+class FakeChromium:
+    def __init__(self):
+        self.browsers = []
+        self.fail_launch = False
+
+    def launch(self, headless=False):
+        if self.fail_launch:
+            raise RuntimeError("no se pudo lanzar Chromium")
+        browser = FakeBrowser()
+        self.browsers.append(browser)
+        return browser
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeChromium()
+
+
+@contextmanager
+def _fake_playwright():
+    """Reemplaza sync_playwright y _new_context; entrega el Playwright falso."""
+    fake = FakePlaywright()
+
+    @contextmanager
+    def sync_playwright():
+        yield fake
+
+    def new_context(browser):
+        context = FakeContext(browser)
+        browser.contexts.append(context)
+        return context
+
+    originals = (browser_pool.sync_playwright, secop_extract._new_context)
+    browser_pool.sync_playwright = sync_playwright
+    secop_extract._new_context = new_context
+    try:
+        yield fake
+    finally:
+        browser_pool.sync_playwright, secop_extract._new_context = originals
+
+
+def test_reciclaje_por_paginas():
+    with _fake_playwright() as fake:
+        pool = browser_pool.BrowserPool(headless=True, max_pages_per_context=2).start()
+        try:
+            with pool.lease() as lease:
+                pages = [lease.run(lambda page: page) for _ in range(5)]
+            assert pages[0] is pages[1] and pages[2] is pages[3] and pages[1] is not pages[2]
+            assert pages[0].context.closed and pages[2].context.closed
+            assert pool.stats["pages_served"] == 5
+            assert pool.stats["contexts_recycled"] == 2
+            # Errores esperados cuentan como pagina servida sin reciclar antes de tiempo
+            with pool.lease() as lease:
+                try:
+                    lease.run(lambda page: (_ for _ in ()).throw(secop_extract.SecopExtractionError("no existe")))
+                    raise AssertionError("el error de la pagina no se propago")
+                except secop_extract.SecopExtractionError:
+                    pass
+            assert pool.stats["contexts_recycled"] == 2
+        finally:
+            pool.close()
+        assert not pool.is_running
+        assert len(fake.chromium.browsers) == 1 and fake.chromium.browsers[0].closed
+
+
+def test_relanza_si_el_navegador_se_desconecta():
+    with _fake_playwright() as fake:
+        pool = browser_pool.BrowserPool(headless=True).start()
+        try:
+            with pool.lease() as lease:
+                first = lease.run(lambda page: page)
+                fake.chromium.browsers[0].connected = False  # ventana cerrada / crash
+                second = lease.run(lambda page: page)
+            assert second is not first
+            assert pool.stats["launches"] == 2
+            assert second.context.browser is fake.chromium.browsers[1]
+            # Un lease nuevo tambien revisa el navegador antes de asignar contexto
+            fake.chromium.browsers[1].connected = False
+            with pool.lease() as lease:
+                third = lease.run(lambda page: page)
+            assert pool.stats["launches"] == 3 and third.context.browser is fake.chromium.browsers[2]
+        finally:
+            pool.close()
+
+
+def test_liberar_lease_inactivo_o_cerrado():
+    pool = browser_pool.BrowserPool(max_pages_per_context=3, max_idle_contexts=1)
+    lane = browser_pool._Lane(pool, 1)
+    lane._browser = FakeBrowser()
+
+    def leased(pages_served=0, with_context=True):
+        context = FakeContext(lane._browser)
+        slot = browser_pool._Slot(context, context.new_page())
+        slot.pages_served = pages_served
+        if not with_context:
+            slot.context = slot.page = None
+        lane._leased[1] = slot
+        return slot, context
+
+    slot, context = leased(pages_served=1)
+    lane._release_slot(1)
+    assert lane._idle == [slot] and not context.closed  # reutilizable
+
+    slot, context = leased(pages_served=1)
+    lane._release_slot(1)
+    assert context.closed and len(lane._idle) == 1  # ya hay max_idle_contexts inactivos
+
+    lane._idle.clear()
+    slot, context = leased(pages_served=3)
+    lane._release_slot(1)
+    assert context.closed and lane._idle == []  # agoto sus paginas
+
+    slot, _ = leased(with_context=False)
+    lane._release_slot(1)
+    assert lane._idle == []  # el reciclaje habia fallado
+
+    slot, context = leased(pages_served=1)
+    lane._browser.connected = False
+    lane._release_slot(1)
+    assert context.closed and lane._idle == []  # navegador caido
+
+    lane._release_slot(99)  # lease desconocido: no hace nada
+    assert lane._leased == {}
+
+
+def test_cola_pendiente_falla_al_cerrar():
+    lane = browser_pool._Lane(browser_pool.BrowserPool(), 1)
+    pending, cancelled = Future(), Future()
+    cancelled.cancel()
+    lane._jobs.put((lambda: "no corre", pending))
+    lane._jobs.put(None)
+    lane._jobs.put((lambda: "no corre", cancelled))
+    lane._drain_pending()
+    assert lane._jobs.empty()
+    try:
+        pending.result(timeout=1)
+        raise AssertionError("el trabajo pendiente no fallo")
+    except secop_extract.SecopExtractionError as e:
+        assert "se cerro" in str(e)
+    assert cancelled.cancelled()
+
+    # Con el pool cerrado no se aceptan trabajos nuevos
+    with _fake_playwright():
+        pool = browser_pool.BrowserPool(headless=True).start()
+        pool.close()
+        try:
+            pool.fetch("25-1-1001")
+            raise AssertionError("el pool cerrado acepto un trabajo")
+        except secop_extract.SecopExtractionError as e:
+            assert "no esta activo" in str(e)
+
+
+def test_error_original_si_el_reciclaje_falla():
+    def crash(page):
+        page.context.browser.connected = False
+        raise RuntimeError("Target page, context or browser has been closed")
+
+    with _fake_playwright() as fake:
+        pool = browser_pool.BrowserPool(headless=True).start()
+        try:
+            with pool.lease() as lease:
+                fake.chromium.fail_launch = True
+                try:
+                    lease.run(crash)
+                    raise AssertionError("el crash no se propago")
+                except RuntimeError as e:
+                    assert "has been closed" in str(e)  # no el error del relanzamiento
+                # Al volver a lanzar, el siguiente trabajo recupera el slot
+                fake.chromium.fail_launch = False
+                page = lease.run(lambda page: page)
+                assert not page.is_closed() and pool.stats["launches"] == 2
+        finally:
+            pool.close()
+
+
+def test_leases_en_paralelo():
+    barrier = threading.Barrier(2, timeout=5)
+    spans = {}
+
+    def work(name):
+        with pool.lease() as lease:
+            def fn(page):
+                start = time.perf_counter()
+                barrier.wait()  # solo pasa si las dos paginas estan en curso a la vez
+                time.sleep(0.05)
+                spans[name] = (start, time.perf_counter(), threading.current_thread().name, page)
+
+            try:
+                lease.run(fn)
+            except threading.BrokenBarrierError:
+                spans[name] = None
+
+    with _fake_playwright() as fake:
+        pool = browser_pool.BrowserPool(headless=True, max_browsers=2).start()
+        try:
+            threads = [threading.Thread(target=work, args=(n,)) for n in ("a", "b")]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            assert spans["a"] and spans["b"], "los leases corrieron uno detras del otro"
+            (a0, a1, thread_a, page_a), (b0, b1, thread_b, page_b) = spans["a"], spans["b"]
+            assert a0 < b1 and b0 < a1  # los intervalos se solapan
+            assert thread_a != thread_b and page_a.context.browser is not page_b.context.browser
+            assert pool.stats["lanes"] == 2 and len(fake.chromium.browsers) == 2
+            # Los carriles quedan calientes: un lease nuevo reutiliza uno sin lanzar otro navegador
+            with pool.lease() as lease:
+                lease.run(lambda page: page)
+            assert len(fake.chromium.browsers) == 2
+
+            # Con el tope de carriles alcanzado los leases comparten el menos cargado
+            with pool.lease() as first, pool.lease() as second, pool.lease() as third:
+                pages = [lease.run(lambda page: page) for lease in (first, second, third)]
+            assert len(fake.chromium.browsers) == 2
+            assert len({id(page.context.browser) for page in pages}) == 2
+        finally:
+            pool.close()
+        assert not pool.is_running and all(b.closed for b in fake.chromium.browsers)
+
+
+def main():
+    tests = [
+        test_reciclaje_por_paginas,
+        test_relanza_si_el_navegador_se_desconecta,
+        test_liberar_lease_inactivo_o_cerrado,
+        test_cola_pendiente_falla_al_cerrar,
+        test_error_original_si_el_reciclaje_falla,
+        test_leases_en_paralelo,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+test_recorte_html.py
+
+Valida el recorte del HTML antes de parsear (page_index.slice_html):
+1. Los fixtures se recortan antes de "Documentos del Proceso" y el registro no cambia
+   con ningun backend
+2. No se recorta si despues de las secciones omitibles viene otra seccion
+3. Si el indice recortado no valida se parsea la pagina completa
+4. El recorte es opcional (SECOP_HTML_SLICE=1): por defecto se parsea la pagina completa, y
+   con recorte los respaldos de pagina completa no ven las secciones omitidas
+"""
+
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import page_index
+import secop_extract
+
+FIXTURES = {
+    "25-1-240855": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html",
+    "25-1-241304": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ CMA 008-25.html",
+}
+
+
+def _backends():
+    modules = {"html.parser": None, "lxml": "lxml", "selectolax": "selectolax"}
+    return [b for b, m in modules.items() if m is None or importlib.util.find_spec(m) is not None]
+
+
+def _page(*sections):
+    rows = "".join(
+        f'<tr><td colspan="2" class="tttablas">{title}</td></tr><tr><td>{title} dato</td><td>valor</td></tr>'
+        for title in sections
+    )
+    return f"<html><body><table>{rows}</table></body></html>"
+
+
+def test_fixtures_recortados_sin_cambios():
+    for constancia, path in FIXTURES.items():
+        html = path.read_text(encoding="utf-8")
+        sliced, expected = page_index.slice_html(html)
+        assert len(sliced) < len(html) * 0.6, path.name
+        assert 'class="tttablas">Documentos del Proceso' not in sliced and "Hitos del Proceso" not in sliced
+        for backend in _backends():
+            full = page_index.parse_html(html, backend)
+            idx = page_index.parse_html(html, backend, slice_content=True)
+            assert idx.sliced and not full.sliced
+            assert len(idx.section_headers) == expected
+            got = secop_extract._build_record_from_soup(idx, constancia)
+            assert got == secop_extract._build_record_from_soup(full, constancia), f"{backend} / {path.name}"
+
+
+def test_no_recorta_si_sigue_otra_seccion():
+    assert page_index.slice_html(_page("Informacion General del Proceso", "Hitos del Proceso")) == (
+        '<html><body><table><tr><td colspan="2" class="tttablas">Informacion General del Proceso</td></tr>'
+        "<tr><td>Informacion General del Proceso dato</td><td>valor</td></tr>",
+        1,
+    )
+    assert page_index.slice_html(_page("Informacion General", "Documentos del Proceso", "Informacion del Contrato")) is None
+    assert page_index.slice_html(_page("Informacion General", "Informacion del Contrato")) is None
+    assert page_index.slice_html(_page("Documentos del Proceso")) is None  # no queda ninguna seccion
+    assert page_index.slice_html("<html><body>Access blocked. Incident ID: 12345</body></html>") is None
+    # Encabezado con entidades y tildes
+    docs = _page("General", "Documentos del Proceso").replace("Documentos del", "Documentos&nbsp;del")
+    assert page_index.slice_html(docs) is not None
+    assert page_index.slice_html(_page("General", "Hitos del Proceso").replace("Hitos", "H&iacute;tos")) is not None
+
+
+def test_respaldo_a_parseo_completo():
+    # Un encabezado dentro de un comentario lo cuenta el recorte pero no el parser
+    html = _page("Informacion General", "Documentos del Proceso").replace(
+        "<table>", '<table><!-- <td class="tttablas">Viejo</td> -->', 1
+    )
+    assert page_index.slice_html(html)[1] == 2
+    for backend in _backends():
+        idx = page_index.parse_html(html, backend, slice_content=True)
+        assert not idx.sliced, backend
+        assert len(idx.section_headers) == 2, backend
+
+
+def test_recorte_opcional_y_respaldos_de_pagina_completa():
+    # Pagina degradada: el CDP solo aparece en el texto de "Documentos del Proceso"
+    html = _page("Informacion General del Proceso", "Documentos del Proceso").replace(
+        "Documentos del Proceso dato", "Soporte CDP No. 367", 1
+    )
+    original = secop_extract.HTML_SLICE
+    if "SECOP_HTML_SLICE" not in os.environ:
+        assert not original  # desactivado por defecto
+    try:
+        secop_extract.HTML_SLICE = False
+        idx = secop_extract.parse_detail_html(html)
+        assert not idx.sliced
+        assert secop_extract.extract(html, fields={"cdp"}) == {"Certificado de disponibilidad presupuestal": "367"}
+        secop_extract.HTML_SLICE = True
+        assert secop_extract.parse_detail_html(html).sliced
+        assert secop_extract.extract(html, fields={"cdp"}) == {"Certificado de disponibilidad presupuestal": ""}
+    finally:
+        secop_extract.HTML_SLICE = original
+
+
+def main():
+    tests = [
+        test_fixtures_recortados_sin_cambios,
+        test_no_recorta_si_sigue_otra_seccion,
+        test_respaldo_a_parseo_completo,
+        test_recorte_opcional_y_respaldos_de_pagina_completa,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
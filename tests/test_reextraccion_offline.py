@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+test_reextraccion_offline.py
+
+Valida la re-extraccion masiva offline (scripts/offline_reextract.py):
+1. Una carpeta con paginas (.html y .html.gz) se re-extrae en un pool de procesos,
+   en el orden del origen, y las paginas que no son detalle quedan como fallas
+2. La carpeta de la cache HTML y un .zip dan los mismos registros
+3. La salida xlsx lleva las fallas en la hoja Errores
+"""
+
+import csv
+import gzip
+import shutil
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import offline_reextract
+import xlsx_export
+from html_cache import HtmlCache
+
+FIXTURES = {
+    "25-1-240855": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html",
+    "25-1-241304": ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ CMA 008-25.html",
+}
+
+
+def _archive(work: Path) -> Path:
+    src = work / "paginas"
+    src.mkdir()
+    shutil.copyfile(FIXTURES["25-1-240855"], src / "25-1-240855.html")
+    (src / "25-1-241304.html.gz").write_bytes(gzip.compress(FIXTURES["25-1-241304"].read_bytes()))
+    (src / "bloqueo.html").write_text("<html><body>Access blocked. Incident ID: 1</body></html>", encoding="utf-8")
+    (src / "vacia.html").write_text("<html><body>Sin tablas</body></html>", encoding="utf-8")
+    return src
+
+
+def _csv_rows(path: Path):
+    with path.open(encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_carpeta_en_pool_de_procesos():
+    work = Path(tempfile.mkdtemp(prefix="secop_reextract_"))
+    try:
+        out_path, run = offline_reextract.reextract(_archive(work), work / "salida.csv", fmt="csv", workers=2, chunk_size=1)
+        rows = _csv_rows(out_path)
+        assert [r["numero_constancia"] for r in rows] == ["25-1-240855", "25-1-241304"]
+        assert [r["registro_presupuestal"] for r in rows] == ["2503100004", "2601130001"]
+        s = run.summary()
+        assert (s["processed"], s["ok"], s["failed"]) == (4, 2, 2) and s["pages_per_second"] > 0
+        assert [name for name, _, _ in run.failures] == ["bloqueo.html", "vacia.html"]
+        assert "bloqueo" in run.failures[0][2].lower()
+        assert len(_csv_rows(work / "salida_fallas.csv")) == 2
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def test_cache_y_zip_como_origen():
+    work = Path(tempfile.mkdtemp(prefix="secop_reextract_"))
+    try:
+        cache = HtmlCache(work / "cache")
+        for constancia, path in FIXTURES.items():
+            cache.put(constancia, path.read_text(encoding="utf-8"))
+        out_path, run = offline_reextract.reextract(work / "cache", work / "cache.csv", fmt="csv", workers=1)
+        assert sorted(r["numero_constancia"] for r in _csv_rows(out_path)) == sorted(FIXTURES)
+        assert not run.failures
+
+        zip_path = work / "paginas.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            for constancia, path in FIXTURES.items():
+                zf.write(path, f"detalle/{constancia}.html")
+        out_path, run = offline_reextract.reextract(zip_path, work / "zip.csv", fmt="csv", workers=2)
+        assert [r["numero_constancia"] for r in _csv_rows(out_path)] == list(FIXTURES)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def test_salida_xlsx_con_hoja_de_errores():
+    work = Path(tempfile.mkdtemp(prefix="secop_reextract_"))
+    try:
+        out_path, run = offline_reextract.reextract(_archive(work), work / "salida.xlsx", workers=1)
+        assert [c for c, _ in xlsx_export.read_results(out_path)] == ["25-1-240855", "25-1-241304"]
+        assert [c for c, _ in xlsx_export.read_errors(out_path)] == ["bloqueo.html", "vacia.html"]
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    tests = [
+        test_carpeta_en_pool_de_procesos,
+        test_cache_y_zip_como_origen,
+        test_salida_xlsx_con_hoja_de_errores,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+test_ritmo_peticiones.py
+
+Valida el limitador de ritmo por host (scripts/rate_limit.py):
+1. Token bucket: la primera peticion sale sin esperar y las reservas se encolan
+2. AIMD: con respuestas sanas el ritmo sube hasta el minimo intervalo; una respuesta
+   lenta lo baja; un error del servidor lo corta a la mitad con pausa creciente y un
+   bloqueo aplica la pausa maxima
+3. En el lote solo los errores del servidor al pedir frenan el ritmo (un error de
+   parseo no)
+4. La latencia se promedia por ruta: una pagina por navegador (arranque o fallback) no se
+   compara con el promedio HTTP ni frena el ritmo; cada ruta tiene calentamiento y un
+   margen absoluto minimo (latencias fijas, sin dormir junto al pipeline)
+"""
+
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import rate_limit
+import secop_extract
+
+FIXTURE = ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html"
+
+
+def _limiter(**kwargs):
+    clock = [0.0]
+    profile = rate_limit.RateProfile("prueba", "Prueba", 10.0, 2.0, 120.0, 120.0, jitter=0, **kwargs)
+    return rate_limit.HostRateLimiter(profile, clock=lambda: clock[0]), clock
+
+
+def test_token_bucket_encola_reservas():
+    limiter, clock = _limiter()
+    assert [limiter.reserve() for _ in range(3)] == [0.0, 10.0, 20.0]
+    clock[0] = 100.0
+    assert limiter.reserve() == 0.0
+
+    limiter, clock = _limiter(burst=2.0)
+    clock[0] = 10.0
+    assert [limiter.reserve() for _ in range(3)] == [0.0, 0.0, 10.0]
+
+
+def test_aimd_acelera_y_frena():
+    limiter, clock = _limiter(increase_steps=4)
+    for _ in range(6):
+        limiter.on_success(1.0)
+    assert limiter.interval == 2.0
+
+    limiter.on_success(5.0)  # mas del doble del promedio: respuesta lenta
+    assert limiter.interval > 2.0 and limiter.stats["slow"] == 1
+
+    before = limiter.interval
+    assert limiter.on_server_error() == 10.0
+    assert limiter.on_server_error() == 20.0
+    assert limiter.interval == before * 4
+    assert limiter.reserve() >= 20.0
+
+    limiter.on_success(1.0)
+    assert limiter.consecutive_errors == 0
+    assert limiter.on_block() == 120.0 and limiter.interval == 120.0
+
+
+def test_lote_solo_frena_con_errores_del_servidor():
+    calls = []
+
+    @contextmanager
+    def fake_session(headless=False, pool=None, http_fast_path=True):
+        def fetch(c):
+            calls.append(c)
+            if c == "25-1-1002":
+                raise OSError("timeout de red")
+            return FIXTURE.read_text(encoding="utf-8")
+
+        yield fetch
+
+    original_build = secop_extract._build_record_from_soup
+
+    def build(page, constancia_ok):
+        if constancia_ok == "25-1-1003":
+            raise ValueError("tabla inesperada")
+        return original_build(page, constancia_ok)
+
+    original_session = secop_extract._open_detail_session
+    secop_extract._open_detail_session = fake_session
+    secop_extract._build_record_from_soup = build
+    rate_limit.reset_limiters()
+    out_dir = Path(tempfile.mkdtemp(prefix="secop_ritmo_"))
+    try:
+        profile = rate_limit.RateProfile("prueba", "Prueba", 0.2, 0.01, 0.5, 0.5, jitter=0)
+        events = []
+        _, errors = secop_extract.extract_batch_to_excel(
+            ["25-1-1001", "25-1-1002", "25-1-1003", "25-1-1004", "25-1-1005"],
+            out_dir,
+            rate_profile=profile,
+            progress=events.append,
+        )
+        assert [c for c, _ in errors] == ["25-1-1002", "25-1-1003"]
+        pauses = {e["constancia"]: e["reason"] for e in events if e["event"] == "backoff"}
+        # Tras el error de red la siguiente peticion espera en backoff; tras el error de parseo no
+        assert pauses.get("25-1-1003") == "backoff"
+        assert "backoff" not in (pauses.get("25-1-1004"), pauses.get("25-1-1005"))
+        limiter = rate_limit.limiter_for(secop_extract.SECOP_HOST, profile)
+        assert limiter.stats["server_errors"] == 1 and limiter.stats["requests"] == 5
+        assert limiter.consecutive_errors == 0
+        assert calls == ["25-1-1001", "25-1-1002", "25-1-1003", "25-1-1004", "25-1-1005"]
+    finally:
+        secop_extract._open_detail_session = original_session
+        secop_extract._build_record_from_soup = original_build
+        rate_limit.reset_limiters()
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def test_latencia_por_ruta():
+    limiter, clock = _limiter(increase_steps=4)
+    for _ in range(6):
+        clock[0] += 1.0
+        limiter.on_success(0.5, "http")
+    clock[0] += 1.0
+    limiter.on_success(8.0, "browser")  # primera pagina por navegador: no es lentitud del sitio
+    assert limiter.interval == 2.0 and limiter.stats["slow"] == 0
+    limiter.on_success(20.0, "browser")  # aun en calentamiento de la ruta
+    limiter.on_success(8.5, "browser")
+    assert limiter.stats["slow"] == 0
+    limiter.on_success(2.0, "http")  # cuatro veces el promedio HTTP
+    assert limiter.stats["slow"] == 1
+    assert set(limiter.latency_avg) == {"http", "browser"}
+    assert limiter.latency_samples == {"http": 7, "browser": 3}
+
+    # Margen absoluto: un tropiezo de decimas sobre un promedio muy bajo no es lentitud
+    limiter, _ = _limiter()
+    for _ in range(5):
+        limiter.on_success(0.05, "http")
+    limiter.on_success(0.123, "http")
+    limiter.on_success(0.9, "http")
+    assert limiter.stats["slow"] == 0
+    limiter.on_success(1.5, "http")
+    assert limiter.stats["slow"] == 1
+
+    # En el lote cada descarga llega al limitador con su ruta (latencias fijas por ruta)
+    class FakeHttp:
+        def set_session(self, cookies, user_agent):
+            pass
+
+        def get(self, url):
+            html = FIXTURE.read_text(encoding="utf-8")
+            return 200, ("<html><body>sin tablas</body></html>" if url.endswith("25-1-1004") else html)
+
+        def close(self):
+            pass
+
+    fetchers = []
+
+    @contextmanager
+    def session(headless=False, pool=None, http_fast_path=True):
+        fetcher = secop_extract.HybridFetcher(
+            lambda c: FIXTURE.read_text(encoding="utf-8"), lambda: ([], "ua"), http_client=FakeHttp()
+        )
+        fetchers.append(fetcher)
+        yield fetcher.fetch
+
+    original_session = secop_extract._open_detail_session
+    secop_extract._open_detail_session = session
+    rate_limit.reset_limiters()
+    out_dir = Path(tempfile.mkdtemp(prefix="secop_ritmo_"))
+    try:
+        profile = rate_limit.RateProfile("prueba", "Prueba", 0.01, 0.01, 0.5, 0.5, jitter=0, latency_warmup=1)
+        limiter = rate_limit.limiter_for(secop_extract.SECOP_HOST, profile)
+        sources = []
+        on_success = limiter.on_success
+
+        def fixed_latency(latency, source=""):
+            sources.append(source)
+            on_success({"http": 0.05, "browser": 0.5}[source], source)
+
+        limiter.on_success = fixed_latency
+        _, errors = secop_extract.extract_batch_to_excel(
+            [f"25-1-100{n}" for n in range(1, 6)], out_dir, rate_profile=profile, fetch_workers=1
+        )
+        assert errors == []
+        assert fetchers[0].stats == {"browser": 2, "http": 3, "fallbacks": 1, "blocked": 0}
+        assert sources == ["browser", "http", "http", "browser", "http"]
+        assert limiter.stats["slow"] == 0  # el fallback a Chromium no frena el ritmo
+    finally:
+        secop_extract._open_detail_session = original_session
+        rate_limit.reset_limiters()
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def main():
+    tests = [
+        test_token_bucket_encola_reservas,
+        test_aimd_acelera_y_frena,
+        test_lote_solo_frena_con_errores_del_servidor,
+        test_latencia_por_ruta,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
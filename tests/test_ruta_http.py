@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+test_ruta_http.py
+
+Valida la ruta rapida HTTP (secop_extract.HybridFetcher) contra un servidor local que
+sirve los fixtures de fixtures/detalle como si fuera detalleProceso.do:
+1. Solo la primera constancia pasa por el "navegador"; el resto va por HTTP con las cookies exportadas
+2. Las peticiones HTTP reutilizan una sola conexion keep-alive
+3. Captcha en la respuesta HTTP => vuelve al navegador; un bloqueo no se reintenta de
+   inmediato en el navegador: pasa al limitador y al circuit breaker, que sondea una vez
+   por intento despues de la espera
+4. Sin cookies de sesion el servidor pide captcha y el lote sigue por navegador
+"""
+
+import shutil
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import circuit_breaker
+import rate_limit
+import secop_extract
+
+FIXTURES_DIR = ROOT_DIR / "fixtures" / "detalle"
+FIXTURES = {
+    "25-1-240855": FIXTURES_DIR / "Detalle del proceso_ LIC 002-25.html",
+    "25-1-241304": FIXTURES_DIR / "Detalle del proceso_ CMA 008-25.html",
+}
+BLOCKED = "99-9-99999"
+SESSION_COOKIE = "JSESSIONID=sesion-navegador"
+
+BLOCK_PAGE = "<html><body><h1>Access Blocked</h1><p>Incident ID: 123456</p></body></html>"
+CAPTCHA_PAGE = "<html><body><div class='g-recaptcha' data-sitekey='x'></div></body></html>"
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    requests = []
+    blocks = {}  # constancia -> respuestas de bloqueo que quedan
+
+    def setup(self):
+        type(self).connections += 1
+        super().setup()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        constancia = parse_qs(parts.query).get("numConstancia", [""])[0]
+        type(self).requests.append(constancia)
+        if SESSION_COOKIE not in (self.headers.get("Cookie") or ""):
+            body, status = CAPTCHA_PAGE, 200
+        elif constancia == BLOCKED or self.blocks.get(constancia, 0) > 0:
+            if constancia != BLOCKED:
+                self.blocks[constancia] -= 1
+            body, status = BLOCK_PAGE, 200
+        elif constancia in FIXTURES:
+            body, status = FIXTURES[constancia].read_text(encoding="utf-8"), 200
+        else:
+            body, status = "<html><body>No encontrado</body></html>", 404
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _FakeBrowser:
+    """Sustituto del navegador: lee el fixture y exporta una cookie de sesion."""
+
+    def __init__(self, cookie_value="sesion-navegador"):
+        self.calls = []
+        self.cookie_value = cookie_value
+
+    def fetch(self, constancia_ok):
+        self.calls.append(constancia_ok)
+        return FIXTURES[constancia_ok].read_text(encoding="utf-8")
+
+    def export_session(self):
+        cookie = {"name": "JSESSIONID", "value": self.cookie_value, "domain": "127.0.0.1", "path": "/"}
+        return [cookie], "Mozilla/5.0 (prueba)"
+
+
+def _start_server(blocks=None):
+    _StandInHandler.connections = 0
+    _StandInHandler.requests = []
+    _StandInHandler.blocks = dict(blocks or {})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/consultas/detalleProceso.do?numConstancia="
+    return server, base_url
+
+
+def _fetcher(browser, base_url):
+    return secop_extract.HybridFetcher(browser.fetch, browser.export_session, base_url=base_url)
+
+
+def test_http_tras_arranque_en_navegador():
+    server, base_url = _start_server()
+    browser = _FakeBrowser()
+    fetcher = _fetcher(browser, base_url)
+    try:
+        order = ["25-1-240855", "25-1-241304", "25-1-240855", "25-1-241304"]
+        pages = [fetcher.fetch(c) for c in order]
+    finally:
+        fetcher.close()
+        server.shutdown()
+    assert browser.calls == ["25-1-240855"]
+    assert fetcher.stats == {"browser": 1, "http": 3, "fallbacks": 0, "blocked": 0}
+    assert _StandInHandler.connections == 1
+    for c, html in zip(order, pages):
+        record = secop_extract.extract_record_from_html(html, c)
+        assert record["Registro Presupuestal (RP)"] in {"2503100004", "2601130001"}
+
+
+def test_bloqueo_http_no_reintenta_en_navegador():
+    server, base_url = _start_server()
+    browser = _FakeBrowser()
+    fetcher = _fetcher(browser, base_url)
+    original_dump = secop_extract._dump_blocked_html
+    secop_extract._dump_blocked_html = lambda html, constancia: None
+    try:
+        fetcher.fetch("25-1-240855")
+        try:
+            fetcher.fetch(BLOCKED)
+            raise AssertionError("se esperaba SecopBlockedError")
+        except secop_extract.SecopBlockedError as e:
+            assert "Incident ID: 123456" in e.html
+            assert secop_extract._is_block_message(str(e))
+    finally:
+        secop_extract._dump_blocked_html = original_dump
+        fetcher.close()
+        server.shutdown()
+    # Una sola peticion al sitio para la constancia bloqueada y la ruta HTTP sigue activa
+    assert browser.calls == ["25-1-240855"]
+    assert _StandInHandler.requests.count(BLOCKED) == 1
+    assert fetcher.stats == {"browser": 1, "http": 0, "fallbacks": 0, "blocked": 1}
+    assert fetcher.http_enabled
+
+
+def test_bloqueo_http_en_lote_sondea_una_vez_por_intento():
+    flaky = "25-1-241304"
+    server, base_url = _start_server(blocks={flaky: 2})
+    browser = _FakeBrowser()
+
+    @contextmanager
+    def session(headless=False, pool=None, http_fast_path=True):
+        fetcher = _fetcher(browser, base_url)
+        try:
+            yield fetcher.fetch
+        finally:
+            fetcher.close()
+
+    originals = (secop_extract._open_detail_session, secop_extract._dump_blocked_html)
+    secop_extract._open_detail_session = session
+    secop_extract._dump_blocked_html = lambda html, constancia: None
+    rate_limit.reset_limiters()
+    out_dir = Path(tempfile.mkdtemp(prefix="secop_http_bloqueo_"))
+    events = []
+    try:
+        _, errors = secop_extract.extract_batch_to_excel(
+            ["25-1-240855", flaky],
+            out_dir,
+            rate_profile=rate_limit.RateProfile.from_delay(0, 0),
+            progress=events.append,
+            breaker=circuit_breaker.CircuitBreaker(0.01, 0.02, 60),
+            fetch_workers=1,
+        )
+    finally:
+        secop_extract._open_detail_session, secop_extract._dump_blocked_html = originals
+        rate_limit.reset_limiters()
+        shutil.rmtree(out_dir, ignore_errors=True)
+        server.shutdown()
+    assert errors == []
+    assert browser.calls == ["25-1-240855"]  # el bloqueo nunca se repitio en el navegador
+    assert _StandInHandler.requests.count(flaky) == 3  # bloqueo + 2 sondeos, uno por espera
+    assert [e["reason"] for e in events if e["event"] == "backoff"] == ["probe", "probe"]
+    assert [e["event"] for e in events if e["event"] in ("blocked", "resumed")] == ["blocked", "blocked", "resumed"]
+
+
+def test_sin_sesion_valida_sigue_por_navegador():
+    server, base_url = _start_server()
+    browser = _FakeBrowser(cookie_value="otra-sesion")
+    fetcher = _fetcher(browser, base_url)
+    try:
+        for c in ["25-1-240855", "25-1-241304", "25-1-240855", "25-1-241304"]:
+            fetcher.fetch(c)
+    finally:
+        fetcher.close()
+        server.shutdown()
+    # Dos intentos HTTP con captcha y luego solo navegador
+    assert fetcher.stats == {"browser": 4, "http": 0, "fallbacks": secop_extract.HTTP_MAX_FALLBACKS, "blocked": 0}
+    assert not fetcher.http_enabled
+
+
+def test_motivos_de_fallback():
+    html = FIXTURES["25-1-240855"].read_text(encoding="utf-8")
+    assert secop_extract._needs_browser(200, html) == ""
+    assert secop_extract._needs_browser(302, html) == "http_302"
+    assert secop_extract._needs_browser(200, BLOCK_PAGE) == "blocked"
+    assert secop_extract._needs_browser(200, CAPTCHA_PAGE) == "captcha"
+    assert secop_extract._needs_browser(200, "<html><body></body></html>") == "incomplete"
+
+
+def main():
+    tests = [
+        test_http_tras_arranque_en_navegador,
+        test_bloqueo_http_no_reintenta_en_navegador,
+        test_bloqueo_http_en_lote_sondea_una_vez_por_intento,
+        test_sin_sesion_valida_sigue_por_navegador,
+        test_motivos_de_fallback,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+test_sesiones_paralelas.py
+
+Valida la descarga con varias sesiones (scripts/fetch_scheduler.py y fetch_workers):
+1. Cada hilo abre su propia sesion, las descargas se solapan y las filas se escriben
+   en el orden del lote
+2. Todas las sesiones respetan el mismo limitador del host
+3. Ante un bloqueo una sola sesion sondea y el lote termina completo
+"""
+
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT_DIR / "scripts"
+if SCRIPTS_DIR.exists():
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import circuit_breaker
+import rate_limit
+import secop_extract
+
+FIXTURE = ROOT_DIR / "fixtures" / "detalle" / "Detalle del proceso_ LIC 002-25.html"
+CONSTANCIAS = [f"25-1-100{n}" for n in range(1, 7)]
+
+
+class FakeSite:
+    def __init__(self, latency=0.05, blocks=0):
+        self.html = FIXTURE.read_text(encoding="utf-8")
+        self.latency = latency
+        self.blocks = blocks
+        self.sessions = []
+        self.starts = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def session(self, headless=False, pool=None, http_fast_path=True):
+        with self.lock:
+            self.sessions.append(threading.current_thread().name)
+
+        def fetch(c):
+            with self.lock:
+                self.starts.append(time.monotonic())
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+                blocked = c == "25-1-1003" and self.blocks > 0
+                if blocked:
+                    self.blocks -= 1
+            try:
+                time.sleep(self.latency)
+                if blocked:
+                    raise secop_extract.SecopBlockedError("Acceso bloqueado por el sitio", "Incident ID: 77701")
+                return self.html
+            finally:
+                with self.lock:
+                    self.active -= 1
+
+        yield fetch
+
+
+def _run(site, profile, workers=3, breaker=None):
+    original = secop_extract._open_detail_session
+    secop_extract._open_detail_session = site.session
+    rate_limit.reset_limiters()
+    out_dir = Path(tempfile.mkdtemp(prefix="secop_paralelo_"))
+    events = []
+    try:
+        _, errors = secop_extract.extract_batch_to_excel(
+            CONSTANCIAS,
+            out_dir,
+            rate_profile=profile,
+            progress=events.append,
+            breaker=breaker,
+            fetch_workers=workers,
+        )
+    finally:
+        secop_extract._open_detail_session = original
+        rate_limit.reset_limiters()
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return errors, events
+
+
+def test_sesiones_solapan_y_respetan_el_orden():
+    site = FakeSite()
+    errors, events = _run(site, rate_limit.RateProfile.from_delay(0, 0))
+    assert errors == []
+    assert [e["constancia"] for e in events if e["event"] == "written"] == CONSTANCIAS
+    assert [e["index"] for e in events if e["event"] == "written"] == list(range(1, 7))
+    assert len(site.sessions) == 3 and len(set(site.sessions)) == 3
+    assert site.max_active > 1
+
+
+def test_limitador_compartido():
+    site = FakeSite(latency=0.0)
+    profile = rate_limit.RateProfile("prueba", "Prueba", 0.05, 0.05, 0.05, 0.05, jitter=0)
+    errors, _ = _run(site, profile)
+    assert errors == []
+    # 6 peticiones al ritmo de una cada 0.05 s, aunque haya 3 sesiones
+    span = site.starts[-1] - site.starts[0]
+    assert len(site.starts) == 6 and span >= 0.2, span
+
+
+def test_bloqueo_con_varias_sesiones():
+    work = Path(tempfile.mkdtemp(prefix="secop_paralelo_"))
+    try:
+        site = FakeSite(blocks=2)
+        breaker = circuit_breaker.CircuitBreaker(0.01, 0.02, 60, log_path=work / "incidents.jsonl")
+        errors, events = _run(site, rate_limit.RateProfile.from_delay(0, 0), breaker=breaker)
+        assert errors == []
+        assert [e["constancia"] for e in events if e["event"] == "written"] == CONSTANCIAS
+        assert len([e for e in events if e["event"] == "resumed"]) == 1
+        assert [e["constancia"] for e in events if e.get("reason") == "probe"] == ["25-1-1003"] * 2
+        incidents = circuit_breaker.read_incidents(work / "incidents.jsonl")
+        assert [(i["outcome"], i["incident_id"]) for i in incidents] == [("recovered", "77701")]
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    tests = [
+        test_sesiones_solapan_y_respetan_el_orden,
+        test_limitador_compartido,
+        test_bloqueo_con_varias_sesiones,
+    ]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  V {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ? {t.__name__}: {e}")
+    print(f"Resultado: {len(tests) - failed}/{len(tests)} pruebas pasadas")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())